@@ -1,12 +1,155 @@
+import hashlib
+import struct
+import zlib
+
+from utils import trampoline
+
+_SPAN_MASK = (1 << 32) - 1
+
+# Hash estructural: FNV-1a de 64 bits sobre el tipo, los valores y los
+# hashes de los hijos. No usa hash() porque el de str cambia entre procesos.
+_HASH_MASK = (1 << 64) - 1
+_HASH_PRIME = 0x100000001B3
+_HASH_NONE, _HASH_EMPTY = 1, 2
+
+
+def _mix(h, value):
+    return ((h ^ value) * _HASH_PRIME) & _HASH_MASK
+
+
+def _digest(data):
+    # 64 bits: con crc32 (32 bits) nombres distintos chocan seguido
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), 'little')
+
+
+def _value_hash(value):
+    if value is None:
+        return _mix(_HASH_NONE, 0)
+    if isinstance(value, bool):
+        return _mix(3, int(value))
+    if isinstance(value, int):
+        return _mix(4, value & _HASH_MASK)
+    if isinstance(value, float):
+        return _mix(5, _digest(struct.pack('<d', value)))
+    return _mix(6, _digest(str(value).encode('utf-8')))
+
+
+def _hash_node(node):
+    # generador para trampoline; los hijos con hash ya calculado no se recorren
+    h = zlib.crc32(node.__class__.__name__.encode('ascii'))
+    for name, kind in node._fields:
+        value = getattr(node, name)
+        if kind == 'value':
+            h = _mix(h, _value_hash(value))
+        elif value is None:
+            h = _mix(h, _HASH_NONE)
+        elif kind in ('node', 'node?'):
+            child = getattr(value, '_hash', None)
+            h = _mix(h, child if child is not None else (yield _hash_node(value)))
+        else:
+            h = _mix(h, _HASH_EMPTY + len(value))
+            for item in value:
+                child = getattr(item, '_hash', None)
+                h = _mix(h, child if child is not None else (yield _hash_node(item)))
+    node._hash = h
+    return h
+
+
+def _same_value(a, b):
+    # 1, 1.0 y True son iguales con ==, pero no son el mismo literal
+    return type(a) is type(b) and a == b
+
+
+def structurally_equal(a, b):
+    """
+    True si 'a' y 'b' tienen la misma estructura y los mismos valores (sin
+    importar spans): la igualdad que resume structural_hash. Los subárboles
+    compartidos (el mismo nodo) no se recorren.
+    """
+    pending = [(a, b)]
+    while pending:
+        a, b = pending.pop()
+        if a is b:
+            continue
+        if a is None or b is None or a.__class__.__name__ != b.__class__.__name__:
+            return False
+        hash_a, hash_b = getattr(a, '_hash', None), getattr(b, '_hash', None)
+        if hash_a is not None and hash_b is not None and hash_a != hash_b:
+            return False
+        for name, kind in a._fields:
+            value_a, value_b = getattr(a, name), getattr(b, name)
+            if kind == 'value':
+                if not _same_value(value_a, value_b):
+                    return False
+            elif kind in ('node', 'node?'):
+                pending.append((value_a, value_b))
+            else:
+                value_a, value_b = value_a or [], value_b or []
+                if len(value_a) != len(value_b):
+                    return False
+                pending.extend(zip(value_a, value_b))
+    return True
+
 class ASTNode:
     """
     Clase base para todos los nodos del Árbol de Sintaxis Abstracta (AST).
+
+    Todos los nodos usan __slots__ (sin __dict__ por instancia). El rango
+    (inicio, fin) del nodo en el fuente se guarda empaquetado en un solo
+    entero, inicio << 32 | fin, y se lee con la propiedad 'span'; los nodos
+    que no vienen del Parser no tienen span (None).
+
+    'structural_hash' es igual para árboles con la misma estructura y los
+    mismos valores (sin importar spans) y estable entre ejecuciones. Es un
+    hash de 64 bits, no una identidad: sirve para agrupar candidatos en
+    una caché, pero árboles distintos pueden compartirlo, así que quien lo
+    use tiene que confirmar la coincidencia con structurally_equal. Se
+    calcula al pedirlo y queda guardado: el nodo no debe modificarse
+    después. HashConsBuilder lo precalcula.
     """
+    __slots__ = ('_span', '_hash')
+
+    # Campos del constructor, en orden, con su clase: 'node' (un nodo),
+    # 'node?' (nodo o None), 'list' (lista de nodos), 'list?' (lista o
+    # None) o 'value' (dato simple: nombre, operador, literal, tipo, flag).
+    # Lo usan las representaciones alternativas del AST.
+    _fields = ()
+
+    @property
+    def span(self):
+        try:
+            packed = self._span
+        except AttributeError:
+            return None
+        return packed >> 32, packed & _SPAN_MASK
+
+    @span.setter
+    def span(self, value):
+        start, end = value
+        self._span = start << 32 | end
+
+    @property
+    def structural_hash(self):
+        try:
+            return self._hash
+        except AttributeError:
+            return trampoline(_hash_node(self))
+
+    def join_span(self, first, last):
+        """Fija el span desde el inicio de 'first' hasta el fin de 'last'."""
+        if first is last:
+            self._span = first._span  # se comparte el mismo entero
+        else:
+            self._span = first._span & ~_SPAN_MASK | last._span & _SPAN_MASK
+
     def __repr__(self):
         return self.__class__.__name__
 
 # Nodo raíz que contiene una lista de sentencias (statements)
 class Program(ASTNode):
+    __slots__ = ('statements',)
+    _fields = (('statements', 'list'),)
+
     def __init__(self, statements):
         self.statements = statements  # Lista de nodencias de tipo Statement
 
@@ -18,6 +161,9 @@ class Program(ASTNode):
 # -------------------------------
 
 class Assignment(ASTNode):
+    __slots__ = ('location', 'expression')
+    _fields = (('location', 'node'), ('expression', 'node'))
+
     def __init__(self, location, expression):
         self.location = location
         self.expression = expression
@@ -26,6 +172,14 @@ class Assignment(ASTNode):
         return f"Assignment({self.location} = {self.expression})"
 
 class VarDeclaration(ASTNode):
+    __slots__ = ('is_const', 'identifier', 'var_type', 'initializer')
+    _fields = (
+        ('is_const', 'value'),
+        ('identifier', 'node'),
+        ('var_type', 'value'),
+        ('initializer', 'node?'),
+    )
+
     def __init__(self, is_const, identifier, var_type, initializer):
         self.is_const = is_const
         self.identifier = identifier
@@ -38,22 +192,41 @@ class VarDeclaration(ASTNode):
                 f"{' = ' + repr(self.initializer) if self.initializer else ''})")
 
 class FuncDeclaration(ASTNode):
+    __slots__ = ('is_import', 'identifier', 'parameters', 'return_type', 'body')
+    _fields = (
+        ('is_import', 'value'),
+        ('identifier', 'node'),
+        ('parameters', 'list'),
+        ('return_type', 'value'),
+        ('body', 'list'),
+    )
+
     def __init__(self, is_import, identifier, parameters, return_type, body):
         self.is_import = is_import
-        # alias para cumplir con parser ast_to_dict
-        self.func_name = identifier
-        # mantenemos identifier como alias para repr y compatibilidad interna
         self.identifier = identifier
         self.parameters = parameters
         self.return_type = return_type
         self.body = body
 
+    # func_name es un alias de identifier (ast_to_dict y los analizadores
+    # usan ese nombre); el Identifier se guarda una sola vez
+    @property
+    def func_name(self):
+        return self.identifier
+
+    @func_name.setter
+    def func_name(self, value):
+        self.identifier = value
+
     def __repr__(self):
         imp = "import " if self.is_import else ""
         return (f"FuncDeclaration({imp}func {self.func_name}"
                 f"({self.parameters}) -> {self.return_type} {{ {self.body} }})")
 
 class IfStatement(ASTNode):
+    __slots__ = ('condition', 'then_body', 'else_body')
+    _fields = (('condition', 'node'), ('then_body', 'list'), ('else_body', 'list?'))
+
     def __init__(self, condition, then_body, else_body=None):
         self.condition = condition
         self.then_body = then_body
@@ -65,6 +238,9 @@ class IfStatement(ASTNode):
         return f"If({self.condition}) {{ {self.then_body} }}"
 
 class WhileStatement(ASTNode):
+    __slots__ = ('condition', 'body')
+    _fields = (('condition', 'node'), ('body', 'list'))
+
     def __init__(self, condition, body):
         self.condition = condition
         self.body = body
@@ -73,14 +249,34 @@ class WhileStatement(ASTNode):
         return f"While({self.condition}) {{ {self.body} }}"
 
 class BreakStatement(ASTNode):
+    __slots__ = ()
+    _fields = ()
+
     def __repr__(self):
         return "Break"
 
 class ContinueStatement(ASTNode):
+    __slots__ = ()
+    _fields = ()
+
     def __repr__(self):
         return "Continue"
 
+class ErrorStatement(ASTNode):
+    """Marca el lugar de una sentencia que no se pudo parsear (modo recover)."""
+    __slots__ = ('message',)
+    _fields = (('message', 'value'),)
+
+    def __init__(self, message):
+        self.message = message
+
+    def __repr__(self):
+        return f"Error({self.message})"
+
 class ReturnStatement(ASTNode):
+    __slots__ = ('expression',)
+    _fields = (('expression', 'node'),)
+
     def __init__(self, expression):
         self.expression = expression
 
@@ -88,6 +284,9 @@ class ReturnStatement(ASTNode):
         return f"Return({self.expression})"
 
 class PrintStatement(ASTNode):
+    __slots__ = ('expression',)
+    _fields = (('expression', 'node'),)
+
     def __init__(self, expression):
         self.expression = expression
 
@@ -99,6 +298,9 @@ class PrintStatement(ASTNode):
 # -------------------------------
 
 class BinaryOp(ASTNode):
+    __slots__ = ('left', 'operator', 'right')
+    _fields = (('left', 'node'), ('operator', 'value'), ('right', 'node'))
+
     def __init__(self, left, operator, right):
         self.left = left
         self.operator = operator
@@ -108,6 +310,9 @@ class BinaryOp(ASTNode):
         return f"({self.left} {self.operator} {self.right})"
 
 class UnaryOp(ASTNode):
+    __slots__ = ('operator', 'expression')
+    _fields = (('operator', 'value'), ('expression', 'node'))
+
     def __init__(self, operator, expression):
         self.operator = operator
         self.expression = expression
@@ -116,6 +321,9 @@ class UnaryOp(ASTNode):
         return f"({self.operator}{self.expression})"
 
 class Literal(ASTNode):
+    __slots__ = ('value',)
+    _fields = (('value', 'value'),)
+
     def __init__(self, value):
         self.value = value
 
@@ -123,6 +331,9 @@ class Literal(ASTNode):
         return f"Literal({self.value})"
 
 class Identifier(ASTNode):
+    __slots__ = ('name',)
+    _fields = (('name', 'value'),)
+
     def __init__(self, name):
         self.name = name
 
@@ -130,6 +341,9 @@ class Identifier(ASTNode):
         return f"Identifier({self.name})"
 
 class FunctionCall(ASTNode):
+    __slots__ = ('identifier', 'arguments')
+    _fields = (('identifier', 'node'), ('arguments', 'list'))
+
     def __init__(self, identifier, arguments):
         self.identifier = identifier
         self.arguments = arguments
@@ -138,6 +352,9 @@ class FunctionCall(ASTNode):
         return f"Call({self.identifier}, {self.arguments})"
 
 class Location(ASTNode):
+    __slots__ = ('base', 'is_deref')
+    _fields = (('base', 'node'), ('is_deref', 'value'))
+
     def __init__(self, base, is_deref=False):
         self.base = base
         self.is_deref = is_deref
@@ -148,6 +365,9 @@ class Location(ASTNode):
         return f"{self.base}"
 
 class Cast(ASTNode):
+    __slots__ = ('target_type', 'expression')
+    _fields = (('target_type', 'value'), ('expression', 'node'))
+
     def __init__(self, target_type, expression):
         self.target_type = target_type
         self.expression = expression
@@ -156,9 +376,17 @@ class Cast(ASTNode):
         return f"Cast({self.target_type}, {self.expression})"
 
 class Parameter(ASTNode):
+    __slots__ = ('identifier', 'param_type')
+    _fields = (('identifier', 'node'), ('param_type', 'value'))
+
     def __init__(self, identifier, param_type):
         self.identifier = identifier
         self.param_type = param_type
 
     def __repr__(self):
         return f"Parameter({self.identifier}: {self.param_type})"
+
+# Clases de nodo en orden de definición; la posición es el código del tipo
+# en las representaciones compactas (ast_arena, ast_binary)
+NODE_CLASSES = [cls for cls in list(globals().values())
+                if isinstance(cls, type) and issubclass(cls, ASTNode) and cls is not ASTNode]
@@ -3,34 +3,52 @@ from AST import (
     Program, VarDeclaration, Assignment, FuncDeclaration,
     IfStatement, WhileStatement, BreakStatement, ContinueStatement,
     ReturnStatement, PrintStatement, BinaryOp, UnaryOp, Literal,
-    Identifier, FunctionCall, Location, Cast, Parameter
+    Identifier, FunctionCall, Location, Cast, Parameter, ErrorStatement
 )
+from visitor import Visitor
 
 
 class SemanticError(Exception):
     pass
 
 
-class SemanticAnalyzer:
+def is_memory_read(node):
+    """Si la expresión es una lectura `dir: su tipo lo da el contexto."""
+    return isinstance(node, Location) and node.is_deref
+
+
+class SemanticAnalyzer(Visitor):
+    method_prefix = 'analyze_'
+
     def __init__(self):
         # Stack of scopes: each is dict name->info
         self.scopes = []
+        # name -> infos visibles, del ámbito más externo al más interno;
+        # lookup no recorre los ámbitos, que pueden ser miles con if anidados
+        self.visible = {}
         self.current_function_return = None
         self.in_loop = 0
         self.errors = []  # collected error messages
+        # expresión -> tipo resuelto ('int', 'float', ...), para IRGenerator
+        self.types = {}
 
     def push_scope(self):
         self.scopes.append({})
 
     def pop_scope(self):
-        self.scopes.pop()
+        for name in self.scopes.pop():
+            infos = self.visible[name]
+            infos.pop()
+            if not infos:
+                del self.visible[name]
 
     def declare_variable(self, name, var_type, is_const=False):
         scope = self.scopes[-1]
         if name in scope:
             self.report(f"Variable '{name}' ya declarada en este ámbito.")
         else:
-            scope[name] = {'kind': 'const' if is_const else 'var', 'type': var_type}
+            info = scope[name] = {'kind': 'const' if is_const else 'var', 'type': var_type}
+            self.visible.setdefault(name, []).append(info)
 
     def declare_function(self, name, param_types, return_type):
         # only top-level
@@ -41,15 +59,21 @@ class SemanticAnalyzer:
         if name in global_scope:
             self.report(f"Función '{name}' ya declarada.")
         else:
-            global_scope[name] = {'kind': 'func', 'params': param_types, 'return': return_type}
+            info = global_scope[name] = {'kind': 'func', 'params': param_types, 'return': return_type}
+            # el ámbito global es el más externo: va al fondo de la pila
+            self.visible.setdefault(name, []).insert(0, info)
 
     def lookup(self, name):
-        for scope in reversed(self.scopes):
-            if name in scope:
-                return scope[name]
+        infos = self.visible.get(name)
+        if infos:
+            return infos[-1]
         self.report(f"Identificador '{name}' no declarado.")
         return {'kind': 'var', 'type': 'error'}
 
+    def typed(self, node, typ):
+        self.types[node] = typ
+        return typ
+
     def report(self, msg):
         self.errors.append(msg)
 
@@ -58,17 +82,19 @@ class SemanticAnalyzer:
             raise SemanticError("\n".join(self.errors))
 
     def analyze(self, node):
-        method = 'analyze_' + node.__class__.__name__
-        if hasattr(self, method):
-            return getattr(self, method)(node)
-        else:
-            self.report(f"No implementado análisis semántico para {node.__class__.__name__}")
-            return None
+        # Los analyze_* que tienen hijos son generadores: piden el tipo de un
+        # hijo con 'yield self.visit(hijo)' y trampoline los ejecuta con una
+        # pila explícita, sin límite de profundidad por la pila de Python.
+        return self.run(node)
+
+    def generic_visit(self, node):
+        self.report(f"No implementado análisis semántico para {node.__class__.__name__}")
+        return None
 
     def analyze_Program(self, node: Program):
         self.push_scope()
         for stmt in node.statements:
-            self.analyze(stmt)
+            yield self.visit(stmt)
         self.pop_scope()
         self.finalize()
 
@@ -78,7 +104,9 @@ class SemanticAnalyzer:
             self.report(f"La variable '{node.identifier.name}' requiere tipo o inicializador.")
             var_type = 'error'
         if node.initializer:
-            init_type = self.analyze(node.initializer)
+            init_type = yield self.visit(node.initializer)
+            if var_type and is_memory_read(node.initializer):
+                init_type = self.typed(node.initializer, var_type)
             if var_type and init_type and var_type != init_type:
                 self.report(f"Tipo incompatible en inicialización de '{node.identifier.name}': esperado {var_type}, encontrado {init_type}.")
             elif not var_type:
@@ -93,75 +121,81 @@ class SemanticAnalyzer:
             info = self.lookup(name)
             if info.get('kind') == 'const':
                 self.report(f"No se puede asignar a constante '{name}'.")
-        loc_type = self.analyze(node.location)
-        expr_type = self.analyze(node.expression)
-        if loc_type and expr_type and loc_type != expr_type:
+        loc_type = yield self.visit(node.location)
+        expr_type = yield self.visit(node.expression)
+        if node.location.is_deref:
+            # `dir = valor escribe en memoria un valor de cualquier tipo
+            # simple: la posición toma el tipo del valor (POKEI / POKEF)
+            self.typed(node.location, expr_type)
+        elif loc_type and is_memory_read(node.expression):
+            expr_type = self.typed(node.expression, loc_type)
+        elif loc_type and expr_type and loc_type != expr_type:
             self.report(f"Tipo incompatible en asignación: {loc_type} = {expr_type}.")
         return None
 
     def analyze_Identifier(self, node: Identifier):
         info = self.lookup(node.name)
-        return info.get('type')
+        return self.typed(node, info.get('type'))
 
     def analyze_Literal(self, node: Literal):
         val = node.value
-        if isinstance(val, bool): return 'bool'
-        if isinstance(val, int): return 'int'
-        if isinstance(val, float): return 'float'
-        if isinstance(val, str) and len(val) == 1: return 'char'
+        if isinstance(val, bool): return self.typed(node, 'bool')
+        if isinstance(val, int): return self.typed(node, 'int')
+        if isinstance(val, float): return self.typed(node, 'float')
+        if isinstance(val, str) and len(val) == 1: return self.typed(node, 'char')
         self.report(f"Literal de tipo desconocido: {val}")
-        return 'error'
+        return self.typed(node, 'error')
 
     def analyze_BinaryOp(self, node: BinaryOp):
-        left = self.analyze(node.left)
-        right = self.analyze(node.right)
+        left = yield self.visit(node.left)
+        right = yield self.visit(node.right)
         op = node.operator
         # logical
         if op in ('&&', '||'):
             if left != 'bool' or right != 'bool':
                 self.report(f"Operador lógico '{op}' requiere booleanos, encontrados {left}, {right}.")
-            return 'bool'
+            return self.typed(node, 'bool')
         # relational
         if op in ('<','>','<=','>='):
             if left not in ('int','float') or right not in ('int','float'):
                 self.report(f"Operador relacional '{op}' requiere numéricos, encontrados {left}, {right}.")
-            return 'bool'
+            return self.typed(node, 'bool')
         if op in ('==','!='):
             if left != right:
                 self.report(f"Operador de igualdad '{op}' requiere operandos del mismo tipo, encontrados {left}, {right}.")
-            return 'bool'
+            return self.typed(node, 'bool')
         # arithmetic (strict types)
         if op in ('+','-','*','/'):
             if left != right or left not in ('int','float'):
                 self.report(f"Operador aritmético '{op}' requiere operandos del mismo tipo numérico, encontrados {left}, {right}.")
-                return 'error'
-            return left
+                return self.typed(node, 'error')
+            return self.typed(node, left)
         self.report(f"Operador desconocido '{op}'.")
-        return 'error'
+        return self.typed(node, 'error')
 
     def analyze_UnaryOp(self, node: UnaryOp):
-        typ = self.analyze(node.expression)
+        typ = yield self.visit(node.expression)
         op = node.operator
         if op in ('+','-','^'):
             if typ not in ('int','float'):
                 self.report(f"Operador unario '{op}' requiere numérico, encontrado {typ}.")
-            return typ
+            return self.typed(node, typ)
         self.report(f"Operador unario desconocido '{op}'.")
-        return 'error'
+        return self.typed(node, 'error')
 
     def analyze_FunctionCall(self, node: FunctionCall):
         info = self.lookup(node.identifier.name)
         if info['kind'] != 'func':
             self.report(f"'{node.identifier.name}' no es función.")
-            return 'error'
+            return self.typed(node, 'error')
         expected = info['params']
         if len(node.arguments) != len(expected):
             self.report(f"Función '{node.identifier.name}' esperaba {len(expected)} args, recibió {len(node.arguments)}.")
         for arg, exp in zip(node.arguments, expected):
-            typ = self.analyze(arg)
+            typ = yield self.visit(arg)
             if typ != exp:
                 self.report(f"Argumento incorrecto en llamada a '{node.identifier.name}': se esperaba {exp}, encontrado {typ}.")
-        return info['return']
+        return self.typed(node, info['return'])
 
     def analyze_FuncDeclaration(self, node: FuncDeclaration):
         # Unknown return type
@@ -181,9 +215,11 @@ class SemanticAnalyzer:
         # body
         returned = False
         for stmt in node.body:
-            if isinstance(stmt, ReturnStatement):
+            # una sentencia con error de sintaxis pudo ser el return: no se
+            # reporta un "falta return" en cascada
+            if isinstance(stmt, (ReturnStatement, ErrorStatement)):
                 returned = True
-            self.analyze(stmt)
+            yield self.visit(stmt)
         # missing return
         if self.current_function_return != 'void' and not returned:
             self.report(f"Falta return en la función '{node.func_name.name}'.")
@@ -195,34 +231,34 @@ class SemanticAnalyzer:
         if self.current_function_return is None:
             self.report("'return' fuera de función.")
             return None
-        typ = self.analyze(node.expression)
+        typ = yield self.visit(node.expression)
         if typ != self.current_function_return:
             self.report(f"Return de tipo {typ}, se esperaba {self.current_function_return}.")
         return None
 
     def analyze_IfStatement(self, node: IfStatement):
-        cond = self.analyze(node.condition)
+        cond = yield self.visit(node.condition)
         if cond != 'bool':
             self.report(f"Condición del if debe ser bool, encontrada {cond}.")
         self.push_scope()
         for stmt in node.then_body:
-            self.analyze(stmt)
+            yield self.visit(stmt)
         self.pop_scope()
         if node.else_body:
             self.push_scope()
             for stmt in node.else_body:
-                self.analyze(stmt)
+                yield self.visit(stmt)
             self.pop_scope()
         return None
 
     def analyze_WhileStatement(self, node: WhileStatement):
-        cond = self.analyze(node.condition)
+        cond = yield self.visit(node.condition)
         if cond != 'bool':
             self.report(f"Condición del while debe ser bool, encontrada {cond}.")
         self.in_loop += 1
         self.push_scope()
         for stmt in node.body:
-            self.analyze(stmt)
+            yield self.visit(stmt)
         self.pop_scope()
         self.in_loop -= 1
         return None
@@ -238,7 +274,7 @@ class SemanticAnalyzer:
         return None
 
     def analyze_PrintStatement(self, node: PrintStatement):
-        self.analyze(node.expression)
+        yield self.visit(node.expression)
         return None
 
     def analyze_Location(self, node: Location):
@@ -246,15 +282,24 @@ class SemanticAnalyzer:
             info = self.lookup(node.base.name)
             if info['kind'] != 'var' and info['kind'] != 'const':
                 self.report(f"'{node.base.name}' no es variable.")
-            return info.get('type')
+            return self.typed(node, info.get('type'))
         else:
-            return self.analyze(node.base)
+            address = yield self.visit(node.base)
+            if address != 'int':
+                self.report(f"La dirección de memoria debe ser int, encontrado {address}.")
+            # la memoria no guarda tipos: una lectura `dir vale int salvo que
+            # la declaración o la asignación que la recibe pida otro (PEEKF)
+            return self.typed(node, 'int')
 
     def analyze_Cast(self, node: Cast):
-        typ = self.analyze(node.expression)
+        typ = yield self.visit(node.expression)
         if typ not in ('int','float','char','bool'):
             self.report(f"No se puede castear tipo {typ} a {node.target_type}.")
-        return node.target_type
+        return self.typed(node, node.target_type)
 
     def analyze_Parameter(self, node: Parameter):
         return None
+
+    def analyze_ErrorStatement(self, node: ErrorStatement):
+        # ya reportado por el parser; se omite para analizar el resto
+        return None
@@ -1,4 +1,11 @@
+from array import array
+from enum import IntEnum
+
+
 class IRInstruction:
+    # Vista legible de una instrucción ('ADDI', 'LOAD_LOCAL 3'): la produce
+    # IRGenerator y sirve para mostrar y depurar el IR. La máquina ejecuta
+    # la forma codificada (Bytecode, ver encode).
     def __init__(self, opcode, arg=None):
         self.opcode = opcode
         self.arg = arg
@@ -8,3 +15,219 @@ class IRInstruction:
 
     def __repr__(self):
         return str(self)
+
+
+class Op(IntEnum):
+    """Código numérico de cada opcode del IR; el nombre es el de IRInstruction."""
+    CONSTI = 0
+    CONSTR = 1
+    CONSTB = 2
+    LOAD_LOCAL = 3
+    STORE_LOCAL = 4
+    LOAD_GLOBAL = 5
+    STORE_GLOBAL = 6
+    ADDI = 7
+    ADDF = 8
+    SUBI = 9
+    SUBF = 10
+    MULI = 11
+    MULF = 12
+    DIVI = 13
+    DIVF = 14
+    NEGI = 15
+    NEGF = 16
+    AND = 17
+    OR = 18
+    LTI = 19
+    LTF = 20
+    GTI = 21
+    GTF = 22
+    LEI = 23
+    LEF = 24
+    GEI = 25
+    GEF = 26
+    EQI = 27
+    EQF = 28
+    NEI = 29
+    NEF = 30
+    ITOF = 31
+    FTOI = 32
+    BTOI = 33
+    JUMP = 34
+    JUMP_IF_FALSE = 35
+    LABEL = 36
+    CALL = 37
+    ENTER = 38
+    RETURN = 39
+    GLOBALS = 40
+    HALT = 41
+    PRINTI = 42
+    PRINTF = 43
+    PRINTC = 44
+    PRINTB = 45
+    GROW = 46
+    POKEI = 47
+    PEEKI = 48
+    POKEF = 49
+    PEEKF = 50
+    DUP = 51
+    POP = 52
+    # superinstrucciones (ver superinstructions.py): reemplazan a la primera
+    # instrucción de su secuencia y toman el resto de los operandos de las
+    # instrucciones que siguen, que quedan en el código
+    INC_LOCAL = 53
+    INC_GLOBAL = 54
+    LT_LOCALS_JUMP = 55
+    LT_LOCAL_CONST_JUMP = 56
+    LT_GLOBAL_CONST_JUMP = 57
+    CONST_PEEKI = 58
+    LT_GLOBALS_JUMP = 59
+
+
+# Qué guarda el operando de cada opcode en Bytecode.args (los que no están
+# aquí no tienen operando y llevan 0):
+#   IMMEDIATE  el entero tal cual (índices de slot, tamaños, CONSTI, CONSTB)
+#   CONSTANT   índice en el pool de constantes (CONSTR; también CONSTI si
+#              el valor no entra en 32 bits)
+#   TARGET     índice de la instrucción destino, ya resuelto (saltos y CALL)
+#   NAME       índice en el pool del nombre de la etiqueta (LABEL)
+IMMEDIATE, CONSTANT, TARGET, NAME = range(4)
+
+OPERANDS = {
+    Op.CONSTI: IMMEDIATE, Op.CONSTB: IMMEDIATE,
+    Op.LOAD_LOCAL: IMMEDIATE, Op.STORE_LOCAL: IMMEDIATE,
+    Op.LOAD_GLOBAL: IMMEDIATE, Op.STORE_GLOBAL: IMMEDIATE,
+    Op.ENTER: IMMEDIATE, Op.GLOBALS: IMMEDIATE,
+    Op.CONSTR: CONSTANT,
+    Op.JUMP: TARGET, Op.JUMP_IF_FALSE: TARGET, Op.CALL: TARGET,
+    Op.LABEL: NAME,
+    # el de una superinstrucción es el de la primera de su secuencia
+    Op.INC_LOCAL: IMMEDIATE, Op.INC_GLOBAL: IMMEDIATE, Op.LT_LOCALS_JUMP: IMMEDIATE,
+    Op.LT_LOCAL_CONST_JUMP: IMMEDIATE, Op.LT_GLOBAL_CONST_JUMP: IMMEDIATE, Op.CONST_PEEKI: IMMEDIATE,
+    Op.LT_GLOBALS_JUMP: IMMEDIATE,
+}
+
+_INT_MIN, _INT_MAX = -2 ** 31, 2 ** 31 - 1
+
+
+class Bytecode:
+    """
+    IR codificado: la instrucción i es code[i] (un Op) con operando
+    args[i]. Los floats y los nombres de etiqueta van una sola vez en
+    'constants'; los saltos y CALL apuntan directamente a la instrucción
+    que sigue a su LABEL, así que la máquina no busca etiquetas.
+    'labels' (destino -> nombre de la etiqueta) solo sirve para decode y
+    solo se guarda si se quitaron los LABEL; si no, decode toma los
+    nombres de las mismas LABEL.
+    """
+    __slots__ = ('code', 'args', 'constants', 'labels')
+
+    def __init__(self, code, args, constants, labels=None):
+        self.code = code
+        self.args = args
+        self.constants = constants
+        self.labels = labels
+
+    def __len__(self):
+        return len(self.code)
+
+    def nbytes(self):
+        """Bytes de los arrays de código y operandos (sin el pool)."""
+        return len(self.code) * self.code.itemsize + len(self.args) * self.args.itemsize
+
+
+def encode(instructions, strip_labels=False):
+    """
+    Codifica una lista de IRInstruction (como la de IRGenerator.generate).
+    Con strip_labels los LABEL no se emiten (ver linker.py): los saltos
+    apuntan a la instrucción que seguía a la etiqueta.
+    """
+    # primero la posición de cada etiqueta: los saltos pueden ir hacia adelante
+    targets = {}
+    position = 0
+    for instr in instructions:
+        if instr.opcode == 'LABEL':
+            if strip_labels:
+                targets[instr.arg] = position
+                continue
+            targets[instr.arg] = position + 1
+        position += 1
+
+    code = array('B')
+    args = array('i')
+    constants = []
+    pool = {}
+
+    def constant(value):
+        # 1, 1.0 y True son iguales como claves de dict: se distingue el tipo
+        key = (type(value), repr(value))
+        index = pool.get(key)
+        if index is None:
+            index = pool[key] = len(constants)
+            constants.append(value)
+        return index
+
+    for instr in instructions:
+        if strip_labels and instr.opcode == 'LABEL':
+            continue
+        try:
+            op = Op[instr.opcode]
+        except KeyError:
+            raise Exception(f"Instrucción no soportada: {instr.opcode}") from None
+        arg = instr.arg
+        kind = OPERANDS.get(op)
+        if kind is None:
+            arg = 0
+        elif kind == IMMEDIATE:
+            if not _INT_MIN <= arg <= _INT_MAX:
+                op, arg = Op.CONSTR, constant(arg)
+        elif kind == CONSTANT or kind == NAME:
+            arg = constant(arg)
+        else:
+            label = f"FUNC_{arg}" if op == Op.CALL else arg
+            try:
+                arg = targets[label]
+            except KeyError:
+                raise Exception(f"Etiqueta no definida: {label}") from None
+        code.append(op)
+        args.append(arg)
+    return Bytecode(code, args, constants, _label_names(targets.items()) if strip_labels else None)
+
+
+def _label_names(targets):
+    # sin LABEL varias etiquetas pueden caer en la misma instrucción: se
+    # muestra la primera, salvo que sea la entrada de una función
+    labels = {}
+    for label, target in targets:
+        if target not in labels or label.startswith('FUNC_'):
+            labels[target] = label
+    return labels
+
+
+def decode(bytecode):
+    """Vuelve a la vista de IRInstruction, con los nombres de las etiquetas."""
+    code, args, constants = bytecode.code, bytecode.args, bytecode.constants
+    labels = bytecode.labels
+    if labels is None:
+        labels = _label_names((constants[arg], i + 1) for i, (op, arg) in enumerate(zip(code, args))
+                              if op == Op.LABEL)
+    instructions = []
+    for op, arg in zip(code, args):
+        op = Op(op)
+        kind = OPERANDS.get(op)
+        if kind is None:
+            arg = None
+        elif kind == CONSTANT:
+            value = constants[arg]
+            # los int que no entraban en 32 bits van al pool como CONSTR
+            op, arg = (Op.CONSTI if isinstance(value, int) else op), value
+        elif kind == NAME:
+            arg = constants[arg]
+        elif kind == TARGET:
+            label = labels.get(arg)
+            if label is None:
+                arg = f"@{arg}"
+            else:
+                arg = label[len("FUNC_"):] if op == Op.CALL else label
+        instructions.append(IRInstruction(op.name, arg))
+    return instructions
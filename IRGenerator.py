@@ -1,156 +1,304 @@
 from IR import IRInstruction
 from AST import *
+from visitor import Visitor
+from ASemantico import SemanticAnalyzer
+from resolver import Resolver, GLOBAL, LOCAL
+from inliner import inlinable_functions
 
-class IRGenerator:
-    def __init__(self):
+# Sufijo de las instrucciones tipadas: los float usan las versiones F; int,
+# char y bool (enteros en la máquina) las I.
+TYPE_SUFFIX = {'int': 'I', 'char': 'I', 'bool': 'I', 'float': 'F'}
+
+ARITHMETIC_OPS = {'+': 'ADD', '-': 'SUB', '*': 'MUL', '/': 'DIV'}
+COMPARISON_OPS = {'<': 'LT', '>': 'GT', '<=': 'LE', '>=': 'GE', '==': 'EQ', '!=': 'NE'}
+LOGICAL_OPS = {'&&': 'AND', '||': 'OR'}
+PRINT_OPS = {'int': 'PRINTI', 'float': 'PRINTF', 'char': 'PRINTC', 'bool': 'PRINTB'}
+
+
+class IRGenerator(Visitor):
+    method_prefix = 'gen_'
+
+    def __init__(self, resolution=None, types=None, inline_budget=0):
         self.instructions = []
+        # Las etiquetas dentro de una función llevan su nombre ('suma.LOOP1')
+        # y un contador propio: el código de cada función no depende del de
+        # las demás (ver parallel.py)
         self.label_counter = 0
+        self.label_namespace = ''
+        # funciones encontradas en el nivel superior, que se emiten después del HALT
+        self.functions = []
+        # (inicio, fin) de los while abiertos: destino de continue / break
+        self.loops = []
+        # Slots de las variables (resolver.Resolution); si no se da, generate
+        # corre el Resolver sobre el árbol
+        self.resolution = resolution
+        # Tipo de cada expresión (SemanticAnalyzer.types); si no se da,
+        # generate corre el analizador
+        self.types = types
+        # Funciones que se copian en cada llamada en lugar de emitir CALL
+        # (ver inliner.py); generate las elige si inline_budget > 0
+        self.inline_budget = inline_budget
+        self.inlinable = {}
+        # nombre -> cantidad de llamadas reemplazadas por el cuerpo
+        self.inlined = {}
+        # Slots del frame que se está generando: los locales de una copia
+        # van desde 'frame_top' (el primero libre) y 'frame_high' es el
+        # tamaño final del frame. 'inline_bases' tiene, por copia en curso,
+        # el slot donde empiezan sus locales.
+        self.frame_scope = GLOBAL
+        self.frame_top = self.frame_high = 0
+        self.inline_bases = []
 
     def new_label(self, prefix="L"):
         self.label_counter += 1
-        return f"{prefix}{self.label_counter}"
+        return f"{self.label_namespace}{prefix}{self.label_counter}"
 
     def generate(self, node):
-        method = 'gen_' + node.__class__.__name__
-        if hasattr(self, method):
-            getattr(self, method)(node)
-        else:
-            raise NotImplementedError(f"No implementado IR para {node.__class__.__name__}")
+        # Los gen_* con hijos son generadores que emiten el código de cada
+        # hijo con 'yield self.visit(hijo)'; trampoline los recorre con una
+        # pila explícita.
+        if self.types is None:
+            analyzer = SemanticAnalyzer()
+            analyzer.analyze(node)
+            self.types = analyzer.types
+        if self.resolution is None:
+            self.resolution = Resolver().resolve(node)
+        if self.inline_budget > 0:
+            self.inlinable = inlinable_functions(node, self.inline_budget)
+        self.run(node)
         return self.instructions
 
+    def slot(self, identifier):
+        slot = self.resolution.slots[identifier]
+        if slot.scope == LOCAL and self.inline_bases:
+            # local de una función copiada: va a los slots de la copia
+            return self.frame_scope, self.inline_bases[-1] + slot.index
+        return slot
+
+    def load(self, identifier):
+        scope, index = self.slot(identifier)
+        opcode = "LOAD_GLOBAL" if scope == GLOBAL else "LOAD_LOCAL"
+        self.instructions.append(IRInstruction(opcode, index))
+
+    def store(self, identifier):
+        scope, index = self.slot(identifier)
+        opcode = "STORE_GLOBAL" if scope == GLOBAL else "STORE_LOCAL"
+        self.instructions.append(IRInstruction(opcode, index))
+
+    def generic_visit(self, node):
+        raise NotImplementedError(f"No implementado IR para {node.__class__.__name__}")
+
     def gen_Program(self, node):
+        # El código de nivel superior termina en HALT; las funciones van
+        # después y solo se ejecutan con CALL.
+        globals_instr = IRInstruction("GLOBALS", self.resolution.global_count)
+        self.instructions.append(globals_instr)
+        self.frame_scope = GLOBAL
+        self.frame_top = self.frame_high = self.resolution.global_count
         for stmt in node.statements:
-            self.generate(stmt)
+            yield self.visit(stmt)
+            self.discard(stmt)
+        # las copias de funciones pueden haber agregado globales
+        globals_instr.arg = self.frame_high
+        self.instructions.append(IRInstruction("HALT"))
+        for func in self.functions:
+            yield self.gen_function(func)
+
+    def discard(self, stmt):
+        # una llamada usada como sentencia deja su valor de retorno en la
+        # pila de operandos: se saca para que no lo tome la expresión siguiente
+        if isinstance(stmt, FunctionCall) and self.types[stmt] != 'void':
+            self.instructions.append(IRInstruction("POP"))
 
     def gen_VarDeclaration(self, node):
         if node.initializer:
-            self.generate(node.initializer)
-            self.instructions.append(IRInstruction("LOCAL_SET", node.identifier.name))
+            yield self.visit(node.initializer)
+            self.store(node.identifier)
+
+    def typed_op(self, prefix, expr):
+        """'prefix' con el sufijo del tipo de 'expr': ADD + float -> ADDF."""
+        value_type = self.types[expr]
+        try:
+            return prefix + TYPE_SUFFIX[value_type]
+        except KeyError:
+            raise Exception(f"Tipo no soportado para {prefix}: {value_type}") from None
 
     def gen_Assignment(self, node):
-        self.generate(node.expression)
         if isinstance(node.location, Location) and node.location.is_deref:
-            self.generate(node.location.base)
-            value_type = self.infer_expr_type(node.expression)
-            if value_type == 'int':
-                self.instructions.append(IRInstruction("POKEI"))
-            elif value_type == 'float':
-                self.instructions.append(IRInstruction("POKEF"))
-            elif value_type == 'char':
-                self.instructions.append(IRInstruction("POKEI"))
-            else:
-                raise Exception(f"Tipo no soportado para POKE: {value_type}")
+            # POKE saca primero el valor y después la dirección
+            yield self.visit(node.location.base)
+            yield self.visit(node.expression)
+            self.instructions.append(IRInstruction(self.typed_op("POKE", node.expression)))
         else:
-            self.instructions.append(IRInstruction("LOCAL_SET", node.location.base.name))
+            yield self.visit(node.expression)
+            self.store(node.location.base)
 
     def gen_Identifier(self, node):
-        self.instructions.append(IRInstruction("LOCAL_GET", node.name))
+        self.load(node)
 
     def gen_Literal(self, node):
         val = node.value
-        if isinstance(val, int):
+        # bool antes que int: True es un int en Python
+        if isinstance(val, bool):
+            self.instructions.append(IRInstruction("CONSTB", int(val)))
+        elif isinstance(val, int):
             self.instructions.append(IRInstruction("CONSTI", val))
         elif isinstance(val, float):
             self.instructions.append(IRInstruction("CONSTR", val))
-        elif isinstance(val, bool):
-            self.instructions.append(IRInstruction("CONSTB", int(val)))
         elif isinstance(val, str):
             self.instructions.append(IRInstruction("CONSTI", ord(val)))
         else:
             raise Exception(f"Literal no soportado: {val}")
 
     def gen_BinaryOp(self, node):
-        self.generate(node.left)
-        self.generate(node.right)
-        op_map = {
-            '+': 'ADDI', '-': 'SUBI', '*': 'MULI', '/': 'DIVI',
-            '<': 'LT', '>': 'GT', '<=': 'LE', '>=': 'GE',
-            '==': 'EQ', '!=': 'NE', '&&': 'AND', '||': 'OR'
-        }
-        self.instructions.append(IRInstruction(op_map[node.operator]))
+        yield self.visit(node.left)
+        yield self.visit(node.right)
+        op = node.operator
+        if op in LOGICAL_OPS:
+            opcode = LOGICAL_OPS[op]
+        elif op in ARITHMETIC_OPS:
+            opcode = self.typed_op(ARITHMETIC_OPS[op], node)
+        else:
+            # el tipo de una comparación es bool: cuenta el de los operandos
+            opcode = self.typed_op(COMPARISON_OPS[op], node.left)
+        self.instructions.append(IRInstruction(opcode))
 
     def gen_UnaryOp(self, node):
+        yield self.visit(node.expression)
         if node.operator == '^':
-            self.generate(node.expression)
             self.instructions.append(IRInstruction("GROW"))
-        else:
-            self.generate(node.expression)
-            op_map = {'-': 'NEG', '+': 'POS', '^': 'NOT'}
-            self.instructions.append(IRInstruction(op_map[node.operator]))
+        elif node.operator == '-':
+            self.instructions.append(IRInstruction(self.typed_op("NEG", node)))
+        # '+' no genera código
 
     def gen_PrintStatement(self, node):
-        self.generate(node.expression)
-        self.instructions.append(IRInstruction("PRINT"))
+        yield self.visit(node.expression)
+        self.instructions.append(IRInstruction(PRINT_OPS[self.types[node.expression]]))
 
     def gen_IfStatement(self, node):
-        self.generate(node.condition)
+        yield self.visit(node.condition)
         else_label = self.new_label("ELSE")
         end_label = self.new_label("ENDIF")
         self.instructions.append(IRInstruction("JUMP_IF_FALSE", else_label))
         for stmt in node.then_body:
-            self.generate(stmt)
+            yield self.visit(stmt)
+            self.discard(stmt)
         self.instructions.append(IRInstruction("JUMP", end_label))
         self.instructions.append(IRInstruction("LABEL", else_label))
         if node.else_body:
             for stmt in node.else_body:
-                self.generate(stmt)
+                yield self.visit(stmt)
+                self.discard(stmt)
         self.instructions.append(IRInstruction("LABEL", end_label))
 
     def gen_WhileStatement(self, node):
         start_label = self.new_label("LOOP")
         end_label = self.new_label("ENDLOOP")
         self.instructions.append(IRInstruction("LABEL", start_label))
-        self.generate(node.condition)
+        yield self.visit(node.condition)
         self.instructions.append(IRInstruction("JUMP_IF_FALSE", end_label))
+        self.loops.append((start_label, end_label))
         for stmt in node.body:
-            self.generate(stmt)
+            yield self.visit(stmt)
+            self.discard(stmt)
+        self.loops.pop()
         self.instructions.append(IRInstruction("JUMP", start_label))
         self.instructions.append(IRInstruction("LABEL", end_label))
 
     def gen_BreakStatement(self, node):
-        self.instructions.append(IRInstruction("BREAK"))
+        self.instructions.append(IRInstruction("JUMP", self.loops[-1][1]))
 
     def gen_ContinueStatement(self, node):
-        self.instructions.append(IRInstruction("CONTINUE"))
+        self.instructions.append(IRInstruction("JUMP", self.loops[-1][0]))
 
     def gen_ReturnStatement(self, node):
-        self.generate(node.expression)
+        if node.expression is not None:
+            yield self.visit(node.expression)
         self.instructions.append(IRInstruction("RETURN"))
 
     def gen_FuncDeclaration(self, node):
+        # también las declaradas dentro de un bloque: su código no va en línea
+        if not node.is_import:
+            self.functions.append(node)
+
+    def gen_function(self, node):
+        outer = self.label_namespace, self.label_counter
+        self.label_namespace, self.label_counter = f"{node.func_name.name}.", 0
         label = f"FUNC_{node.func_name.name}"
         self.instructions.append(IRInstruction("LABEL", label))
+        # ENTER crea los locales; los argumentos están en la pila en orden,
+        # así que se guardan en los slots de los parámetros de atrás para adelante
+        enter = IRInstruction("ENTER", self.resolution.frame_sizes[node])
+        self.instructions.append(enter)
+        self.frame_scope = LOCAL
+        self.frame_top = self.frame_high = enter.arg
+        for param in reversed(node.parameters):
+            self.store(param.identifier)
         for stmt in node.body:
-            self.generate(stmt)
-        if node.return_type == "void":
+            yield self.visit(stmt)
+            self.discard(stmt)
+        # el parser deja return_type en None para las funciones void
+        if (node.return_type or "void") == "void":
             self.instructions.append(IRInstruction("RETURN"))
+        enter.arg = self.frame_high
+        self.label_namespace, self.label_counter = outer
 
     def gen_FunctionCall(self, node):
         for arg in node.arguments:
-            self.generate(arg)
-        self.instructions.append(IRInstruction("CALL", node.identifier.name))
+            yield self.visit(arg)
+        func = self.inlinable.get(node.identifier.name)
+        if func is None:
+            self.instructions.append(IRInstruction("CALL", node.identifier.name))
+        else:
+            yield self.inline(func)
+
+    def inline(self, func):
+        # El cuerpo de 'func' en lugar del CALL: toma los argumentos de la
+        # pila como el prólogo de gen_function y deja el valor del return
+        # final en la pila. Sus locales usan slots nuevos del frame actual,
+        # libres de nuevo cuando termina la copia.
+        base = self.frame_top
+        self.frame_top = base + self.resolution.frame_sizes[func]
+        self.frame_high = max(self.frame_high, self.frame_top)
+        self.inline_bases.append(base)
+        for param in reversed(func.parameters):
+            self.store(param.identifier)
+        for stmt in func.body:
+            if isinstance(stmt, ReturnStatement):
+                if stmt.expression is not None:
+                    yield self.visit(stmt.expression)
+            else:
+                yield self.visit(stmt)
+                self.discard(stmt)
+        self.inline_bases.pop()
+        self.frame_top = base
+        name = func.func_name.name
+        self.inlined[name] = self.inlined.get(name, 0) + 1
 
     def gen_Cast(self, node):
-        self.generate(node.expression)
-        self.instructions.append(IRInstruction("CAST", node.target_type))
+        yield self.visit(node.expression)
+        source, target = self.types[node.expression], node.target_type
+        if source == target:
+            return
+        if target == 'bool':
+            # distinto de cero
+            zero = IRInstruction("CONSTR", 0.0) if source == 'float' else IRInstruction("CONSTI", 0)
+            self.instructions.append(zero)
+            self.instructions.append(IRInstruction(self.typed_op("NE", node.expression)))
+        elif target == 'float':
+            self.instructions.append(IRInstruction("ITOF"))
+        elif source == 'float':
+            self.instructions.append(IRInstruction("FTOI"))
+        elif source == 'bool':
+            self.instructions.append(IRInstruction("BTOI"))
+        # int <-> char: la misma representación
 
     def gen_Location(self, node):
         if node.is_deref:
-            self.generate(node.base)
-            self.instructions.append(IRInstruction("PEEKI"))  # Asume int por defecto, puedes mejorar según contexto
+            yield self.visit(node.base)
+            self.instructions.append(IRInstruction(self.typed_op("PEEK", node)))
         else:
-            self.instructions.append(IRInstruction("LOCAL_GET", node.base.name))
+            self.load(node.base)
 
     def gen_Parameter(self, node):
         pass
-
-    def infer_expr_type(self, expr):
-        if isinstance(expr, Literal):
-            val = expr.value
-            if isinstance(val, int): return 'int'
-            if isinstance(val, float): return 'float'
-            if isinstance(val, bool): return 'bool'
-            if isinstance(val, str): return 'char'
-        if isinstance(expr, Cast):
-            return expr.target_type
-        return 'int'  # default
\ No newline at end of file
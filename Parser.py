@@ -3,19 +3,196 @@
 import sys
 import json
 from Token import TokenType
+from json.encoder import encode_basestring_ascii
 from AST import (
     Program, Assignment, VarDeclaration, FuncDeclaration,
     IfStatement, WhileStatement, BreakStatement, ContinueStatement,
     ReturnStatement, PrintStatement, BinaryOp, UnaryOp, Literal, Identifier,
-    FunctionCall, Location, Cast, Parameter
+    FunctionCall, Location, Cast, Parameter, ErrorStatement, NODE_CLASSES, _hash_node
 )
-from utils import peek, expect, advance, error
+from utils import peek, expect, advance, error, trampoline
+from visitor import Visitor
+
+# Operadores binarios: tipo de token -> (precedencia, asociatividad).
+# Mayor precedencia liga más fuerte; agregar un operador es agregar una fila.
+BINARY_OPERATORS = {
+    TokenType.LOR:    (1, 'left'),
+    TokenType.LAND:   (2, 'left'),
+    TokenType.LT:     (3, 'left'),
+    TokenType.GT:     (3, 'left'),
+    TokenType.LE:     (3, 'left'),
+    TokenType.GE:     (3, 'left'),
+    TokenType.EQ:     (3, 'left'),
+    TokenType.NE:     (3, 'left'),
+    TokenType.PLUS:   (4, 'left'),
+    TokenType.MINUS:  (4, 'left'),
+    TokenType.TIMES:  (5, 'left'),
+    TokenType.DIVIDE: (5, 'left'),
+}
+
+LITERAL_TOKENS = (TokenType.INTEGER, TokenType.FLOAT, TokenType.CHAR, TokenType.TRUE, TokenType.FALSE)
+TYPE_NAMES = ('int', 'float', 'char', 'bool')
+
+# Tokens que inician una sentencia: puntos de sincronización tras un error
+STATEMENT_KEYWORDS = {
+    TokenType.VAR, TokenType.CONST, TokenType.IMPORT, TokenType.FUNC,
+    TokenType.IF, TokenType.WHILE, TokenType.BREAK, TokenType.CONTINUE,
+    TokenType.RETURN, TokenType.PRINT,
+}
+
+
+class ObjectBuilder:
+    """
+    Constructor de nodos del Parser: crea un objeto de AST.py por nodo. El
+    Parser construye todo a través de su builder (self.builder.BinaryOp(...),
+    self.builder.span(...)), así que otra representación del AST solo
+    necesita otro builder con la misma interfaz (ver ast_arena.ArenaBuilder).
+    """
+    Program = Program
+    Assignment = Assignment
+    VarDeclaration = VarDeclaration
+    FuncDeclaration = FuncDeclaration
+    IfStatement = IfStatement
+    WhileStatement = WhileStatement
+    BreakStatement = BreakStatement
+    ContinueStatement = ContinueStatement
+    ErrorStatement = ErrorStatement
+    ReturnStatement = ReturnStatement
+    PrintStatement = PrintStatement
+    BinaryOp = BinaryOp
+    UnaryOp = UnaryOp
+    Literal = Literal
+    Identifier = Identifier
+    FunctionCall = FunctionCall
+    Location = Location
+    Cast = Cast
+    Parameter = Parameter
+
+    def span(self, node, start, end):
+        node.span = (start, end)
+        return node
+
+    def join_span(self, node, first, last):
+        node.join_span(first, last)
+        return node
+
+    def finish(self, root):
+        return root
+
+
+class HashConsBuilder(ObjectBuilder):
+    """
+    Builder con hash-consing: los literales y las operaciones (BinaryOp,
+    UnaryOp, Cast) cuyos operandos ya son compartidos se crean una sola vez
+    y se reutilizan en cada aparición. Las expresiones con identificadores
+    no se comparten, porque su significado depende del ámbito en que
+    aparecen. Todos los nodos salen con su structural_hash precalculado.
+
+    Un nodo compartido conserva el span de su primera aparición.
+    """
+
+    def __init__(self):
+        # clave -> nodo compartido; las claves usan id() de los operandos,
+        # que siguen vivos porque la tabla los referencia
+        self.table = {}
+        self.members = set()
+        self.reused = 0
+        for cls in NODE_CLASSES:
+            if cls not in (Literal, BinaryOp, UnaryOp, Cast):
+                setattr(self, cls.__name__, self._hashed_constructor(cls))
+
+    @staticmethod
+    def _hashed_constructor(cls):
+        def build(*args, **kwargs):
+            node = cls(*args, **kwargs)
+            trampoline(_hash_node(node))
+            return node
+        return build
+
+    def _intern(self, key, cls, *args):
+        node = self.table.get(key)
+        if node is not None:
+            self.reused += 1
+            return node
+        node = cls(*args)
+        trampoline(_hash_node(node))
+        if key is not None:
+            self.table[key] = node
+            self.members.add(id(node))
+        return node
+
+    def Literal(self, value):
+        # el tipo va en la clave: True == 1 pero son literales distintos
+        return self._intern((Literal, type(value), value), Literal, value)
+
+    def BinaryOp(self, left, operator, right):
+        members = self.members
+        key = (BinaryOp, id(left), operator, id(right)) if id(left) in members and id(right) in members else None
+        return self._intern(key, BinaryOp, left, operator, right)
+
+    def UnaryOp(self, operator, expression):
+        key = (UnaryOp, operator, id(expression)) if id(expression) in self.members else None
+        return self._intern(key, UnaryOp, operator, expression)
+
+    def Cast(self, target_type, expression):
+        key = (Cast, target_type, id(expression)) if id(expression) in self.members else None
+        return self._intern(key, Cast, target_type, expression)
+
+    def span(self, node, start, end):
+        # en un nodo compartido solo se acepta ensanchar su span actual
+        # (los paréntesis de su primera aparición)
+        current = node.span if id(node) in self.members else None
+        if current is None or start <= current[0] <= current[1] <= end:
+            node.span = (start, end)
+        return node
+
+    def join_span(self, node, first, last):
+        if id(node) not in self.members or node.span is None:
+            node.join_span(first, last)
+        return node
 
 
 class Parser:
-    def __init__(self, tokens):
+    def __init__(self, tokens, recover=False, builder=None):
         self.tokens = tokens
         self.index = 0
+        self.builder = builder if builder is not None else ObjectBuilder()
+        # Con recover=True los errores de sintaxis se acumulan en self.errors
+        # y parse() devuelve un Program parcial con nodos ErrorStatement.
+        self.recover = recover
+        self.errors = []
+
+    def report(self, msg):
+        self.errors.append(msg)
+
+    def synchronize(self, start):
+        """
+        Modo pánico: descarta tokens hasta pasar un ';' o hasta quedar
+        frente a un '}' o al inicio de otra sentencia. Un bloque '{ ... }'
+        que empieza dentro de la zona descartada se salta completo. Siempre
+        avanza al menos un token para no quedar atascado en el mismo error.
+        """
+        depth = 0
+        if self.index == start:
+            if self.current_token().tipo == TokenType.LBRACE:
+                depth += 1
+            self.advance_token()
+        while (ct := self.current_token()):
+            if ct.tipo == TokenType.LBRACE:
+                depth += 1
+            elif ct.tipo == TokenType.RBRACE:
+                if depth == 0:
+                    return
+                depth -= 1
+                if depth == 0:
+                    self.advance_token()
+                    return
+            elif depth == 0 and ct.tipo == TokenType.SEMI:
+                self.advance_token()
+                return
+            elif depth == 0 and ct.tipo in STATEMENT_KEYWORDS:
+                return
+            self.advance_token()
 
     def current_token(self):
         return peek(self.tokens, self.index)
@@ -30,7 +207,10 @@ class Parser:
         return token
 
     def parse(self):
-        return self.parse_program()
+        # Los métodos parse_* son generadores que "llaman" a otros haciendo
+        # yield del generador hijo; trampoline los ejecuta con una pila
+        # explícita, así que el anidamiento no consume la pila de Python.
+        return self.builder.finish(trampoline(self.parse_program()))
 
     # program ::= statement* EOF
     def parse_program(self):
@@ -39,52 +219,70 @@ class Parser:
             ct = self.current_token()
             if not ct or ct.tipo == TokenType.EOF:
                 break
-            stmts.append(self.parse_statement())
-        return Program(stmts)
+            stmts.append((yield self.parse_statement()))
+        return self.builder.Program(stmts)
+
+    def spanned(self, node, start):
+        """Fija el span de 'node' desde el offset 'start' hasta el fin del último token consumido."""
+        self.builder.span(node, start, self.tokens[self.index - 1].fin)
+        return node
 
     def parse_statement(self):
+        ct = self.current_token()
+        offset = ct.pos if ct else 0
+        if not self.recover:
+            return self.spanned((yield self._parse_statement()), offset)
+        start = self.index
+        try:
+            return self.spanned((yield self._parse_statement()), offset)
+        except SyntaxError as e:
+            self.report(str(e))
+            self.synchronize(start)
+            return self.spanned(self.builder.ErrorStatement(str(e)), offset)
+
+    def _parse_statement(self):
         ct = self.current_token()
         if not ct:
             error(ct, "statement")
 
         if ct.tipo in (TokenType.VAR, TokenType.CONST):
-            return self.parse_vardecl()
+            return (yield self.parse_vardecl())
         if ct.tipo in (TokenType.IMPORT, TokenType.FUNC):
-            return self.parse_funcdecl()
+            return (yield self.parse_funcdecl())
         if ct.tipo == TokenType.IF:
-            return self.parse_if_stmt()
+            return (yield self.parse_if_stmt())
         if ct.tipo == TokenType.WHILE:
-            return self.parse_while_stmt()
+            return (yield self.parse_while_stmt())
         if ct.tipo == TokenType.BREAK:
             self.advance_token()
             self.consume(TokenType.SEMI)
-            return BreakStatement()
+            return self.builder.BreakStatement()
         if ct.tipo == TokenType.CONTINUE:
             self.advance_token()
             self.consume(TokenType.SEMI)
-            return ContinueStatement()
+            return self.builder.ContinueStatement()
         if ct.tipo == TokenType.RETURN:
-            return self.parse_return_stmt()
+            return (yield self.parse_return_stmt())
         if ct.tipo == TokenType.PRINT:
-            return self.parse_print_stmt()
+            return (yield self.parse_print_stmt())
 
         # función como expresión independiente
         next_tok = peek(self.tokens, self.index+1)
         if ct.tipo == TokenType.IDENTIFIER and next_tok and next_tok.tipo == TokenType.LPAREN:
-            expr = self.parse_expression()
+            expr = (yield self.parse_expression())
             self.consume(TokenType.SEMI)
             return expr  # si deseas envolver en ExpressionStatement, hazlo aquí
 
         # si no es ninguna de las anteriores, intento un assignment
-        return self.parse_assignment()
+        return (yield self.parse_assignment())
 
     # assignment ::= location '=' expression ';'
     def parse_assignment(self):
-        loc = self.parse_location()
+        loc = (yield self.parse_location())
         self.consume(TokenType.ASSIGN)
-        expr = self.parse_expression()
+        expr = (yield self.parse_expression())
         self.consume(TokenType.SEMI)
-        return Assignment(loc, expr)
+        return self.builder.Assignment(loc, expr)
 
     # vardecl ::= ('var'|'const') ID (tipo)? ('=' expr)? ';'
     def parse_vardecl(self):
@@ -92,11 +290,12 @@ class Parser:
         self.advance_token()  # consume var/const
 
         id_tok = self.consume(TokenType.IDENTIFIER)
-        identifier = Identifier(id_tok.valor)
+        identifier = self.builder.Identifier(id_tok.valor)
+        self.builder.span(identifier, id_tok.pos, id_tok.fin)
 
         var_type = None
         ct = self.current_token()
-        if ct and ct.tipo == TokenType.IDENTIFIER and ct.valor in ('int','float','char','bool'):
+        if ct and ct.tipo == TokenType.IDENTIFIER and ct.valor in TYPE_NAMES:
             var_type = ct.valor
             self.advance_token()
 
@@ -104,10 +303,10 @@ class Parser:
         ct = self.current_token()
         if ct and ct.tipo == TokenType.ASSIGN:
             self.advance_token()
-            init = self.parse_expression()
+            init = (yield self.parse_expression())
 
         self.consume(TokenType.SEMI)
-        return VarDeclaration(is_const, identifier, var_type, init)
+        return self.builder.VarDeclaration(is_const, identifier, var_type, init)
 
     # funcdecl ::= 'import'? 'func' ID '(' parameters ')' (tipo)? '{' stmt* '}'
     def parse_funcdecl(self):
@@ -118,7 +317,8 @@ class Parser:
 
         self.consume(TokenType.FUNC)
         id_tok = self.consume(TokenType.IDENTIFIER)
-        func_name = Identifier(id_tok.valor)
+        func_name = self.builder.Identifier(id_tok.valor)
+        self.builder.span(func_name, id_tok.pos, id_tok.fin)
 
         self.consume(TokenType.LPAREN)
         params = self.parse_parameters()
@@ -126,17 +326,17 @@ class Parser:
 
         ret_type = None
         ct = self.current_token()
-        if ct and ct.tipo == TokenType.IDENTIFIER and ct.valor in ('int','float','char','bool'):
+        if ct and ct.tipo == TokenType.IDENTIFIER and ct.valor in TYPE_NAMES:
             ret_type = ct.valor
             self.advance_token()
 
         self.consume(TokenType.LBRACE)
         body = []
         while self.current_token() and self.current_token().tipo != TokenType.RBRACE:
-            body.append(self.parse_statement())
+            body.append((yield self.parse_statement()))
         self.consume(TokenType.RBRACE)
 
-        return FuncDeclaration(is_import, func_name, params, ret_type, body)
+        return self.builder.FuncDeclaration(is_import, func_name, params, ret_type, body)
 
     def parse_parameters(self):
         params = []
@@ -151,21 +351,22 @@ class Parser:
 
     def parse_parameter(self):
         id_tok = self.consume(TokenType.IDENTIFIER)
-        identifier = Identifier(id_tok.valor)
+        identifier = self.builder.Identifier(id_tok.valor)
+        self.builder.span(identifier, id_tok.pos, id_tok.fin)
         ct = self.current_token()
-        if not ct or not (ct.tipo == TokenType.IDENTIFIER and ct.valor in ('int','float','char','bool')):
+        if not ct or not (ct.tipo == TokenType.IDENTIFIER and ct.valor in TYPE_NAMES):
             error(ct, "tipo válido (int, float, char, bool)")
         param_type = ct.valor
         self.advance_token()
-        return Parameter(identifier, param_type)
+        return self.spanned(self.builder.Parameter(identifier, param_type), id_tok.pos)
 
     def parse_if_stmt(self):
         self.consume(TokenType.IF)
-        cond = self.parse_expression()
+        cond = (yield self.parse_expression())
         self.consume(TokenType.LBRACE)
         then_body = []
         while self.current_token() and self.current_token().tipo != TokenType.RBRACE:
-            then_body.append(self.parse_statement())
+            then_body.append((yield self.parse_statement()))
         self.consume(TokenType.RBRACE)
 
         else_body = None
@@ -175,125 +376,139 @@ class Parser:
             self.consume(TokenType.LBRACE)
             else_body = []
             while self.current_token() and self.current_token().tipo != TokenType.RBRACE:
-                else_body.append(self.parse_statement())
+                else_body.append((yield self.parse_statement()))
             self.consume(TokenType.RBRACE)
 
-        return IfStatement(cond, then_body, else_body)
+        return self.builder.IfStatement(cond, then_body, else_body)
 
     def parse_while_stmt(self):
         self.consume(TokenType.WHILE)
-        cond = self.parse_expression()
+        cond = (yield self.parse_expression())
         self.consume(TokenType.LBRACE)
         body = []
         while self.current_token() and self.current_token().tipo != TokenType.RBRACE:
-            body.append(self.parse_statement())
+            body.append((yield self.parse_statement()))
         self.consume(TokenType.RBRACE)
-        return WhileStatement(cond, body)
+        return self.builder.WhileStatement(cond, body)
 
     def parse_return_stmt(self):
         self.consume(TokenType.RETURN)
-        expr = self.parse_expression()
+        expr = (yield self.parse_expression())
         self.consume(TokenType.SEMI)
-        return ReturnStatement(expr)
+        return self.builder.ReturnStatement(expr)
 
     def parse_print_stmt(self):
         self.consume(TokenType.PRINT)
-        expr = self.parse_expression()
+        expr = (yield self.parse_expression())
         self.consume(TokenType.SEMI)
-        return PrintStatement(expr)
+        return self.builder.PrintStatement(expr)
 
     def parse_location(self):
         ct = self.current_token()
         if ct.tipo == TokenType.IDENTIFIER:
-            id_tok = self.consume(TokenType.IDENTIFIER)
-            return Location(Identifier(id_tok.valor))
+            self.advance_token()
+            return self._create_location(ct)
         if ct.tipo == TokenType.DEREF:
             self.advance_token()
-            expr = self.parse_expression()
-            return Location(expr, is_deref=True)
+            expr = (yield self.parse_expression())
+            return self.spanned(self.builder.Location(expr, is_deref=True), ct.pos)
         error(ct, "location (IDENTIFIER o backtick)")
 
-    def parse_expression(self):
-        node = self.parse_orterm()
-        while (ct := self.current_token()) and ct.tipo == TokenType.LOR:
-            op = ct.valor
-            self.advance_token()
-            node = BinaryOp(node, op, self.parse_orterm())
-        return node
-
-    def parse_orterm(self):
-        node = self.parse_andterm()
-        while (ct := self.current_token()) and ct.tipo == TokenType.LAND:
-            op = ct.valor
-            self.advance_token()
-            node = BinaryOp(node, op, self.parse_andterm())
-        return node
-
-    def parse_andterm(self):
-        node = self.parse_relterm()
-        rel_ops = {TokenType.LT, TokenType.GT, TokenType.LE, TokenType.GE, TokenType.EQ, TokenType.NE}
-        while (ct := self.current_token()) and ct.tipo in rel_ops:
-            op = ct.valor
-            self.advance_token()
-            node = BinaryOp(node, op, self.parse_relterm())
-        return node
-
-    def parse_relterm(self):
-        node = self.parse_addterm()
-        while (ct := self.current_token()) and ct.tipo in (TokenType.PLUS, TokenType.MINUS):
+    # expression ::= factor (binop factor)*
+    # Precedence climbing dirigido por BINARY_OPERATORS. Los operandos se
+    # leen con parse_factor y solo se abre un nivel nuevo cuando el operador
+    # siguiente liga más fuerte, así que una cadena del mismo nivel
+    # (a + b - c ...) cuesta un frame por operando.
+    def parse_expression(self, min_precedence=1, node=None, start=0):
+        # 'start' es el offset donde empieza 'node'; los spans de BinaryOp
+        # salen de los tokens y no de los operandos, que pueden ser nodos
+        # compartidos (HashConsBuilder) con el span de otra aparición
+        if node is None:
+            ct = self.current_token()
+            start = ct.pos if ct else 0
+            node = self.parse_leaf()
+            if node is None:
+                node = yield self.parse_factor()
+        operators = BINARY_OPERATORS
+        ct = self.current_token()
+        while ct and (entry := operators.get(ct.tipo)) and entry[0] >= min_precedence:
+            precedence = entry[0]
             op = ct.valor
-            self.advance_token()
-            node = BinaryOp(node, op, self.parse_addterm())
+            ct = self.advance_token()
+            right_start = ct.pos if ct else 0
+            right = self.parse_leaf()
+            if right is None:
+                right = yield self.parse_factor()
+            ct = self.current_token()
+            while ct and (entry := operators.get(ct.tipo)) and (
+                    entry[0] > precedence or (entry[0] == precedence and entry[1] == 'right')):
+                right = yield self.parse_expression(entry[0], right, right_start)
+                ct = self.current_token()
+            node = self.spanned(self.builder.BinaryOp(node, op, right), start)
         return node
 
-    def parse_addterm(self):
-        node = self.parse_factor()
-        while (ct := self.current_token()) and ct.tipo in (TokenType.TIMES, TokenType.DIVIDE):
-            op = ct.valor
+    def parse_leaf(self):
+        """
+        Literales e identificadores simples: los factores más comunes, que
+        no tienen subexpresiones, se construyen sin crear un generador.
+        Retorna None si el factor necesita parse_factor.
+        """
+        ct = self.current_token()
+        if ct is None:
+            return None
+        if ct.tipo in LITERAL_TOKENS:
             self.advance_token()
-            node = BinaryOp(node, op, self.parse_factor())
-        return node
+            return self._create_literal(ct)
+        if ct.tipo == TokenType.IDENTIFIER and ct.valor not in TYPE_NAMES:
+            next_tok = peek(self.tokens, self.index+1)
+            if not next_tok or next_tok.tipo != TokenType.LPAREN:
+                self.advance_token()
+                return self._create_location(ct)
+        return None
 
     def parse_factor(self):
         ct = self.current_token()
         if not ct:
             error(ct, "factor")
 
-        if ct.tipo in (TokenType.INTEGER, TokenType.FLOAT, TokenType.CHAR, TokenType.TRUE, TokenType.FALSE):
+        if ct.tipo in LITERAL_TOKENS:
             self.advance_token()
             return self._create_literal(ct)
 
         if ct.tipo in (TokenType.PLUS, TokenType.MINUS, TokenType.GROW):
             op = ct.valor
             self.advance_token()
-            return UnaryOp(op, self.parse_expression())
+            return self.spanned(self.builder.UnaryOp(op, (yield self.parse_expression())), ct.pos)
 
         if ct.tipo == TokenType.LPAREN:
             self.advance_token()
-            expr = self.parse_expression()
+            expr = (yield self.parse_expression())
             self.consume(TokenType.RPAREN)
-            return expr
+            # el span de una expresión entre paréntesis los incluye
+            return self.spanned(expr, ct.pos)
 
-        if ct.tipo == TokenType.IDENTIFIER and ct.valor in ('int','float','char','bool'):
+        if ct.tipo == TokenType.IDENTIFIER and ct.valor in TYPE_NAMES:
             target = ct.valor
             self.advance_token()
             self.consume(TokenType.LPAREN)
-            expr = self.parse_expression()
+            expr = (yield self.parse_expression())
             self.consume(TokenType.RPAREN)
-            return Cast(target, expr)
+            return self.spanned(self.builder.Cast(target, expr), ct.pos)
 
         if ct.tipo == TokenType.IDENTIFIER:
             next_tok = peek(self.tokens, self.index+1)
             if next_tok and next_tok.tipo == TokenType.LPAREN:
                 id_tok = self.consume(TokenType.IDENTIFIER)
+                identifier = self.builder.Identifier(id_tok.valor)
+                self.builder.span(identifier, id_tok.pos, id_tok.fin)
                 self.consume(TokenType.LPAREN)
-                args = self.parse_arguments()
+                args = (yield self.parse_arguments())
                 self.consume(TokenType.RPAREN)
-                return FunctionCall(Identifier(id_tok.valor), args)
-            return self.parse_location()
+                return self.spanned(self.builder.FunctionCall(identifier, args), id_tok.pos)
+            return (yield self.parse_location())
 
         if ct.tipo == TokenType.DEREF:
-            return self.parse_location()
+            return (yield self.parse_location())
 
         error(ct, "factor válido")
 
@@ -301,105 +516,225 @@ class Parser:
         args = []
         if self.current_token() and self.current_token().tipo == TokenType.RPAREN:
             return args
-        args.append(self.parse_expression())
+        args.append((yield self.parse_expression()))
         while self.current_token() and self.current_token().tipo == TokenType.COMMA:
             self.advance_token()
-            args.append(self.parse_expression())
+            args.append((yield self.parse_expression()))
         return args
 
     def _create_literal(self, tok):
         if tok.tipo == TokenType.INTEGER:
-            return Literal(int(tok.valor))
-        if tok.tipo == TokenType.FLOAT:
-            return Literal(float(tok.valor))
-        if tok.tipo == TokenType.CHAR:
-            return Literal(tok.valor.strip("'"))
-        if tok.tipo == TokenType.TRUE:
-            return Literal(True)
-        if tok.tipo == TokenType.FALSE:
-            return Literal(False)
-        error(tok, "literal válido")
+            node = self.builder.Literal(int(tok.valor))
+        elif tok.tipo == TokenType.FLOAT:
+            node = self.builder.Literal(float(tok.valor))
+        elif tok.tipo == TokenType.CHAR:
+            node = self.builder.Literal(tok.valor.strip("'"))
+        elif tok.tipo == TokenType.TRUE:
+            node = self.builder.Literal(True)
+        elif tok.tipo == TokenType.FALSE:
+            node = self.builder.Literal(False)
+        else:
+            error(tok, "literal válido")
+        self.builder.span(node, tok.pos, tok.fin)
+        return node
+
+    def _create_location(self, tok):
+        identifier = self.builder.Identifier(tok.valor)
+        self.builder.span(identifier, tok.pos, tok.fin)
+        node = self.builder.Location(identifier)
+        self.builder.join_span(node, identifier, identifier)
+        return node
 
 # Serialización a JSON del AST
 
 def ast_to_dict(node):
     """Convierte el árbol AST en un diccionario serializable a JSON."""
-    if isinstance(node, Program):
-        return {"type": "Program", "statements": [ast_to_dict(s) for s in node.statements]}
+    return _DictConverter().run(node)
+
+
+class _DictConverter(Visitor):
+    # Los visit_* con hijos son generadores para trampoline: los hijos se
+    # convierten con 'yield', así que la profundidad del árbol no está
+    # limitada por la pila de Python.
+
+    def generic_visit(self, node):
+        return {"error": f"Unknown AST node type: {node.__class__.__name__}"}
+
+    def convert_list(self, nodes):
+        result = []
+        for n in nodes:
+            result.append((yield self.visit(n)))
+        return result
 
-    if isinstance(node, VarDeclaration):
+    def visit_Program(self, node):
+        return {"type": "Program", "statements": (yield self.convert_list(node.statements))}
+
+    def visit_VarDeclaration(self, node):
         return {
             "type": "VarDeclaration",
             "is_const": node.is_const,
-            "identifier": ast_to_dict(node.identifier),
+            "identifier": (yield self.visit(node.identifier)),
             "var_type": node.var_type,
-            "initializer": ast_to_dict(node.initializer) if node.initializer else None
+            "initializer": (yield self.visit(node.initializer)) if node.initializer else None
         }
 
-    if isinstance(node, Assignment):
-        return {"type": "Assignment", "location": ast_to_dict(node.location), "expression": ast_to_dict(node.expression)}
+    def visit_Assignment(self, node):
+        return {"type": "Assignment", "location": (yield self.visit(node.location)),
+                "expression": (yield self.visit(node.expression))}
 
-    if isinstance(node, FuncDeclaration):
+    def visit_FuncDeclaration(self, node):
         return {
             "type": "FuncDeclaration",
             "is_import": node.is_import,
-            "func_name": ast_to_dict(node.func_name),
-            "parameters": [ast_to_dict(p) for p in node.parameters],
+            "func_name": (yield self.visit(node.func_name)),
+            "parameters": (yield self.convert_list(node.parameters)),
             "return_type": node.return_type,
-            "body": [ast_to_dict(s) for s in node.body]
+            "body": (yield self.convert_list(node.body))
         }
 
-    if isinstance(node, IfStatement):
+    def visit_IfStatement(self, node):
         return {
             "type": "IfStatement",
-            "condition": ast_to_dict(node.condition),
-            "then_body": [ast_to_dict(s) for s in node.then_body],
-            "else_body": [ast_to_dict(s) for s in node.else_body] if node.else_body else None
+            "condition": (yield self.visit(node.condition)),
+            "then_body": (yield self.convert_list(node.then_body)),
+            "else_body": (yield self.convert_list(node.else_body)) if node.else_body else None
         }
 
-    if isinstance(node, WhileStatement):
-        return {"type": "WhileStatement", "condition": ast_to_dict(node.condition), "body": [ast_to_dict(s) for s in node.body]}
+    def visit_WhileStatement(self, node):
+        return {"type": "WhileStatement", "condition": (yield self.visit(node.condition)),
+                "body": (yield self.convert_list(node.body))}
 
-    if isinstance(node, BreakStatement):
+    def visit_BreakStatement(self, node):
         return {"type": "BreakStatement"}
 
-    if isinstance(node, ContinueStatement):
+    def visit_ContinueStatement(self, node):
         return {"type": "ContinueStatement"}
 
-    if isinstance(node, ReturnStatement):
-        return {"type": "ReturnStatement", "expression": ast_to_dict(node.expression)}
+    def visit_ReturnStatement(self, node):
+        return {"type": "ReturnStatement", "expression": (yield self.visit(node.expression))}
+
+    def visit_PrintStatement(self, node):
+        return {"type": "PrintStatement", "expression": (yield self.visit(node.expression))}
 
-    if isinstance(node, PrintStatement):
-        return {"type": "PrintStatement", "expression": ast_to_dict(node.expression)}
+    def visit_ErrorStatement(self, node):
+        return {"type": "ErrorStatement", "message": node.message}
 
-    if isinstance(node, BinaryOp):
-        return {"type": "BinaryOp", "left": ast_to_dict(node.left), "operator": node.operator, "right": ast_to_dict(node.right)}
+    def visit_BinaryOp(self, node):
+        return {"type": "BinaryOp", "left": (yield self.visit(node.left)), "operator": node.operator,
+                "right": (yield self.visit(node.right))}
 
-    if isinstance(node, UnaryOp):
-        return {"type": "UnaryOp", "operator": node.operator, "expression": ast_to_dict(node.expression)}
+    def visit_UnaryOp(self, node):
+        return {"type": "UnaryOp", "operator": node.operator, "expression": (yield self.visit(node.expression))}
 
-    if isinstance(node, Literal):
+    def visit_Literal(self, node):
         return {"type": "Literal", "value": node.value}
 
-    if isinstance(node, Identifier):
+    def visit_Identifier(self, node):
         return {"type": "Identifier", "name": node.name}
 
-    if isinstance(node, FunctionCall):
-        return {"type": "FunctionCall", "identifier": ast_to_dict(node.identifier), "arguments": [ast_to_dict(a) for a in node.arguments]}
-
-    if isinstance(node, Location):
-        return {"type": "Location", "base": ast_to_dict(node.base), "is_deref": node.is_deref}
-
-    if isinstance(node, Cast):
-        return {"type": "Cast", "target_type": node.target_type, "expression": ast_to_dict(node.expression)}
-
-    if isinstance(node, Parameter):
-        return {"type": "Parameter", "identifier": ast_to_dict(node.identifier), "param_type": node.param_type}
-
-    return {"error": f"Unknown AST node type: {node.__class__.__name__}"}
+    def visit_FunctionCall(self, node):
+        return {"type": "FunctionCall", "identifier": (yield self.visit(node.identifier)),
+                "arguments": (yield self.convert_list(node.arguments))}
+
+    def visit_Location(self, node):
+        return {"type": "Location", "base": (yield self.visit(node.base)), "is_deref": node.is_deref}
+
+    def visit_Cast(self, node):
+        return {"type": "Cast", "target_type": node.target_type, "expression": (yield self.visit(node.expression))}
+
+    def visit_Parameter(self, node):
+        return {"type": "Parameter", "identifier": (yield self.visit(node.identifier)), "param_type": node.param_type}
+
+
+# Campos de cada nodo en el JSON: (clave, atributo, clase de campo). Las
+# claves son los nombres de _fields, salvo FuncDeclaration.func_name.
+_JSON_FIELDS = {
+    cls.__name__: [('func_name' if (cls, name) == (FuncDeclaration, 'identifier') else name, name, kind)
+                   for name, kind in cls._fields]
+    for cls in NODE_CLASSES
+}
+
+
+def _json_scalar(value):
+    if isinstance(value, str):
+        return encode_basestring_ascii(value)
+    if value is None:
+        return 'null'
+    if value is True:
+        return 'true'
+    if value is False:
+        return 'false'
+    if isinstance(value, int):
+        return int.__repr__(value)
+    return json.dumps(value)
+
+
+class _JSONWriter:
+    def __init__(self, out, indent):
+        self.out = out
+        self.indent = indent
+        self.chunks = []
+        self.newlines = ['\n']  # newlines[n]: salto de línea con sangría de nivel n
+
+    def newline(self, level):
+        while len(self.newlines) <= level:
+            self.newlines.append('\n' + ' ' * (self.indent * len(self.newlines)))
+        return self.newlines[level]
+
+    def emit(self, text):
+        self.chunks.append(text)
+        if len(self.chunks) >= 8192:
+            self.flush()
+
+    def flush(self):
+        self.out.write(''.join(self.chunks))
+        self.chunks.clear()
+
+    def node(self, node, level):
+        # generador para trampoline, como los visit_* de _DictConverter
+        name = node.__class__.__name__
+        fields = _JSON_FIELDS.get(name)
+        inner = self.newline(level + 1)
+        if fields is None:
+            self.emit('{' + inner + '"error": ' + _json_scalar(f"Unknown AST node type: {name}")
+                      + self.newline(level) + '}')
+            return
+        self.emit('{' + inner + '"type": ' + encode_basestring_ascii(name))
+        for key, attr, kind in fields:
+            self.emit(',' + inner + encode_basestring_ascii(key) + ': ')
+            value = getattr(node, attr)
+            if kind == 'value':
+                self.emit(_json_scalar(value))
+            elif not value and kind in ('node?', 'list?'):
+                self.emit('null')
+            elif kind in ('node', 'node?'):
+                yield self.node(value, level + 1)
+            elif not value:
+                self.emit('[]')
+            else:
+                item_line = self.newline(level + 2)
+                self.emit('[' + item_line)
+                for i, item in enumerate(value):
+                    if i:
+                        self.emit(',' + item_line)
+                    yield self.node(item, level + 2)
+                self.emit(inner + ']')
+        self.emit(self.newline(level) + '}')
+
+
+def write_ast_json(ast, out, indent=2):
+    """
+    Escribe en 'out' exactamente lo mismo que
+    json.dump(ast_to_dict(ast), out, indent=indent), pero directamente
+    desde el AST: no construye los diccionarios intermedios y la memoria
+    extra solo depende de la profundidad del árbol.
+    """
+    writer = _JSONWriter(out, indent)
+    trampoline(writer.node(ast, 0))
+    writer.flush()
 
 
 def write_ast_to_json(ast, filename='ast_output.json'):
     with open(filename, 'w') as f:
-        json.dump(ast_to_dict(ast), f, indent=2)
+        write_ast_json(ast, f)
     print(f"AST escrito en {filename}")
@@ -58,12 +58,27 @@ class TokenType:
 
     EOF = 'eof'
 
+# Código compacto (0..255) de cada tipo de token, para guardarlos en arrays
+TOKEN_TYPES = [valor for nombre, valor in vars(TokenType).items() if not nombre.startswith('_')]
+TOKEN_CODES = {tipo: codigo for codigo, tipo in enumerate(TOKEN_TYPES)}
+
 class Token:
-    def __init__(self, tipo, valor, linea=0, columna=0):
+    def __init__(self, tipo, valor, pos=0, lines=None, fin=None):
         self.tipo = tipo
         self.valor = valor
-        self.linea = linea
-        self.columna = columna
+        # Offsets de inicio y fin del lexema en el fuente; línea y columna se
+        # resuelven bajo demanda a partir del LineIndex compartido del lexer.
+        self.pos = pos
+        self.fin = pos if fin is None else fin
+        self.lines = lines
+
+    @property
+    def linea(self):
+        return self.lines.position(self.pos)[0] if self.lines is not None else 0
+
+    @property
+    def columna(self):
+        return self.lines.position(self.pos)[1] if self.lines is not None else 0
 
     def __repr__(self):
         return f"Token({self.tipo}, {repr(self.valor)}, línea={self.linea}, columna={self.columna})"
@@ -0,0 +1,265 @@
+# ast_arena.py
+
+from array import array
+
+from AST import NODE_CLASSES
+
+# Código de tipo de cada clase de AST.py
+KIND_CODES = {cls.__name__: code for code, cls in enumerate(NODE_CLASSES)}
+
+# Pseudo-tipo para las listas de nodos (cuerpo de un if, argumentos, ...):
+# sus hijos son los elementos de la lista.
+BLOCK = len(NODE_CLASSES)
+
+# Hijo o hermano inexistente, y span desconocido
+NIL = 0xFFFFFFFF
+NO_SPAN = 0xFFFFFFFFFFFFFFFF
+_SPAN_MASK = (1 << 32) - 1
+
+
+class ASTArena:
+    """
+    AST completo guardado en arrays paralelos, indexados por id de nodo:
+
+      kinds        array('B')  código del tipo (ver NODE_CLASSES, BLOCK)
+      first_child  array('I')  primer hijo, o NIL
+      next_sibling array('I')  siguiente hermano, o NIL
+      data         array('I')  índice en 'values' de los campos 'value'
+      spans        array('Q')  inicio << 32 | fin, o NO_SPAN
+
+    Los hijos de un nodo son sus campos 'node' y 'list' en el orden de
+    _fields; cada lista es un nodo BLOCK. Los campos 'value' de un nodo se
+    guardan juntos en una tupla de 'values' (deduplicada), seguida de un
+    flag por cada campo opcional ('node?', 'list?') que indica si está
+    presente.
+
+    Un árbol de millones de nodos son cinco buffers contiguos y una tabla de
+    valores: se serializa con pickle sin recorrer objetos y el recolector
+    de basura no tiene nada que visitar.
+    """
+
+    def __init__(self):
+        self.kinds = array('B')
+        self.first_child = array('I')
+        self.next_sibling = array('I')
+        self.data = array('I')
+        self.spans = array('Q')
+        self.values = []
+        self._value_ids = {}
+        self.root = NIL
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def intern(self, values):
+        # la clave incluye los tipos: True == 1 pero son literales distintos
+        key = (*map(type, values), *values)
+        value_id = self._value_ids.get(key)
+        if value_id is None:
+            value_id = self._value_ids[key] = len(self.values)
+            self.values.append(values)
+        return value_id
+
+    def add(self, kind, children, values=()):
+        """Agrega un nodo cuyos hijos ya están en la arena y retorna su id."""
+        node = len(self.kinds)
+        self.kinds.append(kind)
+        self.data.append(self.intern(values))
+        self.spans.append(NO_SPAN)
+        self.next_sibling.append(NIL)
+        if children:
+            next_sibling = self.next_sibling
+            previous = children[0]
+            for child in children[1:]:
+                next_sibling[previous] = child
+                previous = child
+            self.first_child.append(children[0])
+        else:
+            self.first_child.append(NIL)
+        return node
+
+    def children(self, node):
+        child = self.first_child[node]
+        next_sibling = self.next_sibling
+        while child != NIL:
+            yield child
+            child = next_sibling[child]
+
+    def kind(self, node):
+        """Nombre del tipo del nodo ('BinaryOp', ...), o 'Block'."""
+        code = self.kinds[node]
+        return NODE_CLASSES[code].__name__ if code != BLOCK else 'Block'
+
+    def node(self, node):
+        """Vista del nodo 'node' con la interfaz de la clase de AST.py."""
+        return VIEW_CLASSES[self.kinds[node]](self, node)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_value_ids']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._value_ids = {(*map(type, values), *values): i
+                           for i, values in enumerate(self.values)}
+
+
+class ArenaBuilder:
+    """
+    Constructor de nodos para Parser(builder=ArenaBuilder()): en lugar de
+    objetos crea filas en una ASTArena. Tiene un método por clase de AST.py
+    con la misma firma que su constructor, que recibe ids en vez de nodos y
+    retorna el id nuevo. parse() retorna la vista del Program.
+    """
+
+    def __init__(self, arena=None):
+        self.arena = arena if arena is not None else ASTArena()
+        for cls in NODE_CLASSES:
+            setattr(self, cls.__name__, self._constructor(cls))
+
+    def _constructor(self, cls):
+        arena = self.arena
+        add = arena.add
+        kind = KIND_CODES[cls.__name__]
+        fields = cls._fields
+        defaults = getattr(cls.__init__, '__defaults__', None) or ()
+        first_default = len(fields) - len(defaults)
+
+        child_index = [i for i, (_, field_kind) in enumerate(fields) if field_kind != 'value']
+        value_index = [i for i, (_, field_kind) in enumerate(fields) if field_kind == 'value']
+        simple = all(field_kind in ('node', 'value') for _, field_kind in fields)
+
+        def build(*args, **kwargs):
+            if kwargs or len(args) < len(fields):
+                args = args + tuple(kwargs[name] if name in kwargs else defaults[i - first_default]
+                                    for i, (name, _) in enumerate(fields) if i >= len(args))
+            if simple:
+                # la mayoría de los nodos: sin listas ni campos opcionales
+                return add(kind, [args[i] for i in child_index],
+                           tuple([args[i] for i in value_index]))
+            children = []
+            present = []
+            for i in child_index:
+                value = args[i]
+                field_kind = fields[i][1]
+                if field_kind in ('node?', 'list?'):
+                    present.append(value is not None)
+                    if value is None:
+                        continue
+                if field_kind in ('list', 'list?'):
+                    value = add(BLOCK, value)
+                children.append(value)
+            return add(kind, children, tuple([args[i] for i in value_index] + present))
+
+        build.__name__ = cls.__name__
+        return build
+
+    def span(self, node, start, end):
+        self.arena.spans[node] = start << 32 | end
+        return node
+
+    def join_span(self, node, first, last):
+        spans = self.arena.spans
+        spans[node] = spans[first] & ~_SPAN_MASK | spans[last] & _SPAN_MASK
+        return node
+
+    def finish(self, root):
+        self.arena.root = root
+        return self.arena.node(root)
+
+
+# -------------------------------
+# Vistas: adaptador objeto <-> arena
+# -------------------------------
+
+class _ArenaView:
+    """
+    Métodos comunes de las vistas. Cada vista es una subclase de la clase
+    de AST.py con el mismo nombre, así que isinstance y el despacho por
+    nombre de clase (SemanticAnalyzer, IRGenerator, ast_to_dict) funcionan
+    igual sobre ambas representaciones. Una vista es solo (arena, id): dos
+    vistas del mismo nodo son iguales aunque no sean el mismo objeto.
+    """
+    __slots__ = ()
+
+    @property
+    def span(self):
+        packed = self.arena.spans[self.id]
+        if packed == NO_SPAN:
+            return None
+        return packed >> 32, packed & _SPAN_MASK
+
+    @span.setter
+    def span(self, value):
+        start, end = value
+        self.arena.spans[self.id] = start << 32 | end
+
+    def __eq__(self, other):
+        return isinstance(other, _ArenaView) and self.arena is other.arena and self.id == other.id
+
+    def __hash__(self):
+        return hash((id(self.arena), self.id))
+
+
+def _value_property(index):
+    def get(self):
+        return self.arena.values[self.arena.data[self.id]][index]
+
+    def set(self, value):
+        # p. ej. el analizador reemplaza un return_type desconocido
+        arena = self.arena
+        values = list(arena.values[arena.data[self.id]])
+        values[index] = value
+        arena.data[self.id] = arena.intern(tuple(values))
+    return property(get, set)
+
+
+def _child_property(position, optional_flags, flag, field_kind):
+    """
+    Propiedad del campo hijo número 'position'. Los campos opcionales
+    anteriores que estén ausentes no ocupan lugar en la cadena de hermanos:
+    'optional_flags' son los índices de sus flags en la tupla de valores y
+    'flag' el del propio campo, si es opcional.
+    """
+    def get(self):
+        arena = self.arena
+        node = self.id
+        values = arena.values[arena.data[node]]
+        if flag is not None and not values[flag]:
+            return None
+        child = arena.first_child[node]
+        for _ in range(position - sum(1 for f in optional_flags if not values[f])):
+            child = arena.next_sibling[child]
+        if field_kind in ('list', 'list?'):
+            return [arena.node(c) for c in arena.children(child)]
+        return arena.node(child)
+    return property(get)
+
+
+def _view_class(cls):
+    def __init__(self, arena, node):
+        self.arena = arena
+        self.id = node
+
+    attrs = {'__slots__': ('arena', 'id'), '__module__': __name__, '__init__': __init__}
+    value_names = [name for name, kind in cls._fields if kind == 'value']
+    flags = {}
+    for name, kind in cls._fields:
+        if kind in ('node?', 'list?'):
+            flags[name] = len(value_names) + len(flags)
+
+    position = 0
+    seen_flags = []
+    for name, kind in cls._fields:
+        if kind == 'value':
+            attrs[name] = _value_property(value_names.index(name))
+            continue
+        attrs[name] = _child_property(position, tuple(seen_flags), flags.get(name), kind)
+        if name in flags:
+            seen_flags.append(flags[name])
+        position += 1
+    return type(cls.__name__, (_ArenaView, cls), attrs)
+
+
+VIEW_CLASSES = [_view_class(cls) for cls in NODE_CLASSES]
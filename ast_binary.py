@@ -0,0 +1,218 @@
+# ast_binary.py
+"""
+Formato binario compacto del AST.
+
+    archivo ::= MAGIC nodo
+    nodo    ::= tipo:byte span campo*
+    span    ::= 0 | (inicio + 1):varint (fin - inicio):varint
+
+Los campos van en el orden de _fields de la clase:
+
+    'node'   nodo
+    'node?'  0 | 1 nodo
+    'list'   n:varint nodo*n
+    'list?'  0 (None) | (n + 1):varint nodo*n
+    'value'  valor etiquetado (ver _NONE ... _STRING_REF)
+
+Los enteros son varint LEB128 (con zigzag si pueden ser negativos). Cada
+cadena se escribe completa la primera vez y luego se referencia por su
+índice, así que los nombres repetidos ocupan uno o dos bytes.
+"""
+
+import struct
+
+from AST import NODE_CLASSES
+from Parser import ObjectBuilder
+from utils import trampoline
+
+MAGIC = b'MANIAST\x01'
+
+KIND_CODES = {cls: code for code, cls in enumerate(NODE_CLASSES)}
+
+# Etiquetas de valores
+_NONE, _FALSE, _TRUE, _INT, _FLOAT, _STRING, _STRING_REF = range(7)
+
+_DOUBLE = struct.Struct('<d')
+
+
+def _kind_code(node):
+    # las vistas de ast_arena son subclases de las clases de AST.py
+    for cls in type(node).__mro__:
+        code = KIND_CODES.get(cls)
+        if code is not None:
+            return code, cls
+    raise TypeError(f"No se puede serializar {node.__class__.__name__}")
+
+
+class _Encoder:
+    def __init__(self):
+        self.out = bytearray(MAGIC)
+        self.strings = {}
+
+    def varint(self, value):
+        out = self.out
+        while value >= 0x80:
+            out.append(value & 0x7F | 0x80)
+            value >>= 7
+        out.append(value)
+
+    def value(self, value):
+        out = self.out
+        if value is None:
+            out.append(_NONE)
+        elif value is True:
+            out.append(_TRUE)
+        elif value is False:
+            out.append(_FALSE)
+        elif isinstance(value, int):
+            out.append(_INT)
+            self.varint(value << 1 if value >= 0 else (-value << 1) - 1)
+        elif isinstance(value, float):
+            out.append(_FLOAT)
+            out += _DOUBLE.pack(value)
+        elif isinstance(value, str):
+            index = self.strings.get(value)
+            if index is None:
+                self.strings[value] = len(self.strings)
+                data = value.encode('utf-8')
+                out.append(_STRING)
+                self.varint(len(data))
+                out += data
+            else:
+                out.append(_STRING_REF)
+                self.varint(index)
+        else:
+            raise TypeError(f"Valor no serializable en el AST: {value!r}")
+
+    def node(self, node):
+        # generador para trampoline: los hijos se escriben con 'yield'
+        code, cls = _kind_code(node)
+        self.out.append(code)
+        span = node.span
+        if span is None:
+            self.out.append(0)
+        else:
+            self.varint(span[0] + 1)
+            self.varint(span[1] - span[0])
+        for name, kind in cls._fields:
+            value = getattr(node, name)
+            if kind == 'value':
+                self.value(value)
+            elif kind == 'node':
+                yield self.node(value)
+            elif kind == 'node?':
+                if value is None:
+                    self.out.append(0)
+                else:
+                    self.out.append(1)
+                    yield self.node(value)
+            else:
+                if kind == 'list?':
+                    self.varint(0 if value is None else len(value) + 1)
+                else:
+                    self.varint(len(value))
+                for item in value or ():
+                    yield self.node(item)
+
+
+class _Decoder:
+    def __init__(self, data, builder):
+        if bytes(data[:len(MAGIC)]) != MAGIC:
+            raise ValueError("No es un AST binario de Mani (cabecera inválida)")
+        self.data = data
+        self.pos = len(MAGIC)
+        self.strings = []
+        self.builder = builder
+
+    def varint(self):
+        data = self.data
+        result = shift = 0
+        while True:
+            byte = data[self.pos]
+            self.pos += 1
+            result |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                return result
+            shift += 7
+
+    def value(self):
+        tag = self.data[self.pos]
+        self.pos += 1
+        if tag == _NONE:
+            return None
+        if tag == _FALSE:
+            return False
+        if tag == _TRUE:
+            return True
+        if tag == _INT:
+            zigzag = self.varint()
+            return zigzag >> 1 if not zigzag & 1 else -((zigzag + 1) >> 1)
+        if tag == _FLOAT:
+            value, = _DOUBLE.unpack_from(self.data, self.pos)
+            self.pos += _DOUBLE.size
+            return value
+        if tag == _STRING:
+            size = self.varint()
+            value = bytes(self.data[self.pos:self.pos + size]).decode('utf-8')
+            self.pos += size
+            self.strings.append(value)
+            return value
+        if tag == _STRING_REF:
+            return self.strings[self.varint()]
+        raise ValueError(f"Etiqueta de valor desconocida {tag} en el byte {self.pos - 1}")
+
+    def node(self):
+        cls = NODE_CLASSES[self.data[self.pos]]
+        self.pos += 1
+        start = self.varint()
+        span = (start - 1, start - 1 + self.varint()) if start else None
+        args = []
+        for name, kind in cls._fields:
+            if kind == 'value':
+                args.append(self.value())
+            elif kind == 'node':
+                args.append((yield self.node()))
+            elif kind == 'node?':
+                present = self.data[self.pos]
+                self.pos += 1
+                args.append((yield self.node()) if present else None)
+            else:
+                count = self.varint()
+                if kind == 'list?':
+                    if count == 0:
+                        args.append(None)
+                        continue
+                    count -= 1
+                items = []
+                for _ in range(count):
+                    items.append((yield self.node()))
+                args.append(items)
+        node = getattr(self.builder, cls.__name__)(*args)
+        if span is not None:
+            self.builder.span(node, *span)
+        return node
+
+
+def dumps(node):
+    """Serializa el AST con raíz 'node' (objetos o vistas de ast_arena)."""
+    encoder = _Encoder()
+    trampoline(encoder.node(node))
+    return bytes(encoder.out)
+
+
+def dump(node, f):
+    f.write(dumps(node))
+
+
+def loads(data, builder=None):
+    """
+    Reconstruye el AST. Con 'builder' (p. ej. ast_arena.ArenaBuilder()) los
+    nodos se crean en esa representación en lugar de objetos de AST.py.
+    """
+    builder = builder if builder is not None else ObjectBuilder()
+    decoder = _Decoder(memoryview(data), builder)
+    return builder.finish(trampoline(decoder.node()))
+
+
+def load(f, builder=None):
+    return loads(f.read(), builder)
@@ -0,0 +1,110 @@
+# batch.py
+
+import io
+import os
+import time
+import contextlib
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from lexer import Lexer
+from Parser import Parser
+from ASemantico import SemanticAnalyzer, SemanticError
+from IRGenerator import IRGenerator
+
+PHASES = ('lexer', 'parser', 'semantico', 'ir')
+
+# Resultado compacto que el worker devuelve al proceso padre: solo datos
+# planos, nada del AST ni del IR (que serían caros de serializar).
+FileResult = namedtuple('FileResult', 'path status diagnostics timings instructions')
+
+
+def find_sources(directory, extension='.gox'):
+    """Lista ordenada de los archivos fuente bajo 'directory'."""
+    paths = []
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if name.endswith(extension):
+                paths.append(os.path.join(root, name))
+    return sorted(paths)
+
+
+def compile_file(path):
+    """
+    Corre Lexer -> Parser -> SemanticAnalyzer -> IRGenerator sobre 'path'.
+    Se ejecuta dentro de un worker; lo que las fases imprimen (p. ej. los
+    avisos de tokens inválidos) se agrega a los diagnósticos.
+    """
+    timings = {}
+    diagnostics = []
+    status = 'ok'
+    instructions = 0
+    output = io.StringIO()
+    clock = time.perf_counter()
+
+    def lap(phase):
+        nonlocal clock
+        now = time.perf_counter()
+        timings[phase] = now - clock
+        clock = now
+
+    try:
+        with contextlib.redirect_stdout(output):
+            with open(path, 'r', encoding='utf-8') as f:
+                source = f.read()
+            tokens = Lexer(source).analizar()
+            lap('lexer')
+            parser = Parser(tokens, recover=True)
+            ast = parser.parse()
+            lap('parser')
+            if parser.errors:
+                status = 'sintaxis'
+                diagnostics.extend(parser.errors)
+            analyzer = SemanticAnalyzer()
+            analyzer.analyze(ast)
+            lap('semantico')
+            if not parser.errors:
+                instructions = len(IRGenerator(types=analyzer.types).generate(ast))
+                lap('ir')
+    except SyntaxError as e:
+        status = 'sintaxis'
+        diagnostics.append(str(e))
+    except SemanticError as e:
+        if status == 'ok':
+            status = 'semantico'
+        diagnostics.extend(str(e).splitlines())
+    except Exception as e:
+        status = 'error'
+        diagnostics.append(f"{e.__class__.__name__}: {e}")
+
+    diagnostics[:0] = output.getvalue().splitlines()
+    return FileResult(path, status, diagnostics, timings, instructions)
+
+
+def compile_batch(paths, jobs=None):
+    """
+    Compila 'paths' en un ProcessPoolExecutor y retorna los FileResult en
+    el mismo orden. Los archivos se reparten en bloques para que el costo
+    de comunicación no domine con miles de archivos pequeños.
+    """
+    jobs = jobs or os.cpu_count() or 1
+    chunksize = max(1, len(paths) // (jobs * 8))
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        return list(executor.map(compile_file, paths, chunksize=chunksize))
+
+
+def print_summary(results, elapsed):
+    for result in results:
+        total = sum(result.timings.values())
+        print(f"{'✅' if result.status == 'ok' else '❌'} {result.path}  {total * 1000:8.2f} ms  "
+              f"{result.instructions} instr.")
+        for line in result.diagnostics:
+            print(f"    {line}")
+
+    failed = [r for r in results if r.status != 'ok']
+    print(f"\n📦 {len(results)} archivos, {len(results) - len(failed)} correctos, {len(failed)} con errores")
+    for phase in PHASES:
+        spent = sum(r.timings.get(phase, 0.0) for r in results)
+        print(f"   {phase:<10} {spent * 1000:10.2f} ms")
+    cpu = sum(sum(r.timings.values()) for r in results)
+    print(f"   tiempo total {elapsed * 1000:.2f} ms (suma por archivo {cpu * 1000:.2f} ms)")
@@ -0,0 +1,1118 @@
+# benchmarks.py
+"""
+Benchmarks del compilador Mani.
+
+Uso:
+    python benchmarks.py            # corre todos
+    python benchmarks.py lexer      # corre solo los indicados
+"""
+
+import contextlib
+import gc
+import io
+import re
+import json
+import os
+import sys
+import time
+import pickle
+import tracemalloc
+
+from lexer import Lexer, PATRON
+from token_buffer import TokenBuffer
+from Token import TokenType
+from Parser import Parser, HashConsBuilder, ast_to_dict, write_ast_json, _DictConverter
+from ASemantico import SemanticAnalyzer, SemanticError
+from IRGenerator import IRGenerator
+from IR import IRInstruction, encode
+from peephole import PeepholeOptimizer
+from optimizer import ASTOptimizer
+from linker import Linker
+from AST import BinaryOp, NODE_CLASSES
+from incremental import IncrementalParser, IncrementalAnalyzer
+from ast_arena import ArenaBuilder
+import ast_binary
+from visitor import Visitor
+from resolver import Resolver
+from parallel import compile_program
+from stack_machine import StackMachine, CallFrame, Memory
+from superinstructions import SuperinstructionFuser, count_executed_ngrams
+from register_vm import RegisterCompiler, RegisterMachine, function_signatures
+
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    """Registra la función decorada bajo 'name'."""
+    def register(fn):
+        BENCHMARKS[name] = fn
+        return fn
+    return register
+
+
+def best_time(fn, repeat=5):
+    """Mejor tiempo (segundos) de 'repeat' ejecuciones de fn()."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def report(label, seconds, size, unit):
+    print(f"  {label:<28} {seconds * 1000:9.2f} ms  {size / seconds / 1e6:8.2f} M{unit}/s")
+
+
+# -------------------------------
+# Fuentes sintéticas
+# -------------------------------
+
+def comment_heavy_source(functions=300):
+    """Programa con más texto en comentarios que en código."""
+    block = (
+        "/* ************************************************ *\n"
+        " * Bloque de documentación generado automáticamente  *\n"
+        " * con varias líneas para ejercitar MLCOMMENT.       *\n"
+        " * ************************************************ */\n"
+    )
+    parts = []
+    for i in range(functions):
+        parts.append(block)
+        parts.append(f"// suma{i}: devuelve a + b + {i}\n")
+        parts.append(f"func suma{i}(a int, b int) int {{\n")
+        parts.append(f"    // comentario de línea dentro del cuerpo {i}\n")
+        parts.append(f"    return a + b + {i};\n}}\n\n")
+    return "".join(parts)
+
+
+# -------------------------------
+# Lexer
+# -------------------------------
+
+class _PositionedToken:
+    # Token con línea y columna guardadas, como antes de LineIndex
+    def __init__(self, tipo, valor, linea, columna):
+        self.tipo = tipo
+        self.valor = valor
+        self.linea = linea
+        self.columna = columna
+
+
+def _lex_per_character(texto):
+    """
+    Referencia: el lexer anterior, que actualizaba línea y columna
+    recorriendo en Python cada carácter de cada lexema, espacio y comentario.
+    """
+    patron = re.compile(PATRON, re.VERBOSE | re.DOTALL | re.MULTILINE)
+    pos, linea, columna = 0, 1, 1
+    tokens = []
+    while pos < len(texto):
+        match = patron.match(texto, pos)
+        tipo = match.lastgroup
+        valor = match.group(tipo)
+        if tipo not in ('SPACE', 'COMMENT', 'MLCOMMENT'):
+            tokens.append(_PositionedToken(tipo, valor, linea, columna))
+        for char in valor:
+            if char == '\n':
+                linea += 1
+                columna = 1
+            else:
+                columna += 1
+        pos += len(valor)
+    return tokens
+
+
+@benchmark("lexer")
+def bench_lexer():
+    source = comment_heavy_source()
+    size = len(source)
+    print(f"lexer: fuente con comentarios, {size / 1024:.0f} KiB")
+    before = best_time(lambda: _lex_per_character(source))
+    after = best_time(lambda: Lexer(source).analizar())
+    report("posición por carácter", before, size, "char")
+    report("LineIndex (offsets)", after, size, "char")
+    print(f"  aceleración: {before / after:.2f}x")
+
+
+def traced_bytes(build):
+    """Bytes retenidos por el resultado de build() según tracemalloc."""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = build()
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return result, after - before
+
+
+# -------------------------------
+# Almacenamiento de tokens
+# -------------------------------
+
+def arithmetic_source(statements=20000):
+    """Muchas sentencias cortas con identificadores repetidos."""
+    return "".join(f"var v{i % 500} int = a{i % 50} * {i} + b{i % 50} - 3;\n"
+                   for i in range(statements))
+
+
+@benchmark("tokens")
+def bench_token_memory():
+    source = arithmetic_source()
+    tokens, list_bytes = traced_bytes(lambda: Lexer(source).analizar())
+    count = len(tokens)
+    del tokens
+    buffer, buffer_bytes = traced_bytes(lambda: TokenBuffer.from_source(source))
+    assert len(buffer) == count
+    scale = 1_000_000 / count
+    print(f"tokens: {count} tokens, memoria extrapolada a 1M tokens")
+    print(f"  {'lista de Token':<28} {list_bytes * scale / 2**20:9.1f} MiB  {list_bytes / count:6.1f} B/token")
+    print(f"  {'TokenBuffer':<28} {buffer_bytes * scale / 2**20:9.1f} MiB  {buffer_bytes / count:6.1f} B/token")
+    print(f"  reducción: {list_bytes / buffer_bytes:.1f}x")
+
+
+@benchmark("relex")
+def bench_relex():
+    for functions in (300, 3000):
+        source = comment_heavy_source(functions)
+        buffer = TokenBuffer.from_source(source)
+        offset = source.index(f"return a + b + {functions // 2};")
+        full = best_time(lambda: TokenBuffer.from_source(source[:offset] + "x" + source[offset:]))
+        edit = best_time(lambda: buffer.edit(offset, 0, "x"))
+        print(f"relex: {len(buffer)} tokens, inserción de 1 carácter a mitad del archivo")
+        print(f"  {'re-lexado completo':<28} {full * 1000:9.3f} ms")
+        print(f"  {'TokenBuffer.edit':<28} {edit * 1000:9.3f} ms")
+
+
+# -------------------------------
+# Parser de expresiones
+# -------------------------------
+
+class _DescentParser(Parser):
+    """Referencia: la cascada recursiva de un método por nivel de precedencia."""
+
+    def parse_expression(self):
+        node = (yield self.parse_orterm())
+        while (ct := self.current_token()) and ct.tipo == TokenType.LOR:
+            op = ct.valor
+            self.advance_token()
+            node = BinaryOp(node, op, (yield self.parse_orterm()))
+        return node
+
+    def parse_orterm(self):
+        node = (yield self.parse_andterm())
+        while (ct := self.current_token()) and ct.tipo == TokenType.LAND:
+            op = ct.valor
+            self.advance_token()
+            node = BinaryOp(node, op, (yield self.parse_andterm()))
+        return node
+
+    def parse_andterm(self):
+        node = (yield self.parse_relterm())
+        rel_ops = {TokenType.LT, TokenType.GT, TokenType.LE, TokenType.GE, TokenType.EQ, TokenType.NE}
+        while (ct := self.current_token()) and ct.tipo in rel_ops:
+            op = ct.valor
+            self.advance_token()
+            node = BinaryOp(node, op, (yield self.parse_relterm()))
+        return node
+
+    def parse_relterm(self):
+        node = (yield self.parse_addterm())
+        while (ct := self.current_token()) and ct.tipo in (TokenType.PLUS, TokenType.MINUS):
+            op = ct.valor
+            self.advance_token()
+            node = BinaryOp(node, op, (yield self.parse_addterm()))
+        return node
+
+    def parse_addterm(self):
+        node = (yield self.parse_factor())
+        while (ct := self.current_token()) and ct.tipo in (TokenType.TIMES, TokenType.DIVIDE):
+            op = ct.valor
+            self.advance_token()
+            node = BinaryOp(node, op, (yield self.parse_factor()))
+        return node
+
+
+def count_calls(fn, prefix):
+    """Cantidad de llamadas a funciones cuyo nombre empieza con 'prefix'."""
+    calls = 0
+
+    def profiler(frame, event, arg):
+        nonlocal calls
+        if event == 'call' and frame.f_code.co_name.startswith(prefix):
+            calls += 1
+
+    sys.setprofile(profiler)
+    try:
+        fn()
+    finally:
+        sys.setprofile(None)
+    return calls
+
+
+@benchmark("expressions")
+def bench_expressions():
+    arithmetic = [f"a{i} * {i} + (b{i} - {i}) / 2" for i in range(2000)]
+    conditions = [f"a{i} < {i} && b{i} >= a{i} || c{i} == 0" for i in range(2000)]
+    cases = (
+        ("aritméticas", "".join(f"var r{i} int = {' + '.join(arithmetic[i:i + 50])};\n"
+                               for i in range(0, 2000, 50))),
+        ("lógicas", "".join(f"var r{i} bool = {' || '.join(conditions[i:i + 50])};\n"
+                           for i in range(0, 2000, 50))),
+    )
+    for name, source in cases:
+        tokens = Lexer(source).analizar()
+        print(f"expressions: {len(tokens)} tokens en expresiones {name} largas")
+        for label, parser_class in (("descenso recursivo", _DescentParser), ("Pratt", Parser)):
+            run = lambda: parser_class(tokens).parse()
+            frames = count_calls(run, "parse_")
+            seconds = best_time(run)
+            print(f"  {label:<28} {seconds * 1000:9.2f} ms  {frames:8d} frames parse_*")
+
+
+@benchmark("reparse")
+def bench_reparse():
+    for functions in (300, 3000):
+        source = comment_heavy_source(functions)
+        offset = source.index(f"return a + b + {functions // 2};") + len("return ")
+        edited = source[:offset] + "1 + " + source[offset:]
+        full = best_time(lambda: Parser(TokenBuffer.from_source(edited)).parse(), repeat=3)
+
+        def incremental():
+            parser = IncrementalParser(source)
+            start = time.perf_counter()
+            program = parser.edit(offset, 0, "1 + ")
+            return time.perf_counter() - start, program
+
+        seconds, program = min(incremental() for _ in range(3))
+        print(f"reparse: {functions} funciones, edición dentro de un cuerpo")
+        print(f"  {'lexer + parser completos':<28} {full * 1000:9.3f} ms")
+        print(f"  {'IncrementalParser.edit':<28} {seconds * 1000:9.3f} ms")
+
+
+@benchmark("reanalyze")
+def bench_reanalyze():
+    functions = 2000
+    source = function_source(functions)
+    middle = f"var x int = a * {functions // 2} + b;"
+    cases = (
+        ("cuerpo", middle, middle.replace("+ b", "- b")),
+        # cambia la firma: se re-chequean también sus llamadas
+        ("firma", f"func f{functions // 2}(a int, b int) int", f"func f{functions // 2}(a int, b float) int"),
+    )
+    def analyze(analyzer, program):
+        try:
+            analyzer.analyze(program)
+        except SemanticError:
+            pass
+
+    for label, old, new in cases:
+        parser = IncrementalParser(source)
+        analyzer = IncrementalAnalyzer()
+        analyzer.analyze(parser.program)
+        offset = source.index(old)
+        program = parser.edit(offset, len(old), new)
+        full = best_time(lambda: analyze(SemanticAnalyzer(), program), repeat=3)
+        start = time.perf_counter()
+        analyze(analyzer, program)
+        seconds = time.perf_counter() - start
+        print(f"reanalyze: {functions} funciones, edición en {label}")
+        print(f"  {'SemanticAnalyzer':<28} {full * 1000:9.3f} ms")
+        print(f"  {'IncrementalAnalyzer':<28} {seconds * 1000:9.3f} ms  "
+              f"{analyzer.rechecked} re-chequeadas, {analyzer.reused} reutilizadas")
+
+
+# -------------------------------
+# Representación del AST
+# -------------------------------
+
+@benchmark("arena")
+def bench_arena():
+    source = arithmetic_source(50_000)
+    tokens = Lexer(source).analizar()
+    print(f"arena: {len(tokens)} tokens")
+    for label, make_builder in (("objetos", lambda: None), ("arena", ArenaBuilder)):
+        seconds = best_time(lambda: Parser(tokens, builder=make_builder()).parse(), repeat=3)
+        ast, size = traced_bytes(lambda: Parser(tokens, builder=make_builder()).parse())
+        payload = ast.arena if label == "arena" else ast
+        start = time.perf_counter()
+        gc.collect()
+        collect = time.perf_counter() - start
+        start = time.perf_counter()
+        data = pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL)
+        dump = time.perf_counter() - start
+        print(f"  {label:<10} parse {seconds * 1000:8.2f} ms  memoria {size / 2**20:7.1f} MiB  "
+              f"gc.collect {collect * 1000:7.2f} ms  pickle {len(data) / 2**20:6.1f} MiB "
+              f"en {dump * 1000:7.2f} ms")
+        del ast, payload, data
+
+
+class _CountingWriter:
+    """Archivo de texto que solo cuenta lo que se le escribe."""
+    def __init__(self):
+        self.size = 0
+
+    def write(self, text):
+        self.size += len(text)
+
+
+def traced_peak(fn):
+    """(segundos, pico de memoria en bytes) de una ejecución de fn()."""
+    tracemalloc.start()
+    try:
+        start = time.perf_counter()
+        fn()
+        seconds = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return seconds, peak
+
+
+@benchmark("astio")
+def bench_ast_io():
+    ast = Parser(Lexer(arithmetic_source(50_000)).analizar()).parse()
+    out = _CountingWriter()
+    write_ast_json(ast, out)
+    data = ast_binary.dumps(ast)
+    print(f"astio: JSON de {out.size / 2**20:.1f} MiB, binario de {len(data) / 2**20:.1f} MiB")
+    cases = (
+        ("ast_to_dict + json.dump", lambda: json.dump(ast_to_dict(ast), _CountingWriter(), indent=2)),
+        ("write_ast_json", lambda: write_ast_json(ast, _CountingWriter())),
+        ("ast_binary.dumps", lambda: ast_binary.dumps(ast)),
+        ("ast_binary.loads", lambda: ast_binary.loads(data)),
+    )
+    for label, run in cases:
+        seconds = best_time(run, repeat=3)
+        _, peak = traced_peak(run)
+        print(f"  {label:<28} {seconds * 1000:9.2f} ms  pico {peak / 2**20:8.1f} MiB")
+
+
+# -------------------------------
+# Anidamiento profundo
+# -------------------------------
+
+def nested_parens_source(depth):
+    return f"var r int = {'(' * depth}1{' + 1)' * depth};\n"
+
+
+def nested_ifs_source(depth):
+    return ("var x int = 0;\n" + "if x < 1 {\n" * depth
+            + "x = x + 1;\n" + "}\n" * depth)
+
+
+@benchmark("depth")
+def bench_depth():
+    for depth in (10_000, 100_000):
+        for name, source in (("paréntesis", nested_parens_source(depth)),
+                             ("if anidados", nested_ifs_source(depth))):
+            tokens = Lexer(source).analizar()
+            ast = Parser(tokens).parse()
+            analyzer = SemanticAnalyzer()
+            analyzer.analyze(ast)
+            print(f"depth: {name}, profundidad {depth}, {len(tokens)} tokens")
+            phases = (
+                ("parser", lambda: Parser(tokens).parse()),
+                ("semántico", lambda: SemanticAnalyzer().analyze(ast)),
+                ("IR", lambda: IRGenerator(types=analyzer.types).generate(ast)),
+                ("ast_to_dict", lambda: ast_to_dict(ast)),
+            )
+            for label, run in phases:
+                report(label, best_time(run, repeat=3), len(tokens), "tok")
+
+# -------------------------------
+# Hash-consing
+# -------------------------------
+
+def repetitive_source(statements=20000):
+    """Código generado: las mismas subexpresiones constantes una y otra vez."""
+    templates = ("var v{i} int = (1 + 2) * 3 - {k};\n",
+                 "var w{i} float = float(4 * 8 + 1) / 2.0 + {k}.0;\n",
+                 "var b{i} bool = 1 < 2 && {k} >= 0 || false;\n")
+    return "".join(templates[i % 3].format(i=i, k=i % 10) for i in range(statements))
+
+
+@benchmark("hashcons")
+def bench_hashcons():
+    source = repetitive_source()
+    tokens = Lexer(source).analizar()
+    print(f"hashcons: {len(tokens)} tokens")
+    for label, make_builder in (("objetos", lambda: None), ("hash-consing", HashConsBuilder)):
+        seconds = best_time(lambda: Parser(tokens, builder=make_builder()).parse(), repeat=3)
+        builder = make_builder()
+        ast, size = traced_bytes(lambda: Parser(tokens, builder=builder).parse())
+        start = time.perf_counter()
+        ast.structural_hash
+        hashing = time.perf_counter() - start
+        reused = f"  reutilizados {builder.reused}" if builder is not None else ""
+        print(f"  {label:<13} parse {seconds * 1000:8.2f} ms  memoria {size / 2**20:6.1f} MiB  "
+              f"structural_hash {hashing * 1000:7.2f} ms{reused}")
+        del ast
+
+
+# -------------------------------
+# Despacho de los visitantes
+# -------------------------------
+
+def _legacy_dispatch(prefix, fallback):
+    """visit() como era antes de visitor.py: nombre armado + hasattr/getattr por nodo."""
+    def visit(self, node):
+        method = prefix + node.__class__.__name__
+        if hasattr(self, method):
+            return getattr(self, method)(node)
+        return fallback(self, node)
+    return visit
+
+
+class _LegacyAnalyzer(SemanticAnalyzer):
+    visit = _legacy_dispatch('analyze_', SemanticAnalyzer.generic_visit)
+
+
+class _LegacyIRGenerator(IRGenerator):
+    visit = _legacy_dispatch('gen_', IRGenerator.generic_visit)
+
+
+class _LegacyDictConverter(_DictConverter):
+    visit = _legacy_dispatch('visit_', _DictConverter.generic_visit)
+
+
+def function_source(functions=2000):
+    """Programa válido (pasa el análisis semántico) con funciones pequeñas."""
+    parts = ["var total int = 0;\n"]
+    for i in range(functions):
+        parts.append(
+            f"func f{i}(a int, b int) int {{\n"
+            f"    var x int = a * {i} + b;\n"
+            f"    while x < 100 {{\n"
+            f"        x = x + a - 1;\n"
+            f"        if x > 50 {{ break; }}\n"
+            f"    }}\n"
+            f"    print x;\n"
+            f"    return x;\n"
+            f"}}\n"
+            f"total = total + f{i}({i}, 2);\n")
+    return "".join(parts)
+
+
+def iter_nodes(root):
+    pending = [root]
+    while pending:
+        node = pending.pop()
+        yield node
+        for name, kind in node._fields:
+            value = getattr(node, name)
+            if kind in ('node', 'node?') and value is not None:
+                pending.append(value)
+            elif kind in ('list', 'list?') and value:
+                pending.extend(value)
+
+
+def count_nodes(root):
+    return sum(1 for _ in iter_nodes(root))
+
+
+@benchmark("dispatch")
+def bench_dispatch():
+    ast = Parser(Lexer(function_source()).analizar()).parse()
+    nodes = count_nodes(ast)
+    print(f"dispatch: {nodes} nodos")
+    analyzer = SemanticAnalyzer()
+    analyzer.analyze(ast)
+    types = analyzer.types
+    resolution = Resolver().resolve(ast)
+
+    # Solo el despacho: métodos vacíos sobre la lista plana de nodos
+    flat = list(iter_nodes(ast))
+    methods = {f"visit_{cls.__name__}": lambda self, node: None for cls in NODE_CLASSES}
+    table = type("_Empty", (Visitor,), dict(methods))()
+    legacy = type("_LegacyEmpty", (Visitor,), dict(methods, visit=_legacy_dispatch('visit_', None)))()
+    print("  solo despacho")
+    for label, visitor in (("getattr por nodo", legacy), ("tabla", table)):
+        visit = visitor.visit
+        report(f"    {label}", best_time(lambda: [visit(node) for node in flat]), nodes, "nodo")
+    passes = (
+        ("semántico", SemanticAnalyzer, _LegacyAnalyzer, lambda v: v.analyze),
+        ("IR", lambda: IRGenerator(resolution, types), lambda: _LegacyIRGenerator(resolution, types),
+         lambda v: v.generate),
+        ("ast_to_dict", _DictConverter, _LegacyDictConverter, lambda v: v.run),
+    )
+    for label, current, legacy, entry in passes:
+        print(f"  {label}")
+        report("    getattr por nodo", best_time(lambda: entry(legacy())(ast)), nodes, "nodo")
+        report("    tabla + trampoline", best_time(lambda: entry(current())(ast)), nodes, "nodo")
+        report("    tabla + recursión", best_time(lambda: current().run(ast, recursive=True)),
+               nodes, "nodo")
+
+
+# -------------------------------
+# Variables por slot en la máquina de pila
+# -------------------------------
+
+class _StringMachine:
+    """La máquina antes de IR.encode: IRInstruction con opcodes str y una cadena de if."""
+
+    def __init__(self, instructions):
+        self.instructions = instructions
+        self.pc = 0
+        self.stack = []
+        self.memory = Memory()
+        # Variables por índice (ver resolver.py): GLOBALS dimensiona
+        # 'globals' y ENTER crea los locales de cada llamada
+        self.globals = []
+        self.locals = []
+        self.frames = []
+        self.labels = self.find_labels()
+
+    def find_labels(self):
+        labels = {}
+        for i, instr in enumerate(self.instructions):
+            if instr.opcode == 'LABEL':
+                labels[instr.arg] = i
+        return labels
+
+    def run(self):
+        while self.pc < len(self.instructions):
+            instr = self.instructions[self.pc]
+            self.pc += 1
+            self.execute(instr)
+
+    def execute(self, instr):
+        # Las instrucciones vienen tipadas desde IRGenerator (ADDI / ADDF,
+        # PEEKI / PEEKF, ...): cada rama hace una sola operación, sin
+        # preguntar el tipo de los valores.
+        op = instr.opcode
+        arg = instr.arg
+        stack = self.stack
+
+        if op == 'CONSTI' or op == 'CONSTR':
+            stack.append(arg)
+        elif op == 'CONSTB':
+            stack.append(arg != 0)
+        elif op == 'LOAD_LOCAL':
+            stack.append(self.locals[arg])
+        elif op == 'STORE_LOCAL':
+            self.locals[arg] = stack.pop()
+        elif op == 'LOAD_GLOBAL':
+            stack.append(self.globals[arg])
+        elif op == 'STORE_GLOBAL':
+            self.globals[arg] = stack.pop()
+
+        elif op == 'ADDI' or op == 'ADDF':
+            b = stack.pop()
+            stack[-1] += b
+        elif op == 'SUBI' or op == 'SUBF':
+            b = stack.pop()
+            stack[-1] -= b
+        elif op == 'MULI' or op == 'MULF':
+            b = stack.pop()
+            stack[-1] *= b
+        elif op == 'DIVI':
+            b = stack.pop()
+            stack[-1] //= b
+        elif op == 'DIVF':
+            b = stack.pop()
+            stack[-1] /= b
+        elif op == 'NEGI' or op == 'NEGF':
+            stack[-1] = -stack[-1]
+
+        elif op == 'AND':
+            b = stack.pop()
+            stack[-1] = stack[-1] and b
+        elif op == 'OR':
+            b = stack.pop()
+            stack[-1] = stack[-1] or b
+        elif op == 'LTI' or op == 'LTF':
+            b = stack.pop()
+            stack[-1] = stack[-1] < b
+        elif op == 'GTI' or op == 'GTF':
+            b = stack.pop()
+            stack[-1] = stack[-1] > b
+        elif op == 'LEI' or op == 'LEF':
+            b = stack.pop()
+            stack[-1] = stack[-1] <= b
+        elif op == 'GEI' or op == 'GEF':
+            b = stack.pop()
+            stack[-1] = stack[-1] >= b
+        elif op == 'EQI' or op == 'EQF':
+            b = stack.pop()
+            stack[-1] = stack[-1] == b
+        elif op == 'NEI' or op == 'NEF':
+            b = stack.pop()
+            stack[-1] = stack[-1] != b
+
+        elif op == 'ITOF':
+            stack[-1] = float(stack[-1])
+        elif op == 'FTOI' or op == 'BTOI':
+            stack[-1] = int(stack[-1])
+
+        elif op == 'JUMP':
+            self.pc = self.labels[arg]
+        elif op == 'JUMP_IF_FALSE':
+            if not stack.pop():
+                self.pc = self.labels[arg]
+
+        elif op == 'LABEL':
+            pass
+
+        elif op == 'CALL':
+            self.frames.append(CallFrame(self.pc, self.locals))
+            self.pc = self.labels[f"FUNC_{arg}"] + 1
+        elif op == 'ENTER':
+            self.locals = [None] * arg
+
+        elif op == 'RETURN':
+            # el valor de retorno, si hay, queda en la pila
+            frame = self.frames.pop()
+            self.pc = frame.return_address
+            self.locals = frame.locals
+
+        elif op == 'GLOBALS':
+            self.globals = [None] * arg
+        elif op == 'HALT':
+            self.pc = len(self.instructions)
+
+        elif op == 'PRINTI' or op == 'PRINTF':
+            print(stack.pop(), end='')
+        elif op == 'PRINTC':
+            print(chr(stack.pop()), end='')
+        elif op == 'PRINTB':
+            print('true' if stack.pop() else 'false', end='')
+
+        elif op == 'GROW':
+            # ^n agrega n bytes a la memoria y vale la dirección del bloque nuevo
+            size = stack.pop()
+            stack.append(len(self.memory.memory))
+            self.memory.grow(size)
+
+        elif op == 'POKEI':
+            value = stack.pop()
+            self.memory.write_int(stack.pop(), value)
+        elif op == 'PEEKI':
+            stack[-1] = self.memory.read_int(stack[-1])
+        elif op == 'POKEF':
+            value = stack.pop()
+            self.memory.write_float(stack.pop(), value)
+        elif op == 'PEEKF':
+            stack[-1] = self.memory.read_float(stack[-1])
+
+        else:
+            raise Exception(f"Instrucción no soportada: {op}")
+
+
+class _NamedIRGenerator(IRGenerator):
+    """IR como antes de resolver.py: LOCAL_GET/LOCAL_SET con el nombre."""
+    def load(self, identifier):
+        self.instructions.append(IRInstruction("LOCAL_GET", identifier.name))
+
+    def store(self, identifier):
+        self.instructions.append(IRInstruction("LOCAL_SET", identifier.name))
+
+
+class _NamedMachine(_StringMachine):
+    """Un dict de nombres por frame; en el nivel superior, un frame nuevo sobre 'globals'."""
+    def execute(self, instr):
+        op = instr.opcode
+        if op == 'LOCAL_GET':
+            self.stack.append(self.current_frame().locals[instr.arg])
+        elif op == 'LOCAL_SET':
+            self.current_frame().locals[instr.arg] = self.stack.pop()
+        elif op == 'GLOBALS':
+            self.globals = {}
+        elif op == 'ENTER':
+            self.frames[-1].locals = {}
+        elif op == 'RETURN':
+            self.pc = self.frames.pop().return_address
+        else:
+            super().execute(instr)
+
+    def current_frame(self):
+        return self.frames[-1] if self.frames else CallFrame(-1, self.globals)
+
+
+class _SlotMachine(_StringMachine):
+    """La misma capa extra de execute que _NamedMachine, para comparar parejo."""
+    def execute(self, instr):
+        op = instr.opcode
+        if op == 'LOCAL_GET' or op == 'LOCAL_SET':
+            raise AssertionError(op)
+        super().execute(instr)
+
+
+def loop_source(iterations=20000):
+    return (
+        "var total int = 0;\n"
+        "func step(a int, b int) int {\n"
+        "    var t int = a * 3 + b;\n"
+        "    return t - a;\n"
+        "}\n"
+        "var i int = 0;\n"
+        f"while i < {iterations} {{\n"
+        "    total = total + step(i, 2);\n"
+        "    i = i + 1;\n"
+        "}\n"
+        "print total;\n"
+    )
+
+
+@benchmark("slots")
+def bench_slots():
+    ast = Parser(Lexer(loop_source()).analizar()).parse()
+    SemanticAnalyzer().analyze(ast)
+    print("slots: bucle de 20000 llamadas en la máquina de pila")
+    for label, generator, machine in (("nombres", _NamedIRGenerator, _NamedMachine),
+                                      ("slots", IRGenerator, _SlotMachine)):
+        instructions = generator().generate(ast)
+
+        def run():
+            vm = machine(instructions)
+            with contextlib.redirect_stdout(io.StringIO()):
+                vm.run()
+            return vm
+
+        executed = _count_executed(machine, instructions)
+        report(f"  {label}", best_time(run, repeat=3), executed, "instr")
+
+
+def _count_executed(machine, instructions):
+    count = 0
+
+    class Counting(machine):
+        def execute(self, instr):
+            nonlocal count
+            count += 1
+            super().execute(instr)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        Counting(instructions).run()
+    return count
+
+
+# -------------------------------
+# Compilación paralela por función
+# -------------------------------
+
+@benchmark("parallel")
+def bench_parallel():
+    ast = Parser(Lexer(function_source(10_000)).analizar()).parse()
+    ast_size = count_nodes(ast)
+    print(f"parallel: 10000 funciones, {ast_size} nodos, {os.cpu_count()} núcleos")
+
+    def sequential():
+        analyzer = SemanticAnalyzer()
+        analyzer.analyze(ast)
+        return IRGenerator(types=analyzer.types).generate(ast)
+
+    report("  secuencial", best_time(sequential, repeat=3), ast_size, "nodo")
+    for jobs in (1, 2, 4, 8):
+        if jobs > (os.cpu_count() or 1):
+            break
+        report(f"  compile_program jobs={jobs}",
+               best_time(lambda: compile_program(ast, jobs=jobs), repeat=3), ast_size, "nodo")
+
+
+# -------------------------------
+# IR codificado en arrays
+# -------------------------------
+
+@benchmark("bytecode")
+def bench_bytecode():
+    functions = 5000
+    ast = Parser(Lexer(function_source(functions)).analizar()).parse()
+    instructions = IRGenerator().generate(ast)
+    print(f"bytecode: {functions} funciones, {len(instructions)} instrucciones")
+    _, listed = traced_bytes(lambda: IRGenerator().generate(ast))
+    bytecode, encoded = traced_bytes(lambda: encode(instructions))
+    print(f"  {'lista de IRInstruction':<28} {listed / 1e6:9.2f} MB  {listed / len(instructions):6.1f} B/instr")
+    print(f"  {'Bytecode (arrays + pool)':<28} {encoded / 1e6:9.2f} MB  {encoded / len(instructions):6.1f} B/instr"
+          f"  ({len(bytecode.constants)} constantes)")
+    report("encode", best_time(lambda: encode(instructions), repeat=3), len(instructions), "instr")
+
+    ast = Parser(Lexer(loop_source(50_000)).analizar()).parse()
+    instructions = IRGenerator().generate(ast)
+    executed = _count_executed(_StringMachine, instructions)
+    print(f"  bucle de 50000 llamadas: {executed} instrucciones ejecutadas")
+    for label, make in (("str + cadena de if", lambda: _StringMachine(instructions)),
+                        ("Op + tabla de handlers", lambda: StackMachine(encode(instructions)))):
+        def run():
+            vm = make()
+            with contextlib.redirect_stdout(io.StringIO()):
+                vm.run()
+        report(f"  {label}", best_time(run, repeat=3), executed, "instr")
+
+
+# -------------------------------
+# Peephole sobre el IR
+# -------------------------------
+
+def branchy_source(iterations=20000):
+    """Bucle con if sin else, constantes literales y asignaciones seguidas de lecturas."""
+    return (
+        "var total int = 0;\n"
+        "var i int = 0;\n"
+        f"while i < {iterations} {{\n"
+        "    var t int = i * (2 + 3) - 4 / 2;\n"
+        "    if t > 100 { total = total + 1; }\n"
+        "    if i < 10 { if 1 < 2 { total = total + t; } }\n"
+        "    i = i + 1;\n"
+        "}\n"
+        "print total;\n"
+    )
+
+
+def _count_dispatched(bytecode):
+    count = 0
+
+    class Counting(StackMachine):
+        def run(self):
+            nonlocal count
+            code, args, handlers = self.code, self.args, self.handlers
+            while self.pc < len(code):
+                pc = self.pc
+                self.pc = pc + 1
+                count += 1
+                handlers[code[pc]](args[pc])
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        Counting(bytecode).run()
+    return count
+
+
+@benchmark("peephole")
+def bench_peephole():
+    ast = Parser(Lexer(branchy_source()).analizar()).parse()
+    instructions = IRGenerator().generate(ast)
+    peephole = PeepholeOptimizer()
+    optimized = peephole.optimize(instructions)
+    print("peephole: bucle de 20000 iteraciones con if sin else y constantes")
+    print("  " + peephole.report().replace("\n", "\n  "))
+    large = IRGenerator().generate(Parser(Lexer(function_source(5000)).analizar()).parse())
+    report("optimize (5000 funciones)", best_time(lambda: PeepholeOptimizer().optimize(large), repeat=3),
+           len(large), "instr")
+    for label, code in (("sin peephole", instructions), ("con peephole", optimized)):
+        bytecode = encode(code)
+        executed = _count_dispatched(bytecode)
+
+        def run():
+            with contextlib.redirect_stdout(io.StringIO()):
+                StackMachine(bytecode).run()
+
+        seconds = best_time(run, repeat=3)
+        print(f"  {label:<28} {seconds * 1000:9.2f} ms  {executed:9d} instrucciones ejecutadas")
+
+
+# -------------------------------
+# Optimización del AST (-O2)
+# -------------------------------
+
+def const_source(iterations=20000):
+    """Bucle con constantes, casts de literales y una rama muerta."""
+    return (
+        "const step int = 2;\n"
+        "const limit int = 1000 * 20;\n"
+        "const debug = false;\n"
+        "var total float = 0.0;\n"
+        "var i int = 0;\n"
+        "while i < limit {\n"
+        "    total = total + float(step * 3) / 2.0;\n"
+        "    if debug { print i; }\n"
+        "    i = i + step / step;\n"
+        "}\n"
+        "print total;\n"
+    )
+
+
+@benchmark("optimizer")
+def bench_optimizer():
+    ast = Parser(Lexer(const_source()).analizar()).parse()
+    analyzer = SemanticAnalyzer()
+    analyzer.analyze(ast)
+    print("optimizer: bucle de 20000 iteraciones con constantes")
+
+    def level1(tree, types):
+        return PeepholeOptimizer().optimize(IRGenerator(types=types).generate(tree))
+
+    optimizer = ASTOptimizer(analyzer.types)
+    optimized = optimizer.optimize(ast)
+    levels = (
+        ("-O0", IRGenerator(types=analyzer.types).generate(ast)),
+        ("-O1 (peephole)", level1(ast, analyzer.types)),
+        ("-O2 (AST + peephole)", level1(optimized, optimizer.types)),
+    )
+    for label, instructions in levels:
+        bytecode = encode(instructions)
+        executed = _count_dispatched(bytecode)
+
+        def run():
+            with contextlib.redirect_stdout(io.StringIO()):
+                StackMachine(bytecode).run()
+
+        seconds = best_time(run, repeat=3)
+        print(f"  {label:<28} {seconds * 1000:9.2f} ms  {executed:9d} instrucciones ejecutadas")
+
+
+# -------------------------------
+# Enlazado: sin LABEL ni funciones sin usar
+# -------------------------------
+
+@benchmark("link")
+def bench_link():
+    for label, source in (("bucle con llamadas", loop_source()), ("bucle con if", branchy_source())):
+        instructions = IRGenerator().generate(Parser(Lexer(source).analizar()).parse())
+        print(f"link: {label}, {len(instructions)} instrucciones de IR")
+        for name, bytecode in (("encode (con LABEL)", encode(instructions)),
+                               ("Linker.link", Linker().link(instructions))):
+            executed = _count_dispatched(bytecode)
+
+            def run():
+                with contextlib.redirect_stdout(io.StringIO()):
+                    StackMachine(bytecode).run()
+
+            seconds = best_time(run, repeat=3)
+            print(f"  {name:<28} {seconds * 1000:9.2f} ms  {executed:9d} instrucciones ejecutadas"
+                  f"  ({len(bytecode)} en la imagen)")
+
+
+# -------------------------------
+# Backend de registros
+# -------------------------------
+
+def local_loop_source(iterations=20000):
+    """El bucle dentro de una función: las variables son locales."""
+    return (
+        "func run(n int) int {\n"
+        "    var total int = 0;\n"
+        "    var i int = 0;\n"
+        "    while i < n {\n"
+        "        var t int = i * 3 + 1;\n"
+        "        if t > 100 { total = total + t / 2; } else { total = total - 1; }\n"
+        "        i = i + 1;\n"
+        "    }\n"
+        "    return total;\n"
+        "}\n"
+        f"print run({iterations});\n"
+    )
+
+
+def _count_register_dispatched(program):
+    count = 0
+
+    class Counting(RegisterMachine):
+        def run(self):
+            nonlocal count
+            code, handlers = self.code, self.handlers
+            while self.pc < len(code):
+                op, a, b, c = code[self.pc]
+                self.pc += 1
+                count += 1
+                handlers[op](a, b, c)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        Counting(program).run()
+    return count
+
+
+@benchmark("register")
+def bench_register():
+    sources = (("bucle con llamadas", loop_source()), ("bucle con if", branchy_source()),
+               ("bucle con constantes", const_source()), ("bucle con locales", local_loop_source()))
+    for label, source in sources:
+        ast = Parser(Lexer(source).analizar()).parse()
+        analyzer = SemanticAnalyzer()
+        analyzer.analyze(ast)
+        instructions = PeepholeOptimizer().optimize(IRGenerator(types=analyzer.types).generate(ast))
+        image = Linker().link(instructions)
+        program = RegisterCompiler(function_signatures(ast)).compile(instructions)
+        print(f"register: {label}, IR con peephole")
+        machines = (("StackMachine", StackMachine, image, _count_dispatched(image)),
+                    ("RegisterMachine", RegisterMachine, program, _count_register_dispatched(program)))
+        for name, machine, code, executed in machines:
+
+            def run():
+                with contextlib.redirect_stdout(io.StringIO()):
+                    machine(code).run()
+
+            seconds = best_time(run, repeat=3)
+            print(f"  {name:<28} {seconds * 1000:9.2f} ms  {executed:9d} instrucciones ejecutadas"
+                  f"  ({len(code)} en el código)")
+
+
+# -------------------------------
+# Superinstrucciones
+# -------------------------------
+
+@benchmark("superinstructions")
+def bench_superinstructions():
+    sources = (("bucle con llamadas", loop_source()), ("bucle con if", branchy_source()),
+               ("bucle con constantes", const_source()), ("bucle con locales", local_loop_source()))
+    for label, source in sources:
+        instructions = PeepholeOptimizer().optimize(IRGenerator().generate(Parser(Lexer(source).analizar()).parse()))
+        image = Linker().link(instructions)
+        fuser = SuperinstructionFuser()
+        fused = fuser.fuse(image)
+        hottest = count_executed_ngrams(image, (4,)).most_common(1)[0]
+        print(f"superinstructions: {label}; secuencia más ejecutada: {' '.join(hottest[0])} ({hottest[1]})")
+        for name, bytecode in (("Linker.link", image), ("con superinstrucciones", fused)):
+            executed = _count_dispatched(bytecode)
+
+            def run():
+                with contextlib.redirect_stdout(io.StringIO()):
+                    StackMachine(bytecode).run()
+
+            seconds = best_time(run, repeat=3)
+            print(f"  {name:<28} {seconds * 1000:9.2f} ms  {executed:9d} instrucciones ejecutadas")
+
+
+# -------------------------------
+# Funciones en línea
+# -------------------------------
+
+def helper_source(iterations=20000):
+    """Bucle que llama a funciones de una línea."""
+    return (
+        "func suma(a int, b int) int { return a + b; }\n"
+        "func doble(a int) int { return suma(a, a); }\n"
+        "var total int = 0;\n"
+        "var i int = 0;\n"
+        f"while i < {iterations} {{\n"
+        "    total = suma(total, doble(i)) - i;\n"
+        "    i = suma(i, 1);\n"
+        "}\n"
+        "print total;\n"
+    )
+
+
+@benchmark("inline")
+def bench_inline():
+    for label, source in (("bucle con llamadas", loop_source()), ("funciones de una línea", helper_source())):
+        ast = Parser(Lexer(source).analizar()).parse()
+        analyzer = SemanticAnalyzer()
+        analyzer.analyze(ast)
+        print(f"inline: {label}")
+        for budget in (0, 20):
+            generator = IRGenerator(types=analyzer.types, inline_budget=budget)
+            image = Linker().link(PeepholeOptimizer().optimize(generator.generate(ast)))
+            executed = _count_dispatched(image)
+
+            def run():
+                with contextlib.redirect_stdout(io.StringIO()):
+                    StackMachine(image).run()
+
+            seconds = best_time(run, repeat=3)
+            name = f"inline_budget={budget}"
+            print(f"  {name:<28} {seconds * 1000:9.2f} ms  {executed:9d} instrucciones ejecutadas"
+                  f"  (copias: {sum(generator.inlined.values())})")
+
+
+def main(argv):
+    names = argv or list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            print(f"Benchmark desconocido: {name}. Disponibles: {', '.join(BENCHMARKS)}")
+            return 1
+        BENCHMARKS[name]()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,256 @@
+# incremental.py
+
+from collections import namedtuple
+
+from AST import Program, structurally_equal
+from ASemantico import SemanticAnalyzer, SemanticError
+from Parser import Parser
+from token_buffer import TokenBuffer
+from utils import trampoline
+
+# Una declaración de nivel superior ya parseada:
+#   first, end  rango de tokens [first, end) que consumió
+#   digest      hash del texto fuente de ese rango
+#   node        subárbol AST
+#   errors      errores de sintaxis reportados al parsearla
+TopLevelEntry = namedtuple('TopLevelEntry', 'first end digest node errors')
+
+# Resultado cacheado del análisis semántico de una sentencia de nivel superior:
+#   node          la sentencia analizada
+#   dependencies  nombre global -> info que tenía al empezar la sentencia
+#                 (None si no estaba declarado)
+#   declarations  (nombre, info) que la sentencia agregó al ámbito global
+#   errors        mensajes reportados
+#   types         tipos de sus expresiones (como SemanticAnalyzer.types)
+AnalysisEntry = namedtuple('AnalysisEntry', 'node dependencies declarations errors types')
+
+
+class IncrementalParser:
+    """
+    Parser que conserva, por cada sentencia de nivel superior, su rango en
+    el fuente, el hash de su contenido y su subárbol. Tras una edición solo
+    se re-parsean las sentencias que tocan el rango modificado: las demás se
+    reutilizan por identidad, así que los pases siguientes pueden usar el
+    nodo como clave de caché.
+
+    Las sentencias de nivel superior no comparten estado de parseo (entre
+    una y otra el parser solo tiene el índice), lo que permite retomar en
+    cualquier frontera.
+
+    Los nodos reutilizados conservan el span con que se parsearon: si la
+    edición desplazó su texto, el offset vigente de la sentencia se obtiene
+    de su entrada (tokens.starts[entry.first]).
+    """
+
+    def __init__(self, source, recover=True):
+        self.recover = recover
+        self.tokens = TokenBuffer.from_source(source)
+        self.entries = self._parse_from(0, {}, [])
+        self.program = Program([e.node for e in self.entries])
+
+    @property
+    def source(self):
+        return self.tokens.source
+
+    @property
+    def errors(self):
+        return [msg for entry in self.entries for msg in entry.errors]
+
+    def _digest(self, first, end):
+        tokens = self.tokens
+        if first == end:
+            return hash('')
+        return hash(tokens.source[tokens.starts[first]:tokens.ends[end - 1]])
+
+    def _parse_from(self, index, reusable, tail):
+        """
+        Parsea sentencias desde el token 'index' hasta el final o hasta caer
+        en el inicio de una entrada de 'tail' (entradas viejas ya
+        desplazadas), que entonces se reutilizan tal cual. 'reusable' mapea
+        digest -> entrada vieja para recuperar nodos cuyo texto no cambió.
+        """
+        parser = Parser(self.tokens, recover=self.recover)
+        parser.index = index
+        entries = []
+        count = 0
+        tail_starts = {e.first: i for i, e in enumerate(tail)}
+        while parser.current_token() is not None:
+            if parser.index in tail_starts:
+                entries.extend(tail[tail_starts[parser.index]:])
+                break
+            first = parser.index
+            node = trampoline(parser.parse_statement())
+            errors = parser.errors[count:]
+            count = len(parser.errors)
+            digest = self._digest(first, parser.index)
+            old = reusable.get(digest)
+            if old is not None and not errors and old.end - old.first == parser.index - first:
+                node = old.node
+            entries.append(TopLevelEntry(first, parser.index, digest, node, errors))
+        return entries
+
+    def edit(self, offset, deleted, inserted):
+        """
+        Aplica la edición al fuente y retorna el Program actualizado. Los
+        nodos de las sentencias no afectadas son los mismos objetos que en
+        el Program anterior.
+        """
+        tokens = self.tokens = self.tokens.edit(offset, deleted, inserted)
+        changed, old_resync, new_resync = tokens.changed
+        shift = new_resync - old_resync
+
+        # Prefijo intacto: la sentencia y el token que miró para decidir
+        # dónde terminaba están antes del primer token re-lexado. Las
+        # sentencias con errores se re-parsean para regenerar sus mensajes.
+        keep = 0
+        for entry in self.entries:
+            if entry.end >= changed or entry.errors:
+                break
+            keep += 1
+
+        # Cola intacta: el sufijo de sentencias sin errores cuyos tokens están
+        # todos en la parte que solo se desplazó.
+        tail_from = len(self.entries)
+        while (tail_from > keep and self.entries[tail_from - 1].first >= old_resync
+               and not self.entries[tail_from - 1].errors):
+            tail_from -= 1
+        tail = [entry._replace(first=entry.first + shift, end=entry.end + shift)
+                for entry in self.entries[tail_from:]]
+
+        start = self.entries[keep].first if keep < len(self.entries) else (
+            self.entries[-1].end if self.entries else 0)
+        reusable = {e.digest: e for e in self.entries[keep:]}
+        self.entries = self.entries[:keep] + self._parse_from(start, reusable, tail)
+        self.program = Program([e.node for e in self.entries])
+        return self.program
+
+
+class _RecordingAnalyzer(SemanticAnalyzer):
+    """
+    SemanticAnalyzer con el ámbito global abierto, que anota qué nombres
+    globales consulta o declara cada sentencia (con el valor que tenían
+    antes de que la sentencia los tocara) y qué declaraciones agrega.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.push_scope()
+        self.dependencies = {}
+        self.declarations = []
+
+    def depend_on(self, name):
+        if name not in self.dependencies:
+            self.dependencies[name] = self.scopes[0].get(name)
+
+    def lookup(self, name):
+        infos = self.visible.get(name)
+        if not infos or infos[-1] is self.scopes[0].get(name):
+            self.depend_on(name)
+        return super().lookup(name)
+
+    def declare_variable(self, name, var_type, is_const=False):
+        if len(self.scopes) > 1:
+            return super().declare_variable(name, var_type, is_const)
+        self.depend_on(name)
+        self._record_declaration(name, super().declare_variable, var_type, is_const)
+
+    def declare_function(self, name, param_types, return_type):
+        if self.current_function_return is not None:
+            return super().declare_function(name, param_types, return_type)
+        self.depend_on(name)
+        self._record_declaration(name, super().declare_function, param_types, return_type)
+
+    def _record_declaration(self, name, declare, *args):
+        global_scope = self.scopes[0]
+        existed = name in global_scope
+        declare(name, *args)
+        if not existed and name in global_scope:
+            self.declarations.append((name, global_scope[name]))
+
+
+def _pair_nodes(old, new):
+    """Mapa nodo de 'old' -> nodo de 'new' para dos árboles con la misma estructura."""
+    mapping = {}
+    pending = [(old, new)]
+    while pending:
+        a, b = pending.pop()
+        mapping[a] = b
+        for name, kind in a._fields:
+            if kind in ('node', 'node?'):
+                child = getattr(a, name)
+                if child is not None:
+                    pending.append((child, getattr(b, name)))
+            elif kind in ('list', 'list?'):
+                pending.extend(zip(getattr(a, name) or (), getattr(b, name) or ()))
+    return mapping
+
+
+class IncrementalAnalyzer:
+    """
+    Análisis semántico que se puede repetir tras cada edición re-chequeando
+    solo lo necesario. Por cada sentencia de nivel superior guarda sus
+    diagnósticos, los tipos de sus expresiones, lo que declaró y de qué
+    nombres globales dependió, bajo su structural_hash. Al re-analizar, una
+    sentencia se reutiliza si hay una entrada con su mismo hash, igual a
+    ella (structurally_equal) y cuyas dependencias siguen valiendo lo mismo
+    en este punto del programa; si
+    no (cambió su texto, o la firma o el tipo de algo que usa) se vuelve a
+    analizar.
+
+    El resultado es el mismo que SemanticAnalyzer().analyze(program):
+    'errors' en el mismo orden, 'types' con las mismas claves, y si hay
+    errores analyze() lanza SemanticError. Con IncrementalParser las
+    sentencias sin cambios son los mismos nodos; si no, los tipos
+    cacheados se trasladan a los nodos nuevos.
+    """
+
+    def __init__(self):
+        self.cache = {}
+        self.errors = []
+        self.types = {}
+        self.rechecked = 0
+        self.reused = 0
+
+    def _find(self, stmt, global_scope):
+        # el hash solo elige los candidatos: dos sentencias distintas pueden
+        # compartirlo, así que se confirma que sean iguales
+        for entry in self.cache.get(stmt.structural_hash, ()):
+            if structurally_equal(entry.node, stmt) \
+                    and all(global_scope.get(name) == info for name, info in entry.dependencies.items()):
+                return entry
+        return None
+
+    def analyze(self, program):
+        analyzer = _RecordingAnalyzer()
+        global_scope = analyzer.scopes[0]
+        errors = analyzer.errors
+        types = {}
+        cache = {}
+        self.rechecked = self.reused = 0
+        for stmt in program.statements:
+            entry = self._find(stmt, global_scope)
+            if entry is None:
+                self.rechecked += 1
+                analyzer.dependencies, analyzer.declarations, analyzer.types = {}, [], {}
+                first_error = len(errors)
+                analyzer.run(stmt)
+                entry = AnalysisEntry(stmt, analyzer.dependencies, analyzer.declarations,
+                                      errors[first_error:], analyzer.types)
+            else:
+                self.reused += 1
+                errors.extend(entry.errors)
+                for name, info in entry.declarations:
+                    global_scope[name] = info
+                    analyzer.visible[name] = [info]
+                if entry.node is not stmt:
+                    mapping = _pair_nodes(entry.node, stmt)
+                    entry = entry._replace(node=stmt, types={mapping[n]: t for n, t in entry.types.items()})
+            types.update(entry.types)
+            cache.setdefault(stmt.structural_hash, []).append(entry)
+
+        # solo se conservan las entradas del programa actual
+        self.cache = cache
+        self.errors = errors
+        self.types = types
+        if errors:
+            raise SemanticError("\n".join(errors))
@@ -0,0 +1,100 @@
+# inliner.py
+"""
+Qué funciones puede copiar IRGenerator en el lugar de cada llamada
+(IRGenerator(inline_budget=...)).
+
+Una función se copia si:
+
+- no es import y su cuerpo es código sin saltos: declaraciones con
+  inicializador, asignaciones, print y llamadas (el valor de las que se
+  usan como sentencia se descarta con POP, como fuera de la copia), con
+  un return al final (obligatorio si retorna un valor). Sin etiquetas en
+  el código copiado, la pila al llegar a cada LABEL sigue siendo la del
+  llamador.
+- no es recursiva, directa ni indirectamente (ver call_graph); así copiar
+  las llamadas de una función copiada siempre termina.
+- su cuerpo tiene como mucho 'budget' nodos del AST.
+
+IRGenerator pone los locales de la copia en slots nuevos al final del frame
+del llamador (o de los globales, en el nivel superior): no pisan las
+variables del llamador ni las de otra copia que esté en curso.
+"""
+
+from AST import (
+    ASTNode, FuncDeclaration, VarDeclaration, Assignment, PrintStatement, ReturnStatement, FunctionCall
+)
+
+DEFAULT_INLINE_BUDGET = 20
+
+# sentencias que pueden ir antes del return final
+STRAIGHT_LINE = (Assignment, PrintStatement, FunctionCall)
+
+
+def iter_nodes(root):
+    """Todos los nodos del subárbol de 'root' (un nodo o una lista), sin recursión."""
+    pending = [root]
+    while pending:
+        item = pending.pop()
+        if isinstance(item, list):
+            pending.extend(item)
+        elif isinstance(item, ASTNode):
+            yield item
+            for name, kind in item._fields:
+                if kind != 'value':
+                    value = getattr(item, name)
+                    if value is not None:
+                        pending.append(value)
+
+
+def function_declarations(program):
+    """nombre -> FuncDeclaration, también las declaradas dentro de bloques."""
+    return {node.func_name.name: node for node in iter_nodes(program.statements)
+            if isinstance(node, FuncDeclaration)}
+
+
+def call_graph(functions):
+    """nombre -> nombres de las funciones que llama su cuerpo."""
+    return {name: {node.identifier.name for node in iter_nodes(func.body or [])
+                   if isinstance(node, FunctionCall)}
+            for name, func in functions.items()}
+
+
+def recursive_functions(graph):
+    """Las funciones desde las que una cadena de llamadas vuelve a ellas mismas."""
+    recursive = set()
+    for name in graph:
+        seen = set()
+        pending = list(graph[name])
+        while pending:
+            callee = pending.pop()
+            if callee == name:
+                recursive.add(name)
+                break
+            if callee not in seen and callee in graph:
+                seen.add(callee)
+                pending.extend(graph[callee])
+    return recursive
+
+
+def is_straight_line(func):
+    body = func.body or []
+    returns = (func.return_type or 'void') != 'void'
+    last = body[-1] if body else None
+    if returns and not (isinstance(last, ReturnStatement) and last.expression is not None):
+        return False
+    if isinstance(last, ReturnStatement):
+        body = body[:-1]
+    return all(isinstance(stmt, STRAIGHT_LINE)
+               or (isinstance(stmt, VarDeclaration) and stmt.initializer is not None)
+               for stmt in body)
+
+
+def inlinable_functions(program, budget=DEFAULT_INLINE_BUDGET):
+    """nombre -> FuncDeclaration de las funciones que se pueden copiar."""
+    if budget <= 0:
+        return {}
+    functions = function_declarations(program)
+    recursive = recursive_functions(call_graph(functions))
+    return {name: func for name, func in functions.items()
+            if not func.is_import and name not in recursive and is_straight_line(func)
+            and sum(1 for _ in iter_nodes(func.body)) <= budget}
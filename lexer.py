@@ -1,13 +1,110 @@
 import re
+import os
+import mmap
+from array import array
+from bisect import bisect_right
+from contextlib import contextmanager
 from Token import TokenType, Token
 
+PATRON = r"""
+    (?P<SPACE>\s+) |
+    (?P<COMMENT>//[^\n]*) |
+    (?P<MLCOMMENT>/\*.*?\*/) |
+    (?P<FLOAT>\d+\.\d+) |
+    (?P<INTEGER>\d+) |
+    (?P<CHAR>'[^']') |
+    (?P<ID>[a-zA-Z_]\w*) |
+    (?P<OP>(==|!=|<=|>=|\|\||&&|[\+\-\*/<>\^=;(),{}`])) |
+    (?P<ERROR>.)
+"""
+
+# Se compila una sola vez: la versión str para texto en memoria y la
+# versión bytes para fuentes mapeadas con mmap. En bytes un carácter no
+# ASCII es una secuencia UTF-8 de varios bytes: CHAR, ID y ERROR la toman
+# completa, como toman el carácter en la versión str (ver Lexer.scan para ID).
+_SECUENCIA_UTF8 = r"[\xc0-\xff][\x80-\xbf]*"
+_PATRON_UTF8 = (PATRON
+                .replace(r"(?P<CHAR>'[^']')", rf"(?P<CHAR>'(?:[^'\x80-\xff]|{_SECUENCIA_UTF8})')")
+                .replace(r"(?P<ID>[a-zA-Z_]\w*)", rf"(?P<ID>[a-zA-Z_]\w*(?:{_SECUENCIA_UTF8}\w*)*)")
+                .replace(r"(?P<ERROR>.)", rf"(?P<ERROR>{_SECUENCIA_UTF8}|.)"))
+_FLAGS = re.VERBOSE | re.DOTALL | re.MULTILINE
+_PATRON_TEXTO = re.compile(PATRON, _FLAGS)
+_PATRON_BYTES = re.compile(_PATRON_UTF8.encode('ascii'), _FLAGS)
+# resto de un identificador, con \w de Unicode como en _PATRON_TEXTO
+_CONTINUACION_ID = re.compile(r"\w*")
+
+
+class LineIndex:
+    """
+    Tabla de offsets de inicio de línea para resolver offset -> (línea, columna)
+    bajo demanda con bisect. Los saltos de línea se buscan con str.find /
+    bytes.find (un recorrido en C por línea, no por carácter) y solo hasta
+    el offset más alto consultado, así que un lexer sin errores nunca la
+    construye completa.
+    """
+
+    def __init__(self, texto):
+        self.texto = texto
+        self.starts = array('Q', [0])
+        self._newline = '\n' if isinstance(texto, str) else b'\n'
+        self._scanned = 0  # todos los saltos anteriores a este offset ya están en starts
+
+    def _scan_to(self, offset):
+        find = self.texto.find
+        newline = self._newline
+        starts = self.starts
+        pos = self._scanned
+        while pos <= offset:
+            i = find(newline, pos)
+            if i < 0:
+                pos = len(self.texto) + 1
+                break
+            pos = i + 1
+            starts.append(pos)
+        self._scanned = pos
+
+    def position(self, offset):
+        """
+        Retorna (línea, columna), ambas desde 1, del offset dado. En un
+        buffer de bytes los offsets son de bytes, pero la columna se cuenta
+        en caracteres, como en el texto decodificado.
+        """
+        if offset >= self._scanned:
+            self._scan_to(offset)
+        i = bisect_right(self.starts, offset) - 1
+        start = self.starts[i]
+        if self._newline == b'\n':
+            prefix = self.texto[start:offset]
+            if not prefix.isascii():
+                return i + 1, len(prefix.decode('utf-8', 'replace')) + 1
+        return i + 1, offset - start + 1
+
+
+@contextmanager
+def map_source(path):
+    """
+    Abre 'path' en modo lectura y lo mapea en memoria con mmap.
+    El buffer resultante se puede pasar directamente a Lexer; el sistema
+    operativo carga las páginas bajo demanda, así que el archivo nunca se
+    copia completo a un str de Python.
+    """
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            # mmap no admite archivos vacíos
+            yield b''
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            yield buffer
+
 class Lexer:
     def __init__(self, texto):
         self.texto = texto
         self.pos = 0
-        self.linea = 1
-        self.columna = 1
+        self.lines = LineIndex(texto)
         self.tokens = []
+        # Offsets de los '/*' sin cierre: la regla MLCOMMENT los revisa hasta
+        # el final del fuente, así que una edición posterior puede cambiarlos.
+        self.open_comments = []
 
         self.reservadas = {
             'const': TokenType.CONST,
@@ -49,70 +146,91 @@ class Lexer:
             '`': TokenType.DEREF
         }
 
-    def _update_pos(self, texto):
-        for char in texto:
-            if char == '\n':
-                self.linea += 1
-                self.columna = 1
-            else:
-                self.columna += 1
-        self.pos += len(texto)
+    def _where(self, offset):
+        linea, columna = self.lines.position(offset)
+        return f"línea {linea}, columna {columna}"
 
     def analizar(self):
-        patron = re.compile(r"""
-            (?P<SPACE>\s+) |
-            (?P<COMMENT>//[^\n]*) |
-            (?P<MLCOMMENT>/\*.*?\*/) |
-            (?P<FLOAT>\d+\.\d+) |
-            (?P<INTEGER>\d+) |
-            (?P<CHAR>'[^']') |
-            (?P<ID>[a-zA-Z_]\w*) |
-            (?P<OP>(==|!=|<=|>=|\|\||&&|[\+\-\*/<>\^=;(),{}])) |
-            (?P<ERROR>.)
-        """,  re.VERBOSE | re.DOTALL | re.MULTILINE)
-
-        while self.pos < len(self.texto):
-            match = patron.match(self.texto, self.pos)
+        self.tokens.extend(self.iter_tokens())
+        return self.tokens
+
+    def iter_tokens(self):
+        """
+        Genera los tokens uno a uno sin acumularlos en self.tokens.
+        'texto' puede ser un str o un buffer de bytes (p. ej. un mmap).
+        """
+        lines = self.lines
+        for tipo, lexema, inicio, fin in self.scan():
+            yield Token(tipo, lexeme_value(tipo, lexema), inicio, lines, fin)
+
+    def scan(self):
+        """
+        Recorre el fuente desde self.pos y genera tuplas
+        (tipo, lexema, inicio, fin) sin construir objetos Token.
+        """
+        texto = self.texto
+        binario = not isinstance(texto, str)
+        patron = _PATRON_BYTES if binario else _PATRON_TEXTO
+        longitud = len(texto)
+        reservadas = self.reservadas
+        simbolos = self.simbolos
+
+        while self.pos < longitud:
+            inicio = self.pos
+            match = patron.match(texto, inicio)
 
             if not match:
-                raise SyntaxError(f"Carácter inesperado en línea {self.linea}, columna {self.columna}")
+                raise SyntaxError(f"Carácter inesperado en {self._where(inicio)}")
 
             tipo = match.lastgroup
-            valor = match.group(tipo)
+            # match.end() es un offset en el buffer original (bytes en mmap)
+            self.pos = match.end()
 
-            if tipo in ['SPACE', 'COMMENT', 'MLCOMMENT']:
-                self._update_pos(valor)
+            if tipo in ('SPACE', 'COMMENT', 'MLCOMMENT'):
                 continue
 
-            elif tipo == 'FLOAT':
-                self.tokens.append(Token(TokenType.FLOAT, float(valor), self.linea, self.columna))
-
-            elif tipo == 'INTEGER':
-                self.tokens.append(Token(TokenType.INTEGER, int(valor), self.linea, self.columna))
-
-            elif tipo == 'CHAR':
-                self.tokens.append(Token(TokenType.CHAR, valor[1], self.linea, self.columna))
+            valor = match.group(tipo)
+            if binario:
+                valor = valor.decode('utf-8', 'replace')
+                if tipo == 'ID' and not valor.isascii():
+                    # el patrón de bytes acepta cualquier secuencia no ASCII
+                    # en un identificador; se corta donde \w de Unicode no sigue
+                    valor = valor[:_CONTINUACION_ID.match(valor, 1).end()]
+                    self.pos = inicio + len(valor.encode('utf-8'))
 
-            elif tipo == 'ID':
-                tipo_token = self.reservadas.get(valor, 'IDENT')  # palabra reservada o identificador
-                tipo_token = self.reservadas.get(valor, TokenType.IDENTIFIER)  # palabra reservada o identificador
-                self.tokens.append(Token(tipo_token, valor, self.linea, self.columna))
+            if tipo == 'ID':
+                yield reservadas.get(valor, TokenType.IDENTIFIER), valor, inicio, self.pos  # palabra reservada o identificador
 
             elif tipo == 'OP':
-                tipo_token = self.simbolos.get(valor)
-                if tipo_token:
-                    self.tokens.append(Token(tipo_token, valor, self.linea, self.columna))
-                else:
-                    raise SyntaxError(f"Símbolo no reconocido: {valor} en línea {self.linea}, columna {self.columna}")
+                tipo_token = simbolos.get(valor)
+                if not tipo_token:
+                    raise SyntaxError(f"Símbolo no reconocido: {valor} en {self._where(inicio)}")
+                if valor == '/' and texto[self.pos:self.pos + 1] in ('*', b'*'):
+                    self.open_comments.append(inicio)
+                yield tipo_token, valor, inicio, self.pos
 
-            elif tipo == 'ERROR':
-                print(f"⚠️  Token inválido: {valor} en línea {self.linea}, columna {self.columna}")
-                self._update_pos(valor)  # Actualiza la posición para evitar el bucle infinito.
-                continue
+            elif tipo == 'INTEGER':
+                yield TokenType.INTEGER, valor, inicio, self.pos
 
-            self._update_pos(valor)
+            elif tipo == 'FLOAT':
+                yield TokenType.FLOAT, valor, inicio, self.pos
 
-        return self.tokens
+            elif tipo == 'CHAR':
+                yield TokenType.CHAR, valor, inicio, self.pos
+
+            elif tipo == 'ERROR':
+                print(f"⚠️  Token inválido: {valor} en {self._where(inicio)}")
+
+
+def lexeme_value(tipo, lexema):
+    """Convierte el lexema crudo en el valor que guarda el Token."""
+    if tipo == TokenType.INTEGER:
+        return int(lexema)
+    if tipo == TokenType.FLOAT:
+        return float(lexema)
+    if tipo == TokenType.CHAR:
+        return lexema[1]
+    return lexema
 
 
 if __name__ == "__main__":
@@ -0,0 +1,71 @@
+# linker.py
+
+from IR import encode
+
+FUNCTION_PREFIX = 'FUNC_'
+
+
+def split_functions(instructions):
+    """
+    Separa el IR de IRGenerator en el código de nivel superior (hasta la
+    primera 'LABEL FUNC_...') y el de cada función: nombre -> instrucciones
+    desde su LABEL hasta la LABEL de la siguiente función.
+    """
+    top_level = []
+    functions = {}
+    current = top_level
+    for instr in instructions:
+        if instr.opcode == 'LABEL' and instr.arg.startswith(FUNCTION_PREFIX):
+            current = functions[instr.arg[len(FUNCTION_PREFIX):]] = []
+        current.append(instr)
+    return top_level, functions
+
+
+def reachable_functions(top_level, functions):
+    """Nombres de las funciones que se pueden llamar desde el nivel superior."""
+    reachable = set()
+    pending = [top_level]
+    while pending:
+        for instr in pending.pop():
+            if instr.opcode == 'CALL' and instr.arg not in reachable and instr.arg in functions:
+                reachable.add(instr.arg)
+                pending.append(functions[instr.arg])
+    return reachable
+
+
+class Linker:
+    """
+    Última etapa antes de StackMachine: arma la imagen que se ejecuta a
+    partir del IR. Quita las funciones que ninguna cadena de CALL alcanza
+    desde el nivel superior y codifica el resto sin las pseudo-instrucciones
+    LABEL, con cada salto y CALL apuntando al índice absoluto de su destino.
+
+    Después de link(), 'removed_functions' tiene los nombres de las
+    funciones eliminadas y 'stripped_labels' cuántas LABEL se quitaron.
+    """
+
+    def __init__(self):
+        self.removed_functions = []
+        self.stripped_labels = 0
+
+    def link(self, instructions):
+        top_level, functions = split_functions(instructions)
+        reachable = reachable_functions(top_level, functions)
+        kept = list(top_level)
+        for name, code in functions.items():
+            if name in reachable:
+                kept.extend(code)
+            else:
+                self.removed_functions.append(name)
+        self.stripped_labels = sum(1 for instr in kept if instr.opcode == 'LABEL')
+        return encode(kept, strip_labels=True)
+
+    def report(self):
+        removed = ", ".join(self.removed_functions) or "ninguna"
+        return (f"Linker: {self.stripped_labels} etiquetas resueltas; "
+                f"funciones sin usar eliminadas: {removed}")
+
+
+def link(instructions):
+    """Atajo de Linker().link(instructions)."""
+    return Linker().link(instructions)
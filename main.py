@@ -1,56 +1,132 @@
 # main.py
 
 import sys
-import json
+import time
+import argparse
 from stack_machine import StackMachine
-from lexer import Lexer
+from lexer import Lexer, map_source
+from token_stream import TokenStream
 from Parser import Parser
+from ast_arena import ArenaBuilder
 from ASemantico import SemanticAnalyzer, SemanticError
-from Parser import ast_to_dict, write_ast_to_json
+from Parser import write_ast_json, write_ast_to_json
+import ast_binary
 from IRGenerator import IRGenerator
-
-
-def main(filepath):
+from linker import Linker
+from superinstructions import SuperinstructionFuser
+from register_vm import RegisterCompiler, RegisterMachine, function_signatures
+from peephole import PeepholeOptimizer
+from optimizer import ASTOptimizer
+from inliner import DEFAULT_INLINE_BUDGET
+from parallel import compile_program
+from batch import find_sources, compile_batch, print_summary
+
+
+def parse_file(filepath, stream=False, arena=False):
+    """
+    Lee, tokeniza y parsea 'filepath' recuperándose de los errores de
+    sintaxis. Retorna (ast, errores); el AST puede contener ErrorStatement.
+    En modo stream el archivo se mapea con mmap y el Parser consume los
+    tokens a medida que el lexer los genera, sin materializar la lista.
+    Con arena=True el AST se guarda en arrays (ast_arena) y se recorre con
+    vistas que tienen la misma interfaz que los nodos de AST.py.
+    """
+    builder = ArenaBuilder() if arena else None
+    if stream:
+        with map_source(filepath) as source:
+            parser = Parser(TokenStream(Lexer(source).iter_tokens()), recover=True, builder=builder)
+            return parser.parse(), parser.errors
+
+    # 1) Leer el archivo fuente
+    with open(filepath, 'r', encoding='utf-8') as f:
+        source = f.read()
+
+    # 2) Léxico
+    lexer = Lexer(source)
+    tokens = lexer.analizar()
+    for token in tokens:
+        print(token)
+
+    # 3) Sintáctico
+    parser = Parser(tokens, recover=True, builder=builder)
+    return parser.parse(), parser.errors
+
+
+def main(filepath, stream=False, arena=False, ast_bin=None, parallel=False, jobs=None, optimize=0,
+         backend='stack', inline_budget=None):
     try:
-        # 1) Leer el archivo fuente
-        with open(filepath, 'r', encoding='utf-8') as f:
-            source = f.read()
-
-        # 2) Léxico
-        lexer = Lexer(source)
-        tokens = lexer.analizar()
-        for token in tokens:
-            print(token)
-
-        # 3) Sintáctico y semantico
-        parser = Parser(tokens)
+        # 1-3) Lectura, léxico y sintáctico
+        ast, syntax_errors = parse_file(filepath, stream=stream, arena=arena)
         analyzer = SemanticAnalyzer()
 
-        ast = parser.parse()
-
-        
-        # 4) Semántico
-
-        analyzer.analyze(ast)
+        if syntax_errors:
+            # Se reportan todos los errores de sintaxis y, además, los
+            # semánticos de las partes que sí se pudieron parsear.
+            print("❌ Errores sintácticos:\n" + "\n".join(syntax_errors))
+            analyzer.analyze(ast)
+            sys.exit(1)
+
+        if parallel:
+            # 4-5) Semántico e IR, cada función en un proceso
+            instructions = compile_program(ast, jobs=jobs)
+        else:
+            # 4) Semántico
+            analyzer.analyze(ast)
+
+            # 5) Generar código intermedio; con -O2, de un AST optimizado
+            ir_ast, types = ast, analyzer.types
+            if optimize >= 2:
+                optimizer = ASTOptimizer(analyzer.types)
+                ir_ast, types = optimizer.optimize(ast), optimizer.types
+                print(optimizer.report())
+            # con -O2 se copian las funciones chicas en cada llamada, salvo
+            # que --inline-budget diga otra cosa
+            if inline_budget is None:
+                inline_budget = DEFAULT_INLINE_BUDGET if optimize >= 2 else 0
+            irgen = IRGenerator(types=types, inline_budget=inline_budget)
+            instructions = irgen.generate(ir_ast)
+            if irgen.inlined:
+                print("Funciones copiadas en línea: " + ", ".join(
+                    f"{name} ({count})" for name, count in irgen.inlined.items()))
+
+        if optimize >= 1:
+            peephole = PeepholeOptimizer()
+            instructions = peephole.optimize(instructions)
+            print(peephole.report())
 
-        # 5) Generar código intermedio
-        irgen = IRGenerator()
-        instructions = irgen.generate(ast)
-        
         # Mostrar IR generado
         print("\n📥 Código Intermedio (IR):")
         for instr in instructions:
             print(instr)
 
-        # Ejecutar el código intermedio
-        machine = StackMachine(instructions)
-        machine.run()
-
-
-        # 6) Mostrar y guardar el AST en JSON
-        ast_dict = ast_to_dict(ast)
-        print(json.dumps(ast_dict, indent=2))
+        if backend == 'register':
+            # Traducir a código de registros y ejecutar
+            program = RegisterCompiler(function_signatures(ast)).compile(instructions)
+            print("\n📥 Código de registros:")
+            print("\n".join(program.listing()))
+            RegisterMachine(program).run()
+        else:
+            # Enlazar (etiquetas -> índices, sin funciones sin usar) y ejecutar
+            linker = Linker()
+            image = linker.link(instructions)
+            print(linker.report())
+            if optimize >= 1:
+                fuser = SuperinstructionFuser()
+                image = fuser.fuse(image)
+                print(fuser.report())
+            machine = StackMachine(image)
+            machine.run()
+
+
+        # 6) Mostrar y guardar el AST en JSON (se escribe directo desde el
+        # AST, sin armar el árbol de diccionarios)
+        write_ast_json(ast, sys.stdout)
+        print()
         write_ast_to_json(ast, filename="ast.json")
+        if ast_bin:
+            with open(ast_bin, 'wb') as f:
+                ast_binary.dump(ast, f)
+            print(f"AST binario escrito en {ast_bin}")
 
         print("\n✅ Análisis completo y exitoso.")
         sys.exit(0)
@@ -67,11 +143,53 @@ def main(filepath):
         print(f"❌ No se encontró el archivo: {filepath}")
         sys.exit(1)
 
+def main_batch(directory, jobs=None):
+    paths = find_sources(directory)
+    if not paths:
+        print(f"❌ No hay archivos .gox en: {directory}")
+        sys.exit(1)
+    start = time.perf_counter()
+    results = compile_batch(paths, jobs=jobs)
+    print_summary(results, time.perf_counter() - start)
+    sys.exit(0 if all(r.status == 'ok' for r in results) else 1)
+
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print("Uso: python main.py <archivo_fuente>")
+    argparser = argparse.ArgumentParser(description="Compilador Mani")
+    argparser.add_argument("archivo_fuente", nargs="?")
+    argparser.add_argument("--stream", action="store_true",
+                           help="lee el fuente con mmap y parsea los tokens a medida que se generan")
+    argparser.add_argument("--arena", action="store_true",
+                           help="guarda el AST en arrays paralelos en lugar de un objeto por nodo")
+    argparser.add_argument("--ast-bin", metavar="ARCHIVO",
+                           help="guarda además el AST en el formato binario de ast_binary")
+    argparser.add_argument("--batch", metavar="DIR",
+                           help="compila todos los .gox bajo DIR en paralelo")
+    argparser.add_argument("--parallel", action="store_true",
+                           help="analiza y genera el IR de cada función en un pool de procesos")
+    argparser.add_argument("--jobs", type=int, default=None,
+                           help="procesos para --batch y --parallel (por defecto, uno por núcleo)")
+    argparser.add_argument("-O", dest="optimize", action="store_const", const=1, default=0,
+                           help="optimiza el IR con el peephole (peephole.py) y usa superinstrucciones"
+                                " (superinstructions.py) en la máquina de pila")
+    argparser.add_argument("-O2", dest="optimize", action="store_const", const=2,
+                           help="además pliega constantes y elimina código muerto en el AST (optimizer.py);"
+                                " con --parallel solo se aplica el peephole")
+    argparser.add_argument("--backend", choices=("stack", "register"), default="stack",
+                           help="máquina que ejecuta el programa: la de pila o la de registros (register_vm.py)")
+    argparser.add_argument("--inline-budget", type=int, metavar="NODOS", default=None,
+                           help="copia en cada llamada las funciones de hasta NODOS nodos sin saltos ni"
+                                f" recursión (inliner.py); 0 lo desactiva. Por defecto {DEFAULT_INLINE_BUDGET}"
+                                " con -O2 y 0 sin -O2")
+    args = argparser.parse_args()
+    if args.batch:
+        main_batch(args.batch, jobs=args.jobs)
+    elif args.archivo_fuente:
+        main(args.archivo_fuente, stream=args.stream, arena=args.arena, ast_bin=args.ast_bin,
+             parallel=args.parallel, jobs=args.jobs, optimize=args.optimize,
+             backend=args.backend, inline_budget=args.inline_budget)
+    else:
+        argparser.print_usage()
         sys.exit(1)
-    main(sys.argv[1])
 
 
 # 1) Leer el archivo fuente
@@ -0,0 +1,348 @@
+# optimizer.py
+
+from AST import (
+    Program, VarDeclaration, Assignment, FuncDeclaration, IfStatement, WhileStatement,
+    ReturnStatement, BreakStatement, ContinueStatement, PrintStatement,
+    BinaryOp, UnaryOp, Literal, FunctionCall, Location, Cast
+)
+from visitor import Visitor
+
+# Después de estas, el resto del bloque no se ejecuta
+TERMINALS = (ReturnStatement, BreakStatement, ContinueStatement)
+
+
+def literal_type(value):
+    """Tipo de un valor de Literal, como en SemanticAnalyzer.analyze_Literal."""
+    # bool antes que int: True es un int en Python
+    if isinstance(value, bool):
+        return 'bool'
+    if isinstance(value, int):
+        return 'int'
+    if isinstance(value, float):
+        return 'float'
+    return 'char'
+
+
+def _machine_value(value):
+    # en la máquina un char es su código (IRGenerator emite CONSTI ord(c))
+    return ord(value) if isinstance(value, str) else value
+
+
+def fold_binary(op, left, right):
+    """
+    Valor de 'left op right' para dos valores de Literal, con las reglas de
+    tipos de analyze_BinaryOp y la semántica de StackMachine (DIVI es
+    división entera con //). None si no se puede plegar: tipos que el
+    analizador rechaza o una operación que falla en ejecución.
+    """
+    left_type, right_type = literal_type(left), literal_type(right)
+    a, b = _machine_value(left), _machine_value(right)
+    if op in ('&&', '||'):
+        if left_type == right_type == 'bool':
+            return (a and b) if op == '&&' else (a or b)
+        return None
+    if op in ('<', '>', '<=', '>='):
+        if left_type not in ('int', 'float') or right_type not in ('int', 'float'):
+            return None
+        return {'<': a < b, '>': a > b, '<=': a <= b, '>=': a >= b}[op]
+    if op in ('==', '!='):
+        if left_type != right_type:
+            return None
+        return (a == b) if op == '==' else (a != b)
+    if op in ('+', '-', '*', '/') and left_type == right_type and left_type in ('int', 'float'):
+        if op == '+':
+            return a + b
+        if op == '-':
+            return a - b
+        if op == '*':
+            return a * b
+        if b == 0:
+            return None
+        return a // b if left_type == 'int' else a / b
+    return None
+
+
+def fold_unary(op, value):
+    if op in ('+', '-') and literal_type(value) in ('int', 'float'):
+        return -value if op == '-' else value
+    # '^' reserva memoria: se hace en ejecución
+    return None
+
+
+def fold_cast(target, value):
+    """Como las conversiones que emite IRGenerator.gen_Cast."""
+    source = literal_type(value)
+    if source == target:
+        return value
+    v = _machine_value(value)
+    try:
+        if target == 'bool':
+            return v != 0
+        if target == 'float':
+            return float(v)
+        if target == 'int':
+            return int(v)
+        if target == 'char':
+            return chr(int(v))
+    except (ArithmeticError, ValueError):
+        pass
+    return None
+
+
+class ASTOptimizer(Visitor):
+    """
+    Pase sobre el AST ya analizado (sin errores) que se corre antes de
+    IRGenerator con -O2:
+
+    - las constantes con inicializador literal (o que se pliega a uno) se
+      reemplazan en cada uso y su declaración se elimina
+    - BinaryOp, UnaryOp y Cast sobre literales se pliegan a un Literal
+    - if / while con condición constante se reducen a la rama que se
+      ejecuta (o a nada)
+    - las sentencias después de return, break o continue en un mismo
+      bloque se eliminan
+
+    No modifica el árbol: retorna uno nuevo que comparte los subárboles
+    sin cambios. Los nodos nuevos se agregan a 'types' (una copia de
+    SemanticAnalyzer.types) para pasarlo a IRGenerator. 'stats' cuenta
+    cuántas veces se aplicó cada transformación.
+    """
+    method_prefix = 'optimize_'
+
+    def __init__(self, types):
+        self.types = dict(types)
+        self.stats = {'folded': 0, 'propagated': 0, 'branches': 0, 'unreachable': 0}
+        # como en Resolver: (nombres declarados) por ámbito y, por nombre, la
+        # pila de valores visibles: el Literal de una constante o None
+        self.scopes = []
+        self.visible = {}
+
+    def optimize(self, program):
+        return self.run(program)
+
+    def report(self):
+        """Resumen legible de 'stats'."""
+        lines = ["Optimizador del AST:"]
+        for name, count in self.stats.items():
+            lines.append(f"  {name:<12} {count:6d}")
+        return "\n".join(lines)
+
+    # ámbitos
+
+    def push_scope(self):
+        self.scopes.append([])
+
+    def pop_scope(self):
+        for name in self.scopes.pop():
+            values = self.visible[name]
+            values.pop()
+            if not values:
+                del self.visible[name]
+
+    def declare(self, name, value=None):
+        self.scopes[-1].append(name)
+        self.visible.setdefault(name, []).append(value)
+
+    # nodos nuevos
+
+    def rebuilt(self, old, new):
+        """'new' reemplaza a 'old': hereda su span y su tipo."""
+        span = old.span
+        if span is not None:
+            new.span = span
+        if old in self.types:
+            self.types[new] = self.types[old]
+        return new
+
+    def literal(self, old, value):
+        new = self.rebuilt(old, Literal(value))
+        self.types[new] = literal_type(value)
+        return new
+
+    def statements(self, body):
+        """Optimiza una lista de sentencias; cada una puede quedar en 0, 1 o varias."""
+        result = []
+        for i, stmt in enumerate(body):
+            new = yield self.visit(stmt)
+            # una llamada usada como sentencia se optimiza como expresión
+            if isinstance(new, list):
+                result.extend(new)
+            else:
+                result.append(new)
+            if result and isinstance(result[-1], TERMINALS):
+                self.stats['unreachable'] += len(body) - i - 1
+                break
+        return result
+
+    def block(self, body):
+        self.push_scope()
+        result = yield self.statements(body)
+        self.pop_scope()
+        return result
+
+    # sentencias: retornan la lista de sentencias que las reemplaza
+
+    def optimize_Program(self, node):
+        self.push_scope()
+        statements = yield self.statements(node.statements)
+        self.pop_scope()
+        if _same(statements, node.statements):
+            return node
+        return self.rebuilt(node, Program(statements))
+
+    def optimize_VarDeclaration(self, node):
+        initializer = node.initializer
+        if initializer is not None:
+            initializer = yield self.visit(initializer)
+        name = node.identifier.name
+        if node.is_const and isinstance(initializer, Literal):
+            # cada uso pasa a ser el literal: la declaración ya no hace falta
+            self.declare(name, initializer)
+            return []
+        self.declare(name)
+        if initializer is node.initializer:
+            return [node]
+        return [self.rebuilt(node, VarDeclaration(node.is_const, node.identifier, node.var_type, initializer))]
+
+    def optimize_Assignment(self, node):
+        location = node.location
+        if location.is_deref:
+            base = yield self.visit(location.base)
+            if base is not location.base:
+                location = self.rebuilt(location, Location(base, is_deref=True))
+        # una location sin deref es el destino: no se reemplaza
+        expression = yield self.visit(node.expression)
+        if location is node.location and expression is node.expression:
+            return [node]
+        return [self.rebuilt(node, Assignment(location, expression))]
+
+    def optimize_FuncDeclaration(self, node):
+        if node.body is None:
+            return [node]
+        self.push_scope()
+        for param in node.parameters:
+            self.declare(param.identifier.name)
+        body = yield self.statements(node.body)
+        self.pop_scope()
+        if _same(body, node.body):
+            return [node]
+        return [self.rebuilt(node, FuncDeclaration(node.is_import, node.identifier, node.parameters,
+                                                   node.return_type, body))]
+
+    def optimize_IfStatement(self, node):
+        condition = yield self.visit(node.condition)
+        if isinstance(condition, Literal):
+            self.stats['branches'] += 1
+            taken = node.then_body if condition.value else node.else_body
+            body = yield self.block(taken or [])
+            if any(isinstance(stmt, VarDeclaration) for stmt in body):
+                # sus variables no pueden pasar al ámbito de afuera: queda
+                # un if true (el peephole quita el salto)
+                return [self.rebuilt(node, IfStatement(self.literal(condition, True), body))]
+            return body
+        then_body = yield self.block(node.then_body)
+        else_body = node.else_body
+        if else_body:
+            else_body = yield self.block(else_body)
+        if condition is node.condition and _same(then_body, node.then_body) \
+                and (else_body is node.else_body or _same(else_body, node.else_body)):
+            return [node]
+        return [self.rebuilt(node, IfStatement(condition, then_body, else_body))]
+
+    def optimize_WhileStatement(self, node):
+        condition = yield self.visit(node.condition)
+        if isinstance(condition, Literal) and not condition.value:
+            self.stats['branches'] += 1
+            return []
+        body = yield self.block(node.body)
+        if condition is node.condition and _same(body, node.body):
+            return [node]
+        return [self.rebuilt(node, WhileStatement(condition, body))]
+
+    def optimize_ReturnStatement(self, node):
+        if node.expression is None:
+            return [node]
+        expression = yield self.visit(node.expression)
+        if expression is node.expression:
+            return [node]
+        return [self.rebuilt(node, ReturnStatement(expression))]
+
+    def optimize_PrintStatement(self, node):
+        expression = yield self.visit(node.expression)
+        if expression is node.expression:
+            return [node]
+        return [self.rebuilt(node, PrintStatement(expression))]
+
+    def optimize_BreakStatement(self, node):
+        return [node]
+
+    optimize_ContinueStatement = optimize_ErrorStatement = optimize_BreakStatement
+
+    # expresiones: retornan la expresión que las reemplaza
+
+    def constant(self, node, name):
+        values = self.visible.get(name)
+        if values and values[-1] is not None:
+            self.stats['propagated'] += 1
+            return self.literal(node, values[-1].value)
+        return node
+
+    def optimize_Identifier(self, node):
+        return self.constant(node, node.name)
+
+    def optimize_Location(self, node):
+        if not node.is_deref:
+            return self.constant(node, node.base.name)
+        base = yield self.visit(node.base)
+        if base is node.base:
+            return node
+        return self.rebuilt(node, Location(base, is_deref=True))
+
+    def optimize_Literal(self, node):
+        return node
+
+    def optimize_BinaryOp(self, node):
+        left = yield self.visit(node.left)
+        right = yield self.visit(node.right)
+        if isinstance(left, Literal) and isinstance(right, Literal):
+            value = fold_binary(node.operator, left.value, right.value)
+            if value is not None:
+                self.stats['folded'] += 1
+                return self.literal(node, value)
+        if left is node.left and right is node.right:
+            return node
+        return self.rebuilt(node, BinaryOp(left, node.operator, right))
+
+    def optimize_UnaryOp(self, node):
+        expression = yield self.visit(node.expression)
+        if isinstance(expression, Literal):
+            value = fold_unary(node.operator, expression.value)
+            if value is not None:
+                self.stats['folded'] += 1
+                return self.literal(node, value)
+        if expression is node.expression:
+            return node
+        return self.rebuilt(node, UnaryOp(node.operator, expression))
+
+    def optimize_Cast(self, node):
+        expression = yield self.visit(node.expression)
+        if isinstance(expression, Literal):
+            value = fold_cast(node.target_type, expression.value)
+            if value is not None:
+                self.stats['folded'] += 1
+                return self.literal(node, value)
+        if expression is node.expression:
+            return node
+        return self.rebuilt(node, Cast(node.target_type, expression))
+
+    def optimize_FunctionCall(self, node):
+        arguments = []
+        for arg in node.arguments:
+            arguments.append((yield self.visit(arg)))
+        if _same(arguments, node.arguments):
+            return node
+        return self.rebuilt(node, FunctionCall(node.identifier, arguments))
+
+
+def _same(new, old):
+    return len(new) == len(old) and all(a is b for a, b in zip(new, old))
@@ -0,0 +1,230 @@
+# parallel.py
+
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from AST import FuncDeclaration
+from ASemantico import SemanticAnalyzer, SemanticError
+from IRGenerator import IRGenerator
+from resolver import Resolver, Resolution
+from utils import trampoline
+
+# Con menos funciones el costo de arrancar los procesos no se recupera
+MIN_PARALLEL_FUNCTIONS = 64
+
+
+class _SignatureAnalyzer(SemanticAnalyzer):
+    """
+    Pase barato sobre el nivel superior: las sentencias que no son funciones
+    se analizan completas y de cada función solo se declara la firma. Por
+    cada función anota cuántas declaraciones globales había antes (las que
+    ve su cuerpo) y cuántos errores, para intercalar después los suyos en
+    el mismo orden que el análisis secuencial.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.marks = []
+
+    def analyze_Program(self, node):
+        # sin pop_scope ni finalize: el ámbito global es la tabla que se
+        # reparte a los workers
+        self.push_scope()
+        for stmt in node.statements:
+            if isinstance(stmt, FuncDeclaration):
+                self.marks.append((len(self.scopes[0]), len(self.errors)))
+                self.declare_signature(stmt)
+            else:
+                yield self.visit(stmt)
+
+    def declare_signature(self, node):
+        # como analyze_FuncDeclaration + declare_function, pero sin reportar:
+        # esos errores los reporta el worker al analizar la función
+        global_scope = self.scopes[0]
+        name = node.func_name.name
+        if name in global_scope:
+            return
+        return_type = node.return_type
+        if return_type and return_type not in ('int', 'float', 'char', 'bool'):
+            return_type = 'error'
+        info = global_scope[name] = {'kind': 'func', 'params': [p.param_type for p in node.parameters],
+                                     'return': return_type or 'void'}
+        self.visible.setdefault(name, []).insert(0, info)
+
+
+class _FunctionAnalyzer(SemanticAnalyzer):
+    """
+    Analizador de una sola función. Las declaraciones globales llegan
+    completas ('declarations': nombre -> (posición, info)) y solo son
+    visibles las que están antes de 'limit', como en el análisis secuencial.
+    """
+
+    def __init__(self, declarations, limit):
+        super().__init__()
+        self.declarations = declarations
+        self.limit = limit
+        self.push_scope()
+
+    def global_info(self, name):
+        entry = self.declarations.get(name)
+        if entry is not None and entry[0] < self.limit:
+            return entry[1]
+        return None
+
+    def lookup(self, name):
+        if name not in self.visible:
+            info = self.global_info(name)
+            if info is not None:
+                return info
+        return super().lookup(name)
+
+    def declare_function(self, name, param_types, return_type):
+        # una firma anterior con el mismo nombre hace que se reporte la
+        # redeclaración igual que en el análisis secuencial
+        info = self.global_info(name)
+        if info is not None:
+            self.scopes[0][name] = info
+        super().declare_function(name, param_types, return_type)
+
+
+class _TopLevelResolver(Resolver):
+    """Resolver del nivel superior que no entra en las funciones del Program."""
+
+    def __init__(self):
+        super().__init__()
+        self.marks = []
+
+    def resolve_Program(self, node):
+        self.push_scope()
+        for stmt in node.statements:
+            if isinstance(stmt, FuncDeclaration):
+                self.marks.append(len(self.scopes[0][1]))
+            else:
+                yield self.visit(stmt)
+
+    def global_slots(self):
+        """nombre -> (posición, Slot) de los globales del nivel superior."""
+        names = self.scopes[0][1]
+        return {name: (i, self.visible[name][0]) for i, name in enumerate(names)}
+
+
+class _FunctionResolver(Resolver):
+    def __init__(self, global_slots, limit):
+        super().__init__()
+        self.global_slots = global_slots
+        self.limit = limit
+
+    def resolve_Identifier(self, node):
+        if node.name not in self.visible:
+            entry = self.global_slots.get(node.name)
+            if entry is not None and entry[0] < self.limit:
+                self.slots[node] = entry[1]
+                return
+        super().resolve_Identifier(node)
+
+
+class _TopLevelGenerator(IRGenerator):
+    """IRGenerator que toma el código ya generado de las funciones compiladas aparte."""
+
+    def __init__(self, resolution, types, compiled):
+        super().__init__(resolution, types)
+        self.compiled = compiled
+
+    def gen_function(self, node):
+        code = self.compiled.get(node)
+        if code is None:
+            return super().gen_function(node)
+        self.instructions.extend(code)
+
+
+# Estado de cada worker: lo fija _init_worker una vez por proceso
+_functions = _declarations = _global_slots = None
+
+
+def _init_worker(functions, declarations, global_slots):
+    global _functions, _declarations, _global_slots
+    _functions, _declarations, _global_slots = functions, declarations, global_slots
+
+
+def _compile_function(task):
+    """
+    Analiza y genera el IR de la función número 'index'. Retorna (errores,
+    instrucciones); las instrucciones son None si hubo errores o si no hay
+    que generar.
+    """
+    index, analyzer_limit, resolver_limit = task
+    func = _functions[index]
+    analyzer = _FunctionAnalyzer(_declarations, analyzer_limit)
+    analyzer.run(func)
+    if analyzer.errors or _global_slots is None:
+        return analyzer.errors, None
+    resolution = _FunctionResolver(_global_slots, resolver_limit).resolve(func)
+    generator = IRGenerator(resolution, analyzer.types)
+    trampoline(generator.gen_function(func))
+    return [], generator.instructions
+
+
+def _pool_context():
+    # con fork los workers heredan el AST sin serializarlo
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('fork')
+    return multiprocessing.get_context()
+
+
+def compile_program(ast, jobs=None, min_functions=MIN_PARALLEL_FUNCTIONS):
+    """
+    Equivalente a SemanticAnalyzer().analyze(ast) seguido de
+    IRGenerator().generate(ast), con el análisis y el IR de cada función
+    del nivel superior repartidos en un ProcessPoolExecutor.
+
+    Las funciones solo pueden declararse en el nivel superior, así que
+    basta un pase sobre él (firmas y globales, en orden) para que cada
+    cuerpo se compile por separado. Los errores se intercalan en el orden
+    del análisis secuencial y se lanzan juntos como SemanticError; el IR
+    es idéntico al secuencial (las etiquetas de cada función ya llevan su
+    nombre). Con menos de 'min_functions' funciones o jobs=1 todo corre en
+    este proceso.
+    """
+    functions = [stmt for stmt in ast.statements if isinstance(stmt, FuncDeclaration)]
+    signatures = _SignatureAnalyzer()
+    signatures.run(ast)
+    declarations = {name: (i, info) for i, (name, info) in enumerate(signatures.scopes[0].items())}
+
+    global_slots = resolver = None
+    resolver_marks = [0] * len(functions)
+    if not signatures.errors:
+        resolver = _TopLevelResolver()
+        resolver.run(ast)
+        global_slots = resolver.global_slots()
+        resolver_marks = resolver.marks
+
+    tasks = [(i, mark, resolver_mark)
+             for i, ((mark, _), resolver_mark) in enumerate(zip(signatures.marks, resolver_marks))]
+    jobs = jobs or os.cpu_count() or 1
+    if jobs == 1 or len(functions) < min_functions:
+        _init_worker(functions, declarations, global_slots)
+        try:
+            results = [_compile_function(task) for task in tasks]
+        finally:
+            _init_worker(None, None, None)
+    else:
+        chunksize = max(1, len(tasks) // (jobs * 8))
+        with ProcessPoolExecutor(max_workers=jobs, mp_context=_pool_context(), initializer=_init_worker,
+                                 initargs=(functions, declarations, global_slots)) as executor:
+            results = list(executor.map(_compile_function, tasks, chunksize=chunksize))
+
+    errors = []
+    previous = 0
+    for (_, error_mark), (function_errors, _) in zip(signatures.marks, results):
+        errors.extend(signatures.errors[previous:error_mark])
+        errors.extend(function_errors)
+        previous = error_mark
+    errors.extend(signatures.errors[previous:])
+    if errors:
+        raise SemanticError("\n".join(errors))
+
+    compiled = {func: code for func, (_, code) in zip(functions, results)}
+    resolution = Resolution(resolver.slots, resolver.frame_sizes, resolver.global_count)
+    generator = _TopLevelGenerator(resolution, signatures.types, compiled)
+    return generator.generate(ast)
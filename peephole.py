@@ -0,0 +1,242 @@
+# peephole.py
+
+from IR import IRInstruction
+
+JUMPS = ('JUMP', 'JUMP_IF_FALSE')
+# después de estas la ejecución no sigue con la instrucción siguiente
+UNCONDITIONAL = ('JUMP', 'RETURN', 'HALT')
+
+CONSTANTS = ('CONSTI', 'CONSTR', 'CONSTB')
+
+# Operaciones que se pueden evaluar en compilación, con la misma semántica
+# que StackMachine, y la instrucción que carga su resultado
+BINARY_FOLDS = {
+    'ADDI': (lambda a, b: a + b, 'CONSTI'),
+    'SUBI': (lambda a, b: a - b, 'CONSTI'),
+    'MULI': (lambda a, b: a * b, 'CONSTI'),
+    'DIVI': (lambda a, b: a // b, 'CONSTI'),
+    'ADDF': (lambda a, b: a + b, 'CONSTR'),
+    'SUBF': (lambda a, b: a - b, 'CONSTR'),
+    'MULF': (lambda a, b: a * b, 'CONSTR'),
+    'DIVF': (lambda a, b: a / b, 'CONSTR'),
+    'AND': (lambda a, b: a and b, 'CONSTB'),
+    'OR': (lambda a, b: a or b, 'CONSTB'),
+}
+for _suffix in 'IF':
+    BINARY_FOLDS.update({
+        'LT' + _suffix: (lambda a, b: a < b, 'CONSTB'),
+        'GT' + _suffix: (lambda a, b: a > b, 'CONSTB'),
+        'LE' + _suffix: (lambda a, b: a <= b, 'CONSTB'),
+        'GE' + _suffix: (lambda a, b: a >= b, 'CONSTB'),
+        'EQ' + _suffix: (lambda a, b: a == b, 'CONSTB'),
+        'NE' + _suffix: (lambda a, b: a != b, 'CONSTB'),
+    })
+
+UNARY_FOLDS = {
+    'NEGI': (lambda a: -a, 'CONSTI'),
+    'NEGF': (lambda a: -a, 'CONSTR'),
+    'ITOF': (float, 'CONSTR'),
+    'FTOI': (int, 'CONSTI'),
+    'BTOI': (int, 'CONSTI'),
+}
+
+STORE_LOAD = {'STORE_LOCAL': 'LOAD_LOCAL', 'STORE_GLOBAL': 'LOAD_GLOBAL'}
+LOAD_STORE = {load: store for store, load in STORE_LOAD.items()}
+
+
+def _constant(instr):
+    # valor en la pila de una carga de constante (CONSTB empuja un bool)
+    return instr.arg != 0 if instr.opcode == 'CONSTB' else instr.arg
+
+
+def _load_constant(opcode, value):
+    return IRInstruction(opcode, int(value) if opcode == 'CONSTB' else value)
+
+
+def _referenced_labels(instructions):
+    # las etiquetas de función se alcanzan con CALL: se conservan siempre
+    return {instr.arg for instr in instructions
+            if instr.opcode in JUMPS or (instr.opcode == 'LABEL' and instr.arg.startswith('FUNC_'))}
+
+
+# Cada regla recibe la lista de instrucciones y retorna (lista nueva,
+# cantidad de veces que se aplicó).
+
+def thread_jumps(instructions):
+    """
+    Un salto a una etiqueta seguida (tras otras etiquetas) de JUMP M va
+    directo a M; un JUMP a la etiqueta que le sigue se elimina.
+    """
+    position = {instr.arg: i for i, instr in enumerate(instructions) if instr.opcode == 'LABEL'}
+
+    def after_labels(label):
+        i = position[label]
+        while i < len(instructions) and instructions[i].opcode == 'LABEL':
+            i += 1
+        return i
+
+    def final_target(label):
+        seen = {label}
+        while True:
+            i = after_labels(label)
+            if i == len(instructions) or instructions[i].opcode != 'JUMP' or instructions[i].arg in seen:
+                return label
+            label = instructions[i].arg
+            seen.add(label)
+
+    result = []
+    applied = 0
+    for i, instr in enumerate(instructions):
+        if instr.opcode in JUMPS:
+            target = final_target(instr.arg)
+            if instr.opcode == 'JUMP' and i < position[target] and all(
+                    instructions[j].opcode == 'LABEL' for j in range(i + 1, position[target])):
+                applied += 1
+                continue
+            if target != instr.arg:
+                instr = IRInstruction(instr.opcode, target)
+                applied += 1
+        result.append(instr)
+    return result, applied
+
+
+def remove_dead_labels(instructions):
+    """Quita las etiquetas a las que no salta nadie."""
+    referenced = _referenced_labels(instructions)
+    result = [instr for instr in instructions if instr.opcode != 'LABEL' or instr.arg in referenced]
+    return result, len(instructions) - len(result)
+
+
+def remove_unreachable(instructions):
+    """Quita lo que sigue a JUMP, RETURN o HALT hasta la próxima etiqueta usada."""
+    referenced = _referenced_labels(instructions)
+    result = []
+    reachable = True
+    for instr in instructions:
+        if instr.opcode == 'LABEL' and instr.arg in referenced:
+            reachable = True
+        if reachable:
+            result.append(instr)
+            reachable = instr.opcode not in UNCONDITIONAL
+    return result, len(instructions) - len(result)
+
+
+def fold_constants(instructions):
+    """
+    Evalúa las operaciones sobre constantes (CONSTI 2; CONSTI 3; ADDI ->
+    CONSTI 5) y los JUMP_IF_FALSE con condición constante. Las que fallarían
+    en ejecución (división por cero, FTOI de inf) se dejan como están.
+    """
+    result = []
+    applied = 0
+    for instr in instructions:
+        op = instr.opcode
+        if op in BINARY_FOLDS and len(result) >= 2 \
+                and result[-1].opcode in CONSTANTS and result[-2].opcode in CONSTANTS:
+            fold, load = BINARY_FOLDS[op]
+            try:
+                value = fold(_constant(result[-2]), _constant(result[-1]))
+            except (ArithmeticError, ValueError):
+                pass
+            else:
+                result[-2:] = [_load_constant(load, value)]
+                applied += 1
+                continue
+        elif op in UNARY_FOLDS and result and result[-1].opcode in CONSTANTS:
+            fold, load = UNARY_FOLDS[op]
+            try:
+                value = fold(_constant(result[-1]))
+            except (ArithmeticError, ValueError):
+                pass
+            else:
+                result[-1] = _load_constant(load, value)
+                applied += 1
+                continue
+        elif op == 'JUMP_IF_FALSE' and result and result[-1].opcode in CONSTANTS:
+            if _constant(result.pop()):
+                applied += 1
+                continue
+            instr = IRInstruction('JUMP', instr.arg)
+            applied += 1
+        result.append(instr)
+    return result, applied
+
+
+def forward_stores(instructions):
+    """
+    STORE x; LOAD x -> DUP; STORE x (el valor ya está en la pila) y
+    LOAD x; STORE x -> nada.
+    """
+    result = []
+    applied = 0
+    for instr in instructions:
+        previous = result[-1] if result else None
+        if previous is not None and previous.arg == instr.arg:
+            if STORE_LOAD.get(previous.opcode) == instr.opcode:
+                result[-1:] = [IRInstruction('DUP'), previous]
+                applied += 1
+                continue
+            if LOAD_STORE.get(previous.opcode) == instr.opcode:
+                result.pop()
+                applied += 1
+                continue
+        result.append(instr)
+    return result, applied
+
+
+# Reglas disponibles, en el orden en que se aplican en cada pasada
+RULES = {
+    'threading': thread_jumps,
+    'dead_labels': remove_dead_labels,
+    'unreachable': remove_unreachable,
+    'folding': fold_constants,
+    'forwarding': forward_stores,
+}
+
+
+class PeepholeOptimizer:
+    """
+    Optimizador de mirilla sobre la lista de IRInstruction que produce
+    IRGenerator.generate, antes de IR.encode. Aplica las reglas elegidas
+    (por nombre, ver RULES; todas por defecto) en pasadas sucesivas hasta
+    que ninguna cambia nada.
+
+    'stats' guarda por regla [veces aplicada, instrucciones quitadas];
+    'passes' la cantidad de pasadas y 'before' / 'after' el tamaño del IR.
+    """
+
+    def __init__(self, rules=None, max_passes=100):
+        names = list(RULES) if rules is None else list(rules)
+        unknown = [name for name in names if name not in RULES]
+        if unknown:
+            raise ValueError(f"Reglas de peephole desconocidas: {', '.join(unknown)}")
+        self.rules = [(name, RULES[name]) for name in names]
+        self.max_passes = max_passes
+        self.stats = {name: [0, 0] for name in names}
+        self.passes = 0
+        self.before = self.after = 0
+
+    def optimize(self, instructions):
+        self.before = len(instructions)
+        for _ in range(self.max_passes):
+            self.passes += 1
+            changed = False
+            for name, rule in self.rules:
+                size = len(instructions)
+                instructions, applied = rule(instructions)
+                if applied:
+                    changed = True
+                    stats = self.stats[name]
+                    stats[0] += applied
+                    stats[1] += size - len(instructions)
+            if not changed:
+                break
+        self.after = len(instructions)
+        return instructions
+
+    def report(self):
+        """Resumen legible de 'stats'."""
+        lines = [f"Peephole: {self.before} -> {self.after} instrucciones en {self.passes} pasadas"]
+        for name, (applied, removed) in self.stats.items():
+            lines.append(f"  {name:<12} {applied:6d} aplicadas {removed:6d} quitadas")
+        return "\n".join(lines)
@@ -0,0 +1,540 @@
+# register_vm.py
+"""
+Backend de registros: traduce el IR de pila de IRGenerator a código de
+tres direcciones y lo ejecuta en RegisterMachine.
+
+Cada función (y el nivel superior) tiene su archivo de registros:
+
+    [locales (slots de resolver.py)] [constantes] [temporales]
+
+Los parámetros son los primeros locales, así que CALL copia los
+argumentos directamente a r0..rk-1 del frame nuevo. Las constantes se
+cargan una vez por llamada al copiar la plantilla del frame, y los
+temporales se asignan por profundidad de la pila del IR: el valor que en
+la máquina de pila está en la posición d va al temporal d. Así
+
+    LOAD_LOCAL 1; LOAD_LOCAL 2; ADDI; STORE_LOCAL 0
+
+queda en una sola instrucción, ADDI r0, r1, r2.
+"""
+
+from collections import namedtuple
+from enum import IntEnum
+
+from AST import FuncDeclaration, IfStatement, WhileStatement
+from linker import FUNCTION_PREFIX, split_functions, reachable_functions
+from stack_machine import Memory
+
+
+class RegOp(IntEnum):
+    MOV = 0
+    LOADG = 1
+    STOREG = 2
+    ADDI = 3
+    SUBI = 4
+    MULI = 5
+    DIVI = 6
+    DIVF = 7
+    NEG = 8
+    AND = 9
+    OR = 10
+    LT = 11
+    GT = 12
+    LE = 13
+    GE = 14
+    EQ = 15
+    NE = 16
+    ITOF = 17
+    FTOI = 18
+    JUMP = 19
+    JUMP_IF_FALSE = 20
+    # comparación + JUMP_IF_FALSE: saltan si la comparación es falsa
+    JUMP_IF_NOT_LT = 21
+    JUMP_IF_NOT_GT = 22
+    JUMP_IF_NOT_LE = 23
+    JUMP_IF_NOT_GE = 24
+    JUMP_IF_NOT_EQ = 25
+    JUMP_IF_NOT_NE = 26
+    CALL = 27
+    RETURN = 28
+    HALT = 29
+    PRINT = 30
+    PRINTC = 31
+    PRINTB = 32
+    GROW = 33
+    PEEKI = 34
+    POKEI = 35
+    PEEKF = 36
+    POKEF = 37
+
+
+# Opcodes del IR de pila que pasan a una instrucción de registros con dos
+# operandos y un destino. Las versiones I y F que en Python hacen lo mismo
+# comparten opcode.
+BINARY = {
+    'ADDI': RegOp.ADDI, 'ADDF': RegOp.ADDI, 'SUBI': RegOp.SUBI, 'SUBF': RegOp.SUBI,
+    'MULI': RegOp.MULI, 'MULF': RegOp.MULI, 'DIVI': RegOp.DIVI, 'DIVF': RegOp.DIVF,
+    'AND': RegOp.AND, 'OR': RegOp.OR,
+    'LTI': RegOp.LT, 'LTF': RegOp.LT, 'GTI': RegOp.GT, 'GTF': RegOp.GT,
+    'LEI': RegOp.LE, 'LEF': RegOp.LE, 'GEI': RegOp.GE, 'GEF': RegOp.GE,
+    'EQI': RegOp.EQ, 'EQF': RegOp.EQ, 'NEI': RegOp.NE, 'NEF': RegOp.NE,
+}
+UNARY = {
+    'NEGI': RegOp.NEG, 'NEGF': RegOp.NEG, 'ITOF': RegOp.ITOF, 'FTOI': RegOp.FTOI, 'BTOI': RegOp.FTOI,
+    'PEEKI': RegOp.PEEKI, 'PEEKF': RegOp.PEEKF, 'GROW': RegOp.GROW,
+}
+PRINTS = {'PRINTI': RegOp.PRINT, 'PRINTF': RegOp.PRINT, 'PRINTC': RegOp.PRINTC, 'PRINTB': RegOp.PRINTB}
+POKES = {'POKEI': RegOp.POKEI, 'POKEF': RegOp.POKEF}
+BRANCHES = {
+    RegOp.LT: RegOp.JUMP_IF_NOT_LT, RegOp.GT: RegOp.JUMP_IF_NOT_GT, RegOp.LE: RegOp.JUMP_IF_NOT_LE,
+    RegOp.GE: RegOp.JUMP_IF_NOT_GE, RegOp.EQ: RegOp.JUMP_IF_NOT_EQ, RegOp.NE: RegOp.JUMP_IF_NOT_NE,
+}
+
+# Una instrucción: opcode y hasta tres operandos. Para CALL, a es el
+# registro destino (-1 si la función es void), b el índice de la función y
+# c la tupla de registros de los argumentos.
+RegInstruction = namedtuple('RegInstruction', 'op a b c')
+
+# entry: índice de su primera instrucción; template: registros iniciales
+# del frame (None salvo las constantes)
+Function = namedtuple('Function', 'name entry template')
+
+
+class RegisterProgram:
+    """Código de registros listo para RegisterMachine."""
+
+    def __init__(self, code, functions, global_count):
+        self.code = code
+        # functions[0] es el nivel superior
+        self.functions = functions
+        self.global_count = global_count
+
+    def __len__(self):
+        return len(self.code)
+
+    def listing(self):
+        """Vista legible: registros rN, globales gN y destinos @N."""
+        entries = {f.entry: f for f in self.functions}
+        lines = []
+        for i, (op, a, b, c) in enumerate(self.code):
+            if i in entries:
+                function = entries[i]
+                constants = ", ".join(f"r{r} = {v!r}" for r, v in enumerate(function.template) if v is not None)
+                lines.append(f"{function.name}:" + (f"  ({constants})" if constants else ""))
+            if op == RegOp.CALL:
+                args = ", ".join(f"r{r}" for r in c)
+                dest = f"r{a} = " if a >= 0 else ""
+                text = f"{dest}CALL {self.functions[b].name}({args})"
+            elif op == RegOp.LOADG:
+                text = f"LOADG r{a}, g{b}"
+            elif op == RegOp.STOREG:
+                text = f"STOREG g{a}, r{b}"
+            elif op == RegOp.JUMP:
+                text = f"JUMP @{a}"
+            elif op == RegOp.JUMP_IF_FALSE:
+                text = f"JUMP_IF_FALSE r{a}, @{b}"
+            elif op in BRANCHES.values():
+                text = f"{op.name} r{a}, r{b}, @{c}"
+            else:
+                text = " ".join([op.name, ", ".join(f"r{x}" for x in (a, b, c) if x is not None)]).strip()
+            lines.append(f"{i:4d}  {text}")
+        return lines
+
+
+def function_signatures(program):
+    """nombre -> (cantidad de parámetros, retorna valor) de las funciones del AST."""
+    signatures = {}
+    pending = [program.statements]
+    while pending:
+        for stmt in pending.pop():
+            if isinstance(stmt, FuncDeclaration):
+                signatures[stmt.func_name.name] = (len(stmt.parameters), (stmt.return_type or 'void') != 'void')
+                pending.append(stmt.body or [])
+            elif isinstance(stmt, IfStatement):
+                pending.append(stmt.then_body)
+                pending.append(stmt.else_body or [])
+            elif isinstance(stmt, WhileStatement):
+                pending.append(stmt.body)
+    return signatures
+
+
+class _SegmentCompiler:
+    """
+    Traduce el IR de una función (o del nivel superior) ejecutándolo
+    simbólicamente: 'stack' tiene, por cada posición de la pila del IR, el
+    registro donde está ese valor.
+
+    Las instrucciones llevan las etiquetas como destino; RegisterCompiler
+    las resuelve al juntar los segmentos.
+    """
+
+    def __init__(self, instructions, params, function_ids, signatures):
+        self.function_ids = function_ids
+        self.signatures = signatures
+        self.code = []
+        self.labels = {}
+        # registros: locales, constantes y temporales (ver el docstring del módulo)
+        self.local_count = next((i.arg for i in instructions if i.opcode == 'ENTER'), 0)
+        self.constants = {}
+        for instr in instructions:
+            if instr.opcode in ('CONSTI', 'CONSTR', 'CONSTB'):
+                value = instr.arg != 0 if instr.opcode == 'CONSTB' else instr.arg
+                self.constants.setdefault((type(value), repr(value)), (len(self.constants), value))
+        self.temp_base = self.local_count + len(self.constants)
+        self.temp_count = 0
+        self.params = params
+        self.stack = []
+        # índice en 'code' de la última instrucción con destino temporal, si
+        # nada se interpuso (para escribir directo en el local de un STORE)
+        self.last_temp = None
+        for instr in instructions:
+            self.translate(instr)
+
+    def template(self):
+        registers = [None] * (self.temp_base + self.temp_count)
+        for index, value in self.constants.values():
+            registers[self.local_count + index] = value
+        return registers
+
+    def emit(self, op, a=None, b=None, c=None):
+        self.code.append(RegInstruction(op, a, b, c))
+        self.last_temp = None
+
+    def push_temp(self):
+        """Registro temporal para un valor nuevo en el tope de la pila."""
+        depth = len(self.stack)
+        self.temp_count = max(self.temp_count, depth + 1)
+        register = self.temp_base + depth
+        self.stack.append(register)
+        return register
+
+    def emit_to_temp(self, op, b=None, c=None):
+        dest = self.push_temp()
+        self.emit(op, dest, b, c)
+        self.last_temp = len(self.code) - 1
+
+    def store_local(self, slot):
+        source = self.stack.pop()
+        if source == slot:
+            return
+        # los valores del local que siguen en la pila se copian antes de pisarlo
+        for position, register in enumerate(self.stack):
+            if register == slot:
+                temp = self.temp_base + position
+                self.temp_count = max(self.temp_count, position + 1)
+                self.emit(RegOp.MOV, temp, slot)
+                self.stack[position] = temp
+        last = self.last_temp
+        if last is not None and self.code[last].a == source and source not in self.stack:
+            # el resultado de la última operación va directo al local
+            self.code[last] = self.code[last]._replace(a=slot)
+            self.last_temp = None
+        else:
+            self.emit(RegOp.MOV, slot, source)
+
+    def translate(self, instr):
+        op, arg = instr.opcode, instr.arg
+        stack = self.stack
+        if op in ('CONSTI', 'CONSTR', 'CONSTB'):
+            value = arg != 0 if op == 'CONSTB' else arg
+            index, _ = self.constants[(type(value), repr(value))]
+            stack.append(self.local_count + index)
+        elif op == 'LOAD_LOCAL':
+            stack.append(arg)
+        elif op == 'STORE_LOCAL':
+            self.store_local(arg)
+        elif op == 'LOAD_GLOBAL':
+            # se copia: una llamada puede cambiar el global antes de usarlo
+            self.emit_to_temp(RegOp.LOADG, arg)
+        elif op == 'STORE_GLOBAL':
+            self.emit(RegOp.STOREG, arg, stack.pop())
+        elif op == 'DUP':
+            stack.append(stack[-1])
+        elif op == 'POP':
+            stack.pop()
+        elif op in BINARY:
+            right = stack.pop()
+            left = stack.pop()
+            self.emit_to_temp(BINARY[op], left, right)
+        elif op in UNARY:
+            self.emit_to_temp(UNARY[op], stack.pop())
+        elif op in POKES:
+            value = stack.pop()
+            self.emit(POKES[op], stack.pop(), value)
+        elif op in PRINTS:
+            self.emit(PRINTS[op], stack.pop())
+        elif op == 'LABEL':
+            self.labels[arg] = len(self.code)
+            # entre sentencias la pila del IR queda vacía (IRGenerator saca con
+            # POP el valor de las llamadas usadas como sentencia)
+            assert not stack, f"pila no vacía en la etiqueta {arg}"
+            self.last_temp = None
+            if arg.startswith(FUNCTION_PREFIX):
+                # los argumentos llegan en los primeros locales: es como si la
+                # pila los tuviera y los STORE_LOCAL de los parámetros no hacen nada
+                stack.extend(range(self.params))
+        elif op == 'JUMP':
+            self.emit(RegOp.JUMP, arg)
+            stack.clear()
+        elif op == 'JUMP_IF_FALSE':
+            condition = stack.pop()
+            last = self.code[-1] if self.code else None
+            if self.last_temp is not None and last.a == condition and last.op in BRANCHES \
+                    and condition not in stack:
+                # LT t, a, b; JUMP_IF_FALSE t -> JUMP_IF_NOT_LT a, b
+                self.code[-1] = RegInstruction(BRANCHES[last.op], last.b, last.c, arg)
+                self.last_temp = None
+            else:
+                self.emit(RegOp.JUMP_IF_FALSE, condition, arg)
+        elif op == 'CALL':
+            params, returns = self.signatures[arg]
+            args = tuple(stack[len(stack) - params:]) if params else ()
+            del stack[len(stack) - params:]
+            function = self.function_ids[arg]
+            if returns:
+                self.emit_to_temp(RegOp.CALL, function, args)
+                self.last_temp = None
+            else:
+                self.emit(RegOp.CALL, -1, function, args)
+        elif op == 'RETURN':
+            self.emit(RegOp.RETURN, stack.pop() if stack else None)
+            stack.clear()
+        elif op == 'HALT':
+            self.emit(RegOp.HALT)
+            stack.clear()
+        elif op in ('ENTER', 'GLOBALS'):
+            pass  # el frame se arma desde la plantilla; los globales, al empezar
+        else:
+            raise Exception(f"Instrucción no soportada por el backend de registros: {op}")
+
+
+class RegisterCompiler:
+    """
+    Convierte el IR de pila (de IRGenerator, con o sin PeepholeOptimizer)
+    en un RegisterProgram. 'signatures' es function_signatures(ast): el IR
+    de pila no dice cuántos argumentos toma CALL ni si deja un resultado.
+    Como el Linker, descarta las funciones que no se llaman.
+    """
+
+    def __init__(self, signatures):
+        self.signatures = signatures
+
+    def compile(self, instructions):
+        top_level, functions = split_functions(instructions)
+        reachable = reachable_functions(top_level, functions)
+        names = [name for name in functions if name in reachable]
+        function_ids = {name: i + 1 for i, name in enumerate(names)}
+        global_count = next((i.arg for i in top_level if i.opcode == 'GLOBALS'), 0)
+
+        segments = [('<nivel superior>', _SegmentCompiler(top_level, 0, function_ids, self.signatures))]
+        for name in names:
+            params = self.signatures[name][0]
+            segments.append((name, _SegmentCompiler(functions[name], params, function_ids, self.signatures)))
+
+        # se juntan los segmentos y las etiquetas pasan a índices absolutos
+        code = []
+        labels = {}
+        table = []
+        for name, segment in segments:
+            base = len(code)
+            table.append(Function(name, base, segment.template()))
+            labels.update({label: base + index for label, index in segment.labels.items()})
+            code.extend(segment.code)
+        for i, instr in enumerate(code):
+            if instr.op == RegOp.JUMP:
+                code[i] = instr._replace(a=labels[instr.a])
+            elif instr.op == RegOp.JUMP_IF_FALSE:
+                code[i] = instr._replace(b=labels[instr.b])
+            elif instr.op in BRANCHES.values():
+                code[i] = instr._replace(c=labels[instr.c])
+        return RegisterProgram(code, table, global_count)
+
+
+class RegisterMachine:
+    """
+    Ejecuta un RegisterProgram. Igual que StackMachine, cada opcode tiene
+    su método r_<NOMBRE> y 'handlers' los ordena por código; cada uno
+    recibe los tres operandos y trabaja sobre 'regs', los registros del
+    frame actual.
+    """
+
+    def __init__(self, program):
+        self.code = program.code
+        self.functions = program.functions
+        self.globals = [None] * program.global_count
+        self.memory = Memory()
+        self.regs = list(program.functions[0].template)
+        # (dirección de retorno, registros del llamador, registro destino)
+        self.frames = []
+        self.pc = 0
+        self.handlers = [getattr(self, f"r_{op.name}") for op in RegOp]
+
+    def run(self):
+        code, handlers = self.code, self.handlers
+        end = len(code)
+        while self.pc < end:
+            op, a, b, c = code[self.pc]
+            self.pc += 1
+            handlers[op](a, b, c)
+
+    def r_MOV(self, a, b, c):
+        regs = self.regs
+        regs[a] = regs[b]
+
+    def r_LOADG(self, a, b, c):
+        self.regs[a] = self.globals[b]
+
+    def r_STOREG(self, a, b, c):
+        self.globals[a] = self.regs[b]
+
+    def r_ADDI(self, a, b, c):
+        regs = self.regs
+        regs[a] = regs[b] + regs[c]
+
+    def r_SUBI(self, a, b, c):
+        regs = self.regs
+        regs[a] = regs[b] - regs[c]
+
+    def r_MULI(self, a, b, c):
+        regs = self.regs
+        regs[a] = regs[b] * regs[c]
+
+    def r_DIVI(self, a, b, c):
+        regs = self.regs
+        regs[a] = regs[b] // regs[c]
+
+    def r_DIVF(self, a, b, c):
+        regs = self.regs
+        regs[a] = regs[b] / regs[c]
+
+    def r_NEG(self, a, b, c):
+        regs = self.regs
+        regs[a] = -regs[b]
+
+    def r_AND(self, a, b, c):
+        regs = self.regs
+        regs[a] = regs[b] and regs[c]
+
+    def r_OR(self, a, b, c):
+        regs = self.regs
+        regs[a] = regs[b] or regs[c]
+
+    def r_LT(self, a, b, c):
+        regs = self.regs
+        regs[a] = regs[b] < regs[c]
+
+    def r_GT(self, a, b, c):
+        regs = self.regs
+        regs[a] = regs[b] > regs[c]
+
+    def r_LE(self, a, b, c):
+        regs = self.regs
+        regs[a] = regs[b] <= regs[c]
+
+    def r_GE(self, a, b, c):
+        regs = self.regs
+        regs[a] = regs[b] >= regs[c]
+
+    def r_EQ(self, a, b, c):
+        regs = self.regs
+        regs[a] = regs[b] == regs[c]
+
+    def r_NE(self, a, b, c):
+        regs = self.regs
+        regs[a] = regs[b] != regs[c]
+
+    def r_ITOF(self, a, b, c):
+        regs = self.regs
+        regs[a] = float(regs[b])
+
+    def r_FTOI(self, a, b, c):
+        regs = self.regs
+        regs[a] = int(regs[b])
+
+    def r_JUMP(self, a, b, c):
+        self.pc = a
+
+    def r_JUMP_IF_FALSE(self, a, b, c):
+        if not self.regs[a]:
+            self.pc = b
+
+    def r_JUMP_IF_NOT_LT(self, a, b, c):
+        regs = self.regs
+        if not regs[a] < regs[b]:
+            self.pc = c
+
+    def r_JUMP_IF_NOT_GT(self, a, b, c):
+        regs = self.regs
+        if not regs[a] > regs[b]:
+            self.pc = c
+
+    def r_JUMP_IF_NOT_LE(self, a, b, c):
+        regs = self.regs
+        if not regs[a] <= regs[b]:
+            self.pc = c
+
+    def r_JUMP_IF_NOT_GE(self, a, b, c):
+        regs = self.regs
+        if not regs[a] >= regs[b]:
+            self.pc = c
+
+    def r_JUMP_IF_NOT_EQ(self, a, b, c):
+        regs = self.regs
+        if not regs[a] == regs[b]:
+            self.pc = c
+
+    def r_JUMP_IF_NOT_NE(self, a, b, c):
+        regs = self.regs
+        if not regs[a] != regs[b]:
+            self.pc = c
+
+    def r_CALL(self, a, b, c):
+        function = self.functions[b]
+        caller = self.regs
+        regs = list(function.template)
+        for i, register in enumerate(c):
+            regs[i] = caller[register]
+        self.frames.append((self.pc, caller, a))
+        self.regs = regs
+        self.pc = function.entry
+
+    def r_RETURN(self, a, b, c):
+        value = self.regs[a] if a is not None else None
+        self.pc, self.regs, dest = self.frames.pop()
+        if dest >= 0:
+            self.regs[dest] = value
+
+    def r_HALT(self, a, b, c):
+        self.pc = len(self.code)
+
+    def r_PRINT(self, a, b, c):
+        print(self.regs[a], end='')
+
+    def r_PRINTC(self, a, b, c):
+        print(chr(self.regs[a]), end='')
+
+    def r_PRINTB(self, a, b, c):
+        print('true' if self.regs[a] else 'false', end='')
+
+    def r_GROW(self, a, b, c):
+        # ^n agrega n bytes a la memoria y vale la dirección del bloque nuevo
+        regs = self.regs
+        size = regs[b]
+        regs[a] = len(self.memory.memory)
+        self.memory.grow(size)
+
+    def r_PEEKI(self, a, b, c):
+        regs = self.regs
+        regs[a] = self.memory.read_int(regs[b])
+
+    def r_POKEI(self, a, b, c):
+        regs = self.regs
+        self.memory.write_int(regs[a], regs[b])
+
+    def r_PEEKF(self, a, b, c):
+        regs = self.regs
+        regs[a] = self.memory.read_float(regs[b])
+
+    def r_POKEF(self, a, b, c):
+        regs = self.regs
+        self.memory.write_float(regs[a], regs[b])
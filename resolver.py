@@ -0,0 +1,139 @@
+# resolver.py
+
+from collections import namedtuple
+
+from AST import Identifier
+from ASemantico import SemanticError
+from visitor import Visitor
+
+GLOBAL = 'global'
+LOCAL = 'local'
+
+# Lugar de una variable en tiempo de ejecución: índice en la lista de
+# globales o en la de locales del frame de la función.
+Slot = namedtuple('Slot', 'scope index')
+
+# Resultado de Resolver.resolve:
+#   slots        Identifier -> Slot, para cada declaración, parámetro y uso
+#   frame_sizes  FuncDeclaration -> cantidad de locales de su frame
+#   global_count cantidad de globales
+Resolution = namedtuple('Resolution', 'slots frame_sizes global_count')
+
+
+class Resolver(Visitor):
+    """
+    Pase posterior a SemanticAnalyzer que asigna a cada variable un índice
+    fijo: las declaradas fuera de funciones van a la lista de globales y
+    las de una función (parámetros primero, en orden) a su frame. Con eso
+    el IR lleva LOAD_LOCAL 3 / STORE_GLOBAL 7 y la máquina indexa listas en
+    lugar de buscar nombres en diccionarios.
+
+    Sigue las mismas reglas de ámbito que el analizador: cada bloque de
+    if/while abre un ámbito. Dentro de una función los índices de un bloque
+    se reutilizan cuando termina, así que el frame mide lo que el bloque
+    más profundo necesita; los globales no se reutilizan, porque una
+    función declarada dentro de un bloque puede seguir usándolos después.
+    Las claves de 'slots' son los nodos Identifier (los de VarDeclaration,
+    Parameter y Location, y los Identifier sueltos de las expresiones).
+    """
+    method_prefix = 'resolve_'
+
+    def __init__(self):
+        self.slots = {}
+        self.frame_sizes = {}
+        self.global_count = 0
+        # (ámbito, nombres declarados en él); igual que en el analizador,
+        # 'visible' guarda por nombre la pila de slots visibles
+        self.scopes = []
+        self.visible = {}
+        self.scope = GLOBAL
+        self.next_index = 0
+        self.frame_size = 0
+
+    def resolve(self, node):
+        self.run(node)
+        return Resolution(self.slots, self.frame_sizes, self.global_count)
+
+    def push_scope(self):
+        self.scopes.append((self.next_index, []))
+
+    def pop_scope(self):
+        next_index, names = self.scopes.pop()
+        if self.scope == LOCAL:
+            self.next_index = next_index
+        for name in names:
+            slots = self.visible[name]
+            slots.pop()
+            if not slots:
+                del self.visible[name]
+
+    def declare(self, identifier):
+        slot = self.slots[identifier] = Slot(self.scope, self.next_index)
+        self.next_index += 1
+        if self.scope == GLOBAL:
+            self.global_count = max(self.global_count, self.next_index)
+        else:
+            self.frame_size = max(self.frame_size, self.next_index)
+        self.scopes[-1][1].append(identifier.name)
+        self.visible.setdefault(identifier.name, []).append(slot)
+
+    def generic_visit(self, node):
+        # expresiones y sentencias sin declaraciones: se resuelven sus hijos
+        for name, kind in node._fields:
+            value = getattr(node, name)
+            if kind in ('node', 'node?'):
+                if value is not None:
+                    yield self.visit(value)
+            elif kind in ('list', 'list?'):
+                for item in value or ():
+                    yield self.visit(item)
+
+    def resolve_Program(self, node):
+        self.push_scope()
+        for stmt in node.statements:
+            yield self.visit(stmt)
+        self.pop_scope()
+
+    def block(self, body):
+        self.push_scope()
+        for stmt in body or ():
+            yield self.visit(stmt)
+        self.pop_scope()
+
+    def resolve_IfStatement(self, node):
+        yield self.visit(node.condition)
+        yield self.block(node.then_body)
+        yield self.block(node.else_body)
+
+    def resolve_WhileStatement(self, node):
+        yield self.visit(node.condition)
+        yield self.block(node.body)
+
+    def resolve_VarDeclaration(self, node):
+        # el inicializador ve la declaración anterior del mismo nombre
+        if node.initializer is not None:
+            yield self.visit(node.initializer)
+        self.declare(node.identifier)
+
+    def resolve_FuncDeclaration(self, node):
+        outer = self.scope, self.next_index, self.frame_size
+        self.scope, self.next_index, self.frame_size = LOCAL, 0, 0
+        self.push_scope()
+        for param in node.parameters:
+            self.declare(param.identifier)
+        for stmt in node.body or ():
+            yield self.visit(stmt)
+        self.pop_scope()
+        self.frame_sizes[node] = self.frame_size
+        self.scope, self.next_index, self.frame_size = outer
+
+    def resolve_FunctionCall(self, node):
+        # el identificador es el nombre de la función, no una variable
+        for arg in node.arguments:
+            yield self.visit(arg)
+
+    def resolve_Identifier(self, node: Identifier):
+        slots = self.visible.get(node.name)
+        if not slots:
+            raise SemanticError(f"Identificador '{node.name}' no declarado.")
+        self.slots[node] = slots[-1]
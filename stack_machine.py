@@ -1,3 +1,6 @@
+from IR import Op
+
+
 class Memory:
     def __init__(self, size=1024):
         self.memory = bytearray(size)
@@ -6,10 +9,10 @@ class Memory:
         self.memory += bytearray(size)
 
     def read_int(self, addr):
-        return int.from_bytes(self.memory[addr:addr+4], 'little')
+        return int.from_bytes(self.memory[addr:addr+4], 'little', signed=True)
 
     def write_int(self, addr, value):
-        self.memory[addr:addr+4] = value.to_bytes(4, 'little')
+        self.memory[addr:addr+4] = value.to_bytes(4, 'little', signed=True)
 
     def read_float(self, addr):
         import struct
@@ -21,138 +24,272 @@ class Memory:
 
 
 class CallFrame:
+    # Se apila en CALL: dirección de retorno y los locales del llamador,
+    # que RETURN restaura
     def __init__(self, return_address, local_vars):
         self.return_address = return_address
         self.locals = local_vars
 
 
 class StackMachine:
-    def __init__(self, instructions):
-        self.instructions = instructions
+    """
+    Ejecuta IR codificado (IR.Bytecode). Cada opcode tiene su método
+    op_<NOMBRE>, que recibe el operando; 'handlers' los ordena por código,
+    así que despachar una instrucción es indexar una lista.
+    """
+
+    def __init__(self, bytecode):
+        self.code = bytecode.code
+        self.args = bytecode.args
+        self.constants = bytecode.constants
         self.pc = 0
         self.stack = []
         self.memory = Memory()
-        self.globals = {}
+        # Variables por índice (ver resolver.py): GLOBALS dimensiona
+        # 'globals' y ENTER crea los locales de cada llamada
+        self.globals = []
+        self.locals = []
         self.frames = []
-        self.labels = self.find_labels()
-
-    def find_labels(self):
-        labels = {}
-        for i, instr in enumerate(self.instructions):
-            if instr.opcode == 'LABEL':
-                labels[instr.arg] = i
-        return labels
+        self.handlers = [getattr(self, f"op_{op.name}") for op in Op]
 
     def run(self):
-        while self.pc < len(self.instructions):
-            instr = self.instructions[self.pc]
-            self.pc += 1
-            self.execute(instr)
-
-    def execute(self, instr):
-        op = instr.opcode
-        arg = instr.arg
-
-        if op == 'CONSTI':
-            self.stack.append(int(arg))
-        elif op == 'CONSTR':
-            self.stack.append(float(arg))
-        elif op == 'CONSTB':
-            self.stack.append(bool(arg))
-        elif op == 'LOCAL_SET':
-            self.current_frame().locals[arg] = self.stack.pop()
-        elif op == 'LOCAL_GET':
-            self.stack.append(self.current_frame().locals[arg])
-        elif op == 'GLOBAL_SET':
-            self.globals[arg] = self.stack.pop()
-        elif op == 'GLOBAL_GET':
-            self.stack.append(self.globals[arg])
-
-        elif op == 'ADDI':
-            b, a = self.stack.pop(), self.stack.pop()
-            self.stack.append(a + b)
-        elif op == 'SUBI':
-            b, a = self.stack.pop(), self.stack.pop()
-            self.stack.append(a - b)
-        elif op == 'MULI':
-            b, a = self.stack.pop(), self.stack.pop()
-            self.stack.append(a * b)
-        elif op == 'DIVI':
-            b, a = self.stack.pop(), self.stack.pop()
-            self.stack.append(a // b)
-
-        elif op == 'AND':
-            b, a = self.stack.pop(), self.stack.pop()
-            self.stack.append(a and b)
-        elif op == 'OR':
-            b, a = self.stack.pop(), self.stack.pop()
-            self.stack.append(a or b)
-        elif op == 'EQ':
-            b, a = self.stack.pop(), self.stack.pop()
-            self.stack.append(a == b)
-        elif op == 'NE':
-            b, a = self.stack.pop(), self.stack.pop()
-            self.stack.append(a != b)
-
-        elif op == 'JUMP':
-            self.pc = self.labels[arg]
-        elif op == 'JUMP_IF_FALSE':
-            cond = self.stack.pop()
-            if not cond:
-                self.pc = self.labels[arg]
-
-        elif op == 'LABEL':
-            pass
-
-        elif op == 'CALL':
-            self.frames.append(CallFrame(self.pc, {}))
-            self.pc = self.labels[f"FUNC_{arg}"] + 1
-
-        elif op == 'RETURN':
-            frame = self.frames.pop()
-            self.pc = frame.return_address
-
-        elif op == 'PRINT':
-            value = self.stack.pop()
-            if isinstance(value, str):
-                print(value, end='')
-            elif isinstance(value, int) and 0 <= value <= 255:
-                print(chr(value), end='')
-            else:
-                print(value, end='')
-
-        elif op == 'GROW':
-            self.memory.grow(arg)
-
-        elif op == 'POKEI':
-            value = self.stack.pop()
-            addr = self.stack.pop()
-            self.memory.write_int(addr, value)
-        elif op == 'PEEKI':
-            addr = self.stack.pop()
-            self.stack.append(self.memory.read_int(addr))
-        elif op == 'POKEF':
-            value = self.stack.pop()
-            addr = self.stack.pop()
-            self.memory.write_float(addr, value)
-        elif op == 'PEEKF':
-            addr = self.stack.pop()
-            self.stack.append(self.memory.read_float(addr))
-
-        elif op == 'CAST':
-            value = self.stack.pop()
-            if arg == 'char':
-                if isinstance(value, int):
-                    self.stack.append(value)
-                elif isinstance(value, str):
-                    self.stack.append(ord(value))
-                else:
-                    raise Exception("CAST char: tipo no soportado")
-            else:
-                raise Exception(f"CAST no soportado: {arg}")
+        code, args, handlers = self.code, self.args, self.handlers
+        end = len(code)
+        while self.pc < end:
+            pc = self.pc
+            self.pc = pc + 1
+            handlers[code[pc]](args[pc])
+
+    # Las instrucciones vienen tipadas desde IRGenerator (ADDI / ADDF,
+    # PEEKI / PEEKF, ...): cada handler hace una sola operación, sin
+    # preguntar el tipo de los valores. Las versiones I y F que hacen lo
+    # mismo en Python comparten el método.
+
+    def op_CONSTI(self, arg):
+        self.stack.append(arg)
+
+    def op_CONSTR(self, arg):
+        self.stack.append(self.constants[arg])
+
+    def op_CONSTB(self, arg):
+        self.stack.append(arg != 0)
+
+    def op_DUP(self, arg):
+        self.stack.append(self.stack[-1])
+
+    def op_POP(self, arg):
+        self.stack.pop()
+
+    def op_LOAD_LOCAL(self, arg):
+        self.stack.append(self.locals[arg])
+
+    def op_STORE_LOCAL(self, arg):
+        self.locals[arg] = self.stack.pop()
+
+    def op_LOAD_GLOBAL(self, arg):
+        self.stack.append(self.globals[arg])
+
+    def op_STORE_GLOBAL(self, arg):
+        self.globals[arg] = self.stack.pop()
+
+    def op_ADDI(self, arg):
+        stack = self.stack
+        b = stack.pop()
+        stack[-1] += b
+
+    def op_SUBI(self, arg):
+        stack = self.stack
+        b = stack.pop()
+        stack[-1] -= b
+
+    def op_MULI(self, arg):
+        stack = self.stack
+        b = stack.pop()
+        stack[-1] *= b
+
+    def op_DIVI(self, arg):
+        stack = self.stack
+        b = stack.pop()
+        stack[-1] //= b
+
+    def op_DIVF(self, arg):
+        stack = self.stack
+        b = stack.pop()
+        stack[-1] /= b
+
+    def op_NEGI(self, arg):
+        self.stack[-1] = -self.stack[-1]
+
+    op_ADDF, op_SUBF, op_MULF, op_NEGF = op_ADDI, op_SUBI, op_MULI, op_NEGI
+
+    def op_AND(self, arg):
+        stack = self.stack
+        b = stack.pop()
+        stack[-1] = stack[-1] and b
+
+    def op_OR(self, arg):
+        stack = self.stack
+        b = stack.pop()
+        stack[-1] = stack[-1] or b
+
+    def op_LTI(self, arg):
+        stack = self.stack
+        b = stack.pop()
+        stack[-1] = stack[-1] < b
+
+    def op_GTI(self, arg):
+        stack = self.stack
+        b = stack.pop()
+        stack[-1] = stack[-1] > b
+
+    def op_LEI(self, arg):
+        stack = self.stack
+        b = stack.pop()
+        stack[-1] = stack[-1] <= b
+
+    def op_GEI(self, arg):
+        stack = self.stack
+        b = stack.pop()
+        stack[-1] = stack[-1] >= b
+
+    def op_EQI(self, arg):
+        stack = self.stack
+        b = stack.pop()
+        stack[-1] = stack[-1] == b
+
+    def op_NEI(self, arg):
+        stack = self.stack
+        b = stack.pop()
+        stack[-1] = stack[-1] != b
+
+    op_LTF, op_GTF, op_LEF, op_GEF, op_EQF, op_NEF = op_LTI, op_GTI, op_LEI, op_GEI, op_EQI, op_NEI
+
+    def op_ITOF(self, arg):
+        self.stack[-1] = float(self.stack[-1])
+
+    def op_FTOI(self, arg):
+        self.stack[-1] = int(self.stack[-1])
+
+    op_BTOI = op_FTOI
+
+    # los saltos y CALL traen el índice de destino ya resuelto por IR.encode
+    def op_JUMP(self, arg):
+        self.pc = arg
+
+    def op_JUMP_IF_FALSE(self, arg):
+        if not self.stack.pop():
+            self.pc = arg
+
+    def op_LABEL(self, arg):
+        pass
+
+    def op_CALL(self, arg):
+        self.frames.append(CallFrame(self.pc, self.locals))
+        self.pc = arg
+
+    def op_ENTER(self, arg):
+        self.locals = [None] * arg
+
+    def op_RETURN(self, arg):
+        # el valor de retorno, si hay, queda en la pila
+        frame = self.frames.pop()
+        self.pc = frame.return_address
+        self.locals = frame.locals
+
+    def op_GLOBALS(self, arg):
+        self.globals = [None] * arg
+
+    def op_HALT(self, arg):
+        self.pc = len(self.code)
+
+    def op_PRINTI(self, arg):
+        print(self.stack.pop(), end='')
+
+    op_PRINTF = op_PRINTI
+
+    def op_PRINTC(self, arg):
+        print(chr(self.stack.pop()), end='')
+
+    def op_PRINTB(self, arg):
+        print('true' if self.stack.pop() else 'false', end='')
+
+    def op_GROW(self, arg):
+        # ^n agrega n bytes a la memoria y vale la dirección del bloque nuevo
+        stack = self.stack
+        size = stack.pop()
+        stack.append(len(self.memory.memory))
+        self.memory.grow(size)
+
+    def op_POKEI(self, arg):
+        value = self.stack.pop()
+        self.memory.write_int(self.stack.pop(), value)
+
+    def op_PEEKI(self, arg):
+        self.stack[-1] = self.memory.read_int(self.stack[-1])
+
+    def op_POKEF(self, arg):
+        value = self.stack.pop()
+        self.memory.write_float(self.stack.pop(), value)
+
+    def op_PEEKF(self, arg):
+        self.stack[-1] = self.memory.read_float(self.stack[-1])
+
+    # Superinstrucciones (superinstructions.py): 'arg' es el operando de la
+    # primera instrucción de la secuencia, self.pc apunta a la segunda y
+    # los demás operandos se leen de args. Al terminar, self.pc salta a la
+    # instrucción que sigue a la secuencia.
+
+    def op_INC_LOCAL(self, arg):
+        # LOAD_LOCAL x; CONSTI c; ADDI; STORE_LOCAL y
+        pc = self.pc
+        args = self.args
+        self.locals[args[pc + 2]] = self.locals[arg] + args[pc]
+        self.pc = pc + 3
+
+    def op_INC_GLOBAL(self, arg):
+        # LOAD_GLOBAL x; CONSTI c; ADDI; STORE_GLOBAL y
+        pc = self.pc
+        args = self.args
+        self.globals[args[pc + 2]] = self.globals[arg] + args[pc]
+        self.pc = pc + 3
+
+    def op_LT_LOCALS_JUMP(self, arg):
+        # LOAD_LOCAL a; LOAD_LOCAL b; LTI; JUMP_IF_FALSE t
+        pc = self.pc
+        args = self.args
+        if self.locals[arg] < self.locals[args[pc]]:
+            self.pc = pc + 3
+        else:
+            self.pc = args[pc + 2]
+
+    def op_LT_GLOBALS_JUMP(self, arg):
+        # LOAD_GLOBAL a; LOAD_GLOBAL b; LTI; JUMP_IF_FALSE t
+        pc = self.pc
+        args = self.args
+        if self.globals[arg] < self.globals[args[pc]]:
+            self.pc = pc + 3
+        else:
+            self.pc = args[pc + 2]
+
+    def op_LT_LOCAL_CONST_JUMP(self, arg):
+        # LOAD_LOCAL a; CONSTI c; LTI; JUMP_IF_FALSE t
+        pc = self.pc
+        args = self.args
+        if self.locals[arg] < args[pc]:
+            self.pc = pc + 3
+        else:
+            self.pc = args[pc + 2]
 
+    def op_LT_GLOBAL_CONST_JUMP(self, arg):
+        # LOAD_GLOBAL a; CONSTI c; LTI; JUMP_IF_FALSE t
+        pc = self.pc
+        args = self.args
+        if self.globals[arg] < args[pc]:
+            self.pc = pc + 3
         else:
-            raise Exception(f"Instrucción no soportada: {op}")
+            self.pc = args[pc + 2]
 
-    def current_frame(self):
-        return self.frames[-1] if self.frames else CallFrame(-1, self.globals)
+    def op_CONST_PEEKI(self, arg):
+        # CONSTI addr; PEEKI
+        self.stack.append(self.memory.read_int(arg))
+        self.pc += 1
@@ -0,0 +1,187 @@
+# superinstructions.py
+"""
+Superinstrucciones: secuencias frecuentes del IR que StackMachine ejecuta
+con un solo despacho.
+
+La fusión se hace sobre el Bytecode ya codificado (encode o Linker): la
+primera instrucción de cada secuencia se reemplaza por la superinstrucción
+y las demás quedan en el código. El handler toma sus operandos de ellas y
+salta a la instrucción que sigue a la secuencia. Como nada se mueve, los
+destinos de los saltos no cambian y un salto al medio de una secuencia
+sigue ejecutando las instrucciones originales.
+
+Para agregar una fusión: el opcode en IR.Op (con su entrada en OPERANDS),
+el handler op_<NOMBRE> en StackMachine y su secuencia en FUSIONS. Las
+candidatas salen de contar n-gramas en volcados del IR:
+
+    python main.py -O programa.gox > volcado.txt
+    python superinstructions.py volcado.txt -n 2 3 4 --executed
+"""
+
+import argparse
+import contextlib
+import io
+import sys
+from array import array
+from collections import Counter
+
+from IR import Bytecode, IRInstruction, Op, encode
+from stack_machine import StackMachine
+
+# superinstrucción -> secuencia que reemplaza
+FUSIONS = {
+    # incremento: i = i + 1
+    Op.INC_LOCAL: (Op.LOAD_LOCAL, Op.CONSTI, Op.ADDI, Op.STORE_LOCAL),
+    Op.INC_GLOBAL: (Op.LOAD_GLOBAL, Op.CONSTI, Op.ADDI, Op.STORE_GLOBAL),
+    # condición de un while: while i < n
+    Op.LT_LOCALS_JUMP: (Op.LOAD_LOCAL, Op.LOAD_LOCAL, Op.LTI, Op.JUMP_IF_FALSE),
+    Op.LT_GLOBALS_JUMP: (Op.LOAD_GLOBAL, Op.LOAD_GLOBAL, Op.LTI, Op.JUMP_IF_FALSE),
+    Op.LT_LOCAL_CONST_JUMP: (Op.LOAD_LOCAL, Op.CONSTI, Op.LTI, Op.JUMP_IF_FALSE),
+    Op.LT_GLOBAL_CONST_JUMP: (Op.LOAD_GLOBAL, Op.CONSTI, Op.LTI, Op.JUMP_IF_FALSE),
+    # lectura de una dirección fija: `16
+    Op.CONST_PEEKI: (Op.CONSTI, Op.PEEKI),
+}
+
+
+class SuperinstructionFuser:
+    """
+    Reemplaza en un Bytecode las secuencias de FUSIONS (o de las fusiones
+    elegidas por nombre) por sus superinstrucciones. Recorre el código una
+    vez de izquierda a derecha, probando primero las secuencias más largas;
+    las secuencias no se superponen.
+
+    Después de fuse(), 'stats' tiene cuántas veces se aplicó cada fusión.
+    """
+
+    def __init__(self, fusions=None):
+        names = [op.name for op in FUSIONS] if fusions is None else list(fusions)
+        unknown = [name for name in names if name not in Op.__members__ or Op[name] not in FUSIONS]
+        if unknown:
+            raise ValueError(f"Superinstrucciones desconocidas: {', '.join(unknown)}")
+        self.fusions = sorted(((Op[name], FUSIONS[Op[name]]) for name in names),
+                              key=lambda fusion: -len(fusion[1]))
+        self.stats = {name: 0 for name in names}
+
+    def fuse(self, bytecode):
+        code = array('B', bytecode.code)
+        end = len(code)
+        i = 0
+        while i < end:
+            for fused, pattern in self.fusions:
+                size = len(pattern)
+                if i + size <= end and all(code[i + k] == op for k, op in enumerate(pattern)):
+                    code[i] = fused
+                    self.stats[fused.name] += 1
+                    i += size
+                    break
+            else:
+                i += 1
+        return Bytecode(code, bytecode.args, bytecode.constants, bytecode.labels)
+
+    def report(self):
+        """Resumen legible de 'stats'."""
+        lines = [f"Superinstrucciones: {sum(self.stats.values())} secuencias fusionadas"]
+        for name, count in self.stats.items():
+            lines.append(f"  {name:<22} {count:6d}")
+        return "\n".join(lines)
+
+
+def fuse(bytecode):
+    """Atajo de SuperinstructionFuser().fuse(bytecode)."""
+    return SuperinstructionFuser().fuse(bytecode)
+
+
+# -------------------------------
+# Estadísticas de secuencias
+# -------------------------------
+
+def _argument(text):
+    for convert in (int, float):
+        try:
+            return convert(text)
+        except ValueError:
+            pass
+    return text
+
+
+def read_dump(lines):
+    """
+    IRInstruction de un volcado del IR: una instrucción por línea, como las
+    imprime main.py. Las líneas que no son instrucciones (tokens, reportes,
+    el AST) se ignoran.
+    """
+    instructions = []
+    for line in lines:
+        parts = line.split()
+        if 1 <= len(parts) <= 2 and parts[0] in Op.__members__ and Op[parts[0]] not in FUSIONS:
+            instructions.append(IRInstruction(parts[0], _argument(parts[1]) if len(parts) == 2 else None))
+    return instructions
+
+
+def count_ngrams(instructions, sizes=(2, 3, 4)):
+    """
+    Cuántas veces aparece cada secuencia de opcodes de los tamaños pedidos
+    en el código. Las LABEL no se cuentan: el Linker las quita.
+    """
+    opcodes = [instr.opcode for instr in instructions if instr.opcode != 'LABEL']
+    counts = Counter()
+    for n in sizes:
+        for i in range(len(opcodes) - n + 1):
+            counts[tuple(opcodes[i:i + n])] += 1
+    return counts
+
+
+def count_executed_ngrams(bytecode, sizes=(2, 3, 4)):
+    """Como count_ngrams, pero pesando cada secuencia por las veces que se ejecuta."""
+    trace = []
+
+    class Tracing(StackMachine):
+        def run(self):
+            code, args, handlers = self.code, self.args, self.handlers
+            while self.pc < len(code):
+                pc = self.pc
+                self.pc = pc + 1
+                trace.append(pc)
+                handlers[code[pc]](args[pc])
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        Tracing(bytecode).run()
+    # primero por posición: cada ejecución de la misma secuencia cuenta igual
+    executed = Counter()
+    for n in sizes:
+        for i in range(len(trace) - n + 1):
+            start = trace[i]
+            # solo secuencias seguidas en el código: una fusión no cruza un salto
+            if trace[i + n - 1] == start + n - 1 and all(trace[i + k] == start + k for k in range(1, n - 1)):
+                executed[start, n] += 1
+    counts = Counter()
+    for (start, n), count in executed.items():
+        counts[tuple(Op(op).name for op in bytecode.code[start:start + n])] += count
+    return counts
+
+
+def main(argv):
+    argparser = argparse.ArgumentParser(description="N-gramas de opcodes en volcados del IR")
+    argparser.add_argument("volcados", nargs="+")
+    argparser.add_argument("-n", type=int, nargs="+", default=[2, 3, 4], help="tamaños de las secuencias")
+    argparser.add_argument("--top", type=int, default=15)
+    argparser.add_argument("--executed", action="store_true",
+                           help="ejecuta cada volcado y cuenta las secuencias ejecutadas")
+    args = argparser.parse_args(argv)
+    fused = {tuple(op.name for op in pattern): op.name for op, pattern in FUSIONS.items()}
+    counts = Counter()
+    for path in args.volcados:
+        with open(path, encoding='utf-8') as f:
+            instructions = read_dump(f)
+        if args.executed:
+            counts += count_executed_ngrams(encode(instructions, strip_labels=True), args.n)
+        else:
+            counts += count_ngrams(instructions, args.n)
+    for sequence, count in counts.most_common(args.top):
+        note = f"  ({fused[sequence]})" if sequence in fused else ""
+        print(f"{count:9d}  {' '.join(sequence)}{note}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -1,85 +1,1059 @@
-import os
-import sys
+import contextlib
+import io
 import json
+import os
+import pickle
+import random
+import tempfile
+import tracemalloc
+import unittest
+
+from Token import Token, TokenType
+from lexer import Lexer, map_source
+from token_stream import TokenStream
+from Parser import Parser, HashConsBuilder, ast_to_dict, write_ast_json
+from ASemantico import SemanticAnalyzer
+from IRGenerator import IRGenerator
+from ast_arena import ArenaBuilder
+from token_buffer import TokenBuffer
+import ast_binary
+from visitor import Visitor
+from resolver import Resolver, Slot, GLOBAL, LOCAL
+from stack_machine import StackMachine
+from IR import IRInstruction, Op, encode, decode
+from peephole import PeepholeOptimizer
+from optimizer import ASTOptimizer
+from linker import Linker, link, split_functions
+from superinstructions import SuperinstructionFuser, FUSIONS, count_ngrams, count_executed_ngrams, read_dump
+from inliner import inlinable_functions, call_graph, recursive_functions, function_declarations
+from register_vm import RegisterCompiler, RegisterMachine, function_signatures
+from parallel import compile_program
+from incremental import IncrementalParser, IncrementalAnalyzer
+from ASemantico import SemanticError
+import AST
+
+
+def iter_nodes(root):
+    """Recorre (sin recursión) todos los nodos alcanzables desde 'root'."""
+    pending = [root]
+    while pending:
+        item = pending.pop()
+        if isinstance(item, list):
+            pending.extend(item)
+        elif isinstance(item, AST.ASTNode):
+            yield item
+            for cls in type(item).__mro__:
+                for name in getattr(cls, '__slots__', ()):
+                    if name != '_span' and hasattr(item, name):
+                        pending.append(getattr(item, name))
+
+
+def sample_source(statements=2000):
+    return "".join(f"var v{i} int = a{i % 50} * {i} + (b{i % 50} - 3) / c;\n"
+                   f"if v{i} < 3 {{ print v{i}; }}\n" for i in range(statements))
+
+
+class StreamLexerTest(unittest.TestCase):
+    # con --stream el lexer recorre los bytes del archivo: los caracteres no
+    # ASCII ocupan varios bytes, pero los tokens y las columnas deben ser los
+    # mismos que al leer el texto
+    SOURCE = (
+        "var año int = 3; /* ñandú */ var c char = 'é';\n"
+        "print c; print año; print 'ü' == 'ü';\n"
+        "var a€b int = 1; € print 1 +;\n"
+    )
+
+    def tokens(self, lexer_tokens):
+        return [(t.tipo, t.valor, t.linea, t.columna) for t in lexer_tokens]
+
+    def test_same_as_text(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "fuente.gox")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(self.SOURCE)
+            text_output, stream_output = io.StringIO(), io.StringIO()
+            with contextlib.redirect_stdout(text_output):
+                expected = self.tokens(Lexer(self.SOURCE).analizar())
+                parser = Parser(Lexer(self.SOURCE).analizar(), recover=True)
+                parser.parse()
+            with map_source(path) as source, contextlib.redirect_stdout(stream_output):
+                self.assertEqual(self.tokens(Lexer(source).iter_tokens()), expected)
+                stream_parser = Parser(TokenStream(Lexer(source).iter_tokens()), recover=True)
+                stream_parser.parse()
+        self.assertEqual(stream_parser.errors, parser.errors)
+        self.assertEqual(stream_output.getvalue(), text_output.getvalue())
+        self.assertIn((TokenType.CHAR, 'é', 1, 43), expected)
+        self.assertIn((TokenType.IDENTIFIER, 'año', 2, 16), expected)
+        self.assertIn("⚠️  Token inválido: € en línea 3, columna 6", text_output.getvalue())
+
+
+class TokenBufferEditTest(unittest.TestCase):
+    SOURCE = (
+        "var a int = 1; /* comentario\n"
+        "de varias líneas */ var b float = 2.5;\n"
+        "// línea\n"
+        "func f(x int) int { return x * 3 + 'c'; }\n"
+        "print f(a) / 2; /* otro */ print b;\n"
+    )
+    # fragmentos que se insertan: los que cambian el lexema vecino o abren y
+    # cierran comentarios son los casos delicados
+    FRAGMENTS = ("/*", "*/", "/", "*", "//", "\n", " ", "'", "'x'", "1", "2.", ".5", "x", "var",
+                 "print", "==", "=", "<", "&&", "(", ")", "{", "}", ";")
+
+    def snapshot(self, buffer):
+        return ([buffer.kind(i) for i in range(len(buffer))], [buffer.value(i) for i in range(len(buffer))],
+                list(buffer.starts), list(buffer.ends), buffer.open_comments)
+
+    def test_same_as_full_relex(self):
+        rng = random.Random(4)
+        with contextlib.redirect_stdout(io.StringIO()):
+            buffer = TokenBuffer.from_source(self.SOURCE)
+            for _ in range(1500):
+                source = buffer.source
+                offset = rng.randrange(len(source) + 1)
+                deleted = min(rng.choice((0, 0, 1, 2, 5)), len(source) - offset)
+                inserted = "".join(rng.choice(self.FRAGMENTS) for _ in range(rng.randrange(3)))
+                new_source = source[:offset] + inserted + source[offset + deleted:]
+                try:
+                    expected = TokenBuffer.from_source(new_source)
+                except SyntaxError:
+                    with self.assertRaises(SyntaxError):
+                        buffer.edit(offset, deleted, inserted)
+                    continue
+                edited = buffer.edit(offset, deleted, inserted)
+                self.assertEqual(edited.source, new_source)
+                self.assertEqual(self.snapshot(edited), self.snapshot(expected),
+                                 f"{source!r} -> {new_source!r}")
+                buffer = edited
+                # que el fuente no crezca ni se vacíe sin límite
+                if not 100 < len(buffer.source) < 600:
+                    buffer = TokenBuffer.from_source(self.SOURCE)
+
+
+class ParserTest(unittest.TestCase):
+
+    def test_token_list(self):
+        # var x = 10;
+        # const y = 2.5;
+        # print(x + y);
+        # if (x > y) { return x; }
+        # EOF
+        tokens = [
+            Token(TokenType.VAR, 'var'),
+            Token(TokenType.IDENTIFIER, 'x'),
+            Token(TokenType.ASSIGN, '='),
+            Token(TokenType.INTEGER, 10),
+            Token(TokenType.SEMI, ';'),
+
+            Token(TokenType.CONST, 'const'),
+            Token(TokenType.IDENTIFIER, 'y'),
+            Token(TokenType.ASSIGN, '='),
+            Token(TokenType.FLOAT, 2.5),
+            Token(TokenType.SEMI, ';'),
+
+            Token(TokenType.PRINT, 'print'),
+            Token(TokenType.LPAREN, '('),
+            Token(TokenType.IDENTIFIER, 'x'),
+            Token(TokenType.PLUS, '+'),
+            Token(TokenType.IDENTIFIER, 'y'),
+            Token(TokenType.RPAREN, ')'),
+            Token(TokenType.SEMI, ';'),
+
+            Token(TokenType.IF, 'if'),
+            Token(TokenType.LPAREN, '('),
+            Token(TokenType.IDENTIFIER, 'x'),
+            Token(TokenType.GT, '>'),
+            Token(TokenType.IDENTIFIER, 'y'),
+            Token(TokenType.RPAREN, ')'),
+            Token(TokenType.LBRACE, '{'),
+
+            Token(TokenType.RETURN, 'return'),
+            Token(TokenType.IDENTIFIER, 'x'),
+            Token(TokenType.SEMI, ';'),
+
+            Token(TokenType.RBRACE, '}'),
+            Token(TokenType.EOF, 'EOF')
+        ]
+        ast = Parser(tokens).parse()
+        self.assertIsInstance(ast, AST.Program)
+        self.assertEqual(len(ast.statements), 4)
+        json.dumps(ast_to_dict(ast))
+
+    def test_spans(self):
+        source = "var x int = 1;\nfunc f(a int) int {\n  return a * (x + 2);\n}\n"
+        ast = Parser(Lexer(source).analizar()).parse()
+        decl, func = ast.statements
+        self.assertEqual(source[slice(*decl.span)], "var x int = 1;")
+        self.assertEqual(source[slice(*func.span)], "func f(a int) int {\n  return a * (x + 2);\n}")
+        self.assertEqual(source[slice(*func.parameters[0].span)], "a int")
+        expression = func.body[0].expression
+        self.assertEqual(source[slice(*expression.span)], "a * (x + 2)")
+        self.assertEqual(source[slice(*expression.right.span)], "(x + 2)")
+        self.assertIsNone(AST.Literal(1).span)
+
+    def test_func_name_alias(self):
+        ast = Parser(Lexer("func f() int { return 1; }").analizar()).parse()
+        func = ast.statements[0]
+        self.assertIs(func.func_name, func.identifier)
+        self.assertEqual(ast_to_dict(func)["func_name"], {"type": "Identifier", "name": "f"})
+
+
+class ASTMemoryTest(unittest.TestCase):
+    # Presupuesto de bytes por nodo (objeto, span y listas de sentencias)
+    # medido con tracemalloc; con __dict__ por instancia y sin spans se
+    # medían ~92 B/nodo, con __slots__ y spans ~85, y ~93 desde que cada
+    # nodo tiene el slot del hash estructural (vacío fuera de hash-consing).
+    BYTES_PER_NODE = 96
+
+    @classmethod
+    def setUpClass(cls):
+        cls.source = sample_source()
+        cls.tokens = Lexer(cls.source).analizar()
+
+    def parse_traced(self):
+        tracemalloc.start()
+        try:
+            before = tracemalloc.get_traced_memory()[0]
+            ast = Parser(self.tokens).parse()
+            after = tracemalloc.get_traced_memory()[0]
+        finally:
+            tracemalloc.stop()
+        return ast, after - before
+
+    def test_nodes_are_slotted(self):
+        ast = Parser(self.tokens).parse()
+        for node in iter_nodes(ast):
+            self.assertFalse(hasattr(node, '__dict__'), type(node).__name__)
+
+    def test_bytes_per_node(self):
+        ast, size = self.parse_traced()
+        nodes = sum(1 for _ in iter_nodes(ast))
+        self.assertLessEqual(size / nodes, self.BYTES_PER_NODE,
+                             f"{size / nodes:.1f} B/nodo ({nodes} nodos)")
+
+
+class ArenaTest(unittest.TestCase):
+    SOURCE = (
+        "var x int = 10;\n"
+        "const y float = 2.5;\n"
+        "func suma(a int, b int) int {\n"
+        "  if a < b { print a; } else { print b + 1; }\n"
+        "  return a;\n"
+        "}\n"
+        "var i int = 0;\n"
+        "while i < 5 { print suma(i, 3); i = i + 1; }\n"
+        "print float(x) * y;\n"
+    )
+
+    def parse_both(self, source, recover=False):
+        tokens = Lexer(source).analizar()
+        objects = Parser(tokens, recover=recover).parse()
+        arena = Parser(tokens, recover=recover, builder=ArenaBuilder()).parse()
+        return objects, arena
+
+    def test_same_tree(self):
+        objects, arena = self.parse_both(self.SOURCE)
+        self.assertEqual(ast_to_dict(arena), ast_to_dict(objects))
+        self.assertEqual(sorted((type(n).__name__, n.span) for n in iter_nodes(arena)),
+                         sorted((type(n).__name__, n.span) for n in iter_nodes(objects)))
+
+    def test_views_behave_like_nodes(self):
+        _, arena = self.parse_both(self.SOURCE)
+        func = arena.statements[2]
+        self.assertIsInstance(func, AST.FuncDeclaration)
+        self.assertEqual(func.func_name.name, "suma")
+        self.assertEqual(func, arena.statements[2])
+        self.assertIsNone(arena.span)
+        expression = func.body[0].else_body[0].expression
+        self.assertEqual(self.SOURCE[slice(*expression.span)], "b + 1")
+        self.assertEqual(expression.left.base.name, "b")
+
+    def test_passes_over_arena(self):
+        objects, arena = self.parse_both(self.SOURCE)
+        SemanticAnalyzer().analyze(arena)
+        self.assertEqual([str(i) for i in IRGenerator().generate(arena)],
+                         [str(i) for i in IRGenerator().generate(objects)])
+
+    def test_value_setter(self):
+        # el analizador reemplaza los tipos de retorno desconocidos
+        _, arena = self.parse_both("func f() int { return 1; }\nfunc g() int { return 2; }")
+        f, g = arena.statements
+        f.return_type = 'error'
+        self.assertEqual(f.return_type, 'error')
+        self.assertEqual(g.return_type, 'int')
+        self.assertEqual(f.func_name.name, 'f')
+
+    def test_recover(self):
+        objects, arena = self.parse_both("var x int = ;\nprint 1;\n", recover=True)
+        self.assertEqual(ast_to_dict(arena), ast_to_dict(objects))
+
+    def test_pickle(self):
+        objects, arena = self.parse_both(self.SOURCE)
+        copy = pickle.loads(pickle.dumps(arena.arena))
+        self.assertEqual(ast_to_dict(copy.node(copy.root)), ast_to_dict(objects))
+
+
+class ASTSerializationTest(unittest.TestCase):
+    SOURCES = (
+        ArenaTest.SOURCE,
+        "var c char = 'é';\nvar b bool = !;\nprint -1 + 2.5e3;\nif true { } else { break; }\n",
+        "",
+    )
+
+    def trees(self):
+        for source in self.SOURCES:
+            tokens = Lexer(source).analizar()
+            yield Parser(tokens, recover=True).parse()
+            yield Parser(tokens, recover=True, builder=ArenaBuilder()).parse()
+
+    def test_streaming_json_matches_json_dump(self):
+        for ast in self.trees():
+            out = io.StringIO()
+            write_ast_json(ast, out)
+            self.assertEqual(out.getvalue(), json.dumps(ast_to_dict(ast), indent=2))
+
+    def test_binary_round_trip(self):
+        for ast in self.trees():
+            data = ast_binary.dumps(ast)
+            for builder in (None, ArenaBuilder()):
+                copy = ast_binary.loads(data, builder)
+                self.assertEqual(ast_to_dict(copy), ast_to_dict(ast))
+                self.assertEqual(sorted((type(n).__name__, n.span) for n in iter_nodes(copy)),
+                                 sorted((type(n).__name__, n.span) for n in iter_nodes(ast)))
+                self.assertEqual(ast_binary.dumps(copy), data)
+
+    def test_binary_rejects_other_data(self):
+        with self.assertRaises(ValueError):
+            ast_binary.loads(b'{"type": "Program"}')
+
+
+class HashConsTest(unittest.TestCase):
+    SOURCE = (
+        "var a int = (1 + 2) * 3;\n"
+        "var b int = (1 + 2) * 3 + a;\n"
+        "var c bool = 1 < 2 && true;\n"
+        "var d float = float(1 + 2) * 2.0;\n"
+        "print -(1 + 2) + a;\n"
+    )
+
+    def setUp(self):
+        tokens = Lexer(self.SOURCE).analizar()
+        self.objects = Parser(tokens).parse()
+        self.builder = HashConsBuilder()
+        self.consed = Parser(tokens, builder=self.builder).parse()
+
+    def test_same_tree(self):
+        self.assertEqual(ast_to_dict(self.consed), ast_to_dict(self.objects))
+        self.assertEqual([str(i) for i in IRGenerator().generate(self.consed)],
+                         [str(i) for i in IRGenerator().generate(self.objects)])
+
+    def test_sharing(self):
+        a, b, c, d, p = self.consed.statements
+        self.assertIs(a.initializer, b.initializer.left)
+        self.assertIs(a.initializer.left, p.expression.expression.left)
+        self.assertIs(a.initializer.left, d.initializer.left.expression)
+        # las expresiones con identificadores no se comparten
+        self.assertIsNot(b.initializer, p.expression)
+        self.assertGreater(self.builder.reused, 0)
+
+    def test_literal_types_are_not_merged(self):
+        ast = Parser(Lexer("print 1; print true; print 1.0;").analizar(),
+                     builder=HashConsBuilder()).parse()
+        values = [s.expression.value for s in ast.statements]
+        self.assertEqual([type(v) for v in values], [int, bool, float])
+        self.assertEqual(len({s.expression.structural_hash for s in ast.statements}), 3)
+
+    def test_structural_hash(self):
+        for node in iter_nodes(self.consed):
+            self.assertTrue(hasattr(node, '_hash'), type(node).__name__)
+        self.assertEqual(self.consed.structural_hash, self.objects.structural_hash)
+        arena = Parser(Lexer(self.SOURCE).analizar(), builder=ArenaBuilder()).parse()
+        self.assertEqual(arena.structural_hash, self.objects.structural_hash)
+        a, b = self.objects.statements[:2]
+        self.assertNotEqual(a.structural_hash, b.structural_hash)
+        # estable entre ejecuciones: no depende de hash() de str
+        self.assertEqual(AST.BinaryOp(AST.Literal(1), '+', AST.Literal(2)).structural_hash,
+                         0xee61df2440f0f727)
+        # los nombres entran con 64 bits: estos dos tienen el mismo crc32
+        self.assertNotEqual(AST.Identifier('plumless').structural_hash,
+                            AST.Identifier('buckeroo').structural_hash)
+
+    def test_spans_of_first_occurrence(self):
+        a, b = self.consed.statements[:2]
+        self.assertEqual(self.SOURCE[slice(*a.initializer.span)], "(1 + 2) * 3")
+        self.assertEqual(self.SOURCE[slice(*b.initializer.span)], "(1 + 2) * 3 + a")
+
+
+class VisitorTest(unittest.TestCase):
+    class Depth(Visitor):
+        def generic_visit(self, node):
+            return 1
+
+        def visit_Program(self, node):
+            depth = 0
+            for stmt in node.statements:
+                depth = max(depth, (yield self.visit(stmt)))
+            return depth + 1
+
+        def visit_PrintStatement(self, node):
+            return 1 + (yield self.visit(node.expression))
+
+        def visit_BinaryOp(self, node):
+            if node.operator == '/':
+                raise ZeroDivisionError(node.operator)
+            return 1 + max((yield self.visit(node.left)), (yield self.visit(node.right)))
+
+    def test_dispatch_and_drivers(self):
+        tokens = Lexer("print 1 + 2 * 3; var x int = 4;").analizar()
+        for builder in (None, ArenaBuilder()):
+            ast = Parser(tokens, builder=builder).parse()
+            self.assertEqual(self.Depth().run(ast), 5)
+            self.assertEqual(self.Depth().run(ast, recursive=True), 5)
+        # las vistas de ast_arena se resuelven por el nombre de su clase
+        self.assertIs(self.Depth._dispatch[type(ast.statements[0].expression)],
+                      self.Depth.visit_BinaryOp)
+
+    def test_errors_propagate(self):
+        ast = Parser(Lexer("print 1 + 2 / 3;").analizar()).parse()
+        for recursive in (False, True):
+            with self.assertRaises(ZeroDivisionError):
+                self.Depth().run(ast, recursive=recursive)
+
+
+def run_program(source, peephole=None, inline_budget=0):
+    """Compila y ejecuta 'source'; retorna lo que imprimió la máquina."""
+    ast = Parser(Lexer(source).analizar()).parse()
+    SemanticAnalyzer().analyze(ast)
+    instructions = IRGenerator(inline_budget=inline_budget).generate(ast)
+    if peephole is not None:
+        instructions = peephole.optimize(instructions)
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        StackMachine(encode(instructions)).run()
+    return output.getvalue()
+
+
+class ResolverTest(unittest.TestCase):
+    SOURCE = (
+        "var g int = 1000;\n"
+        "func f(a int, b int) int {\n"
+        "    var t int = a * b;\n"
+        "    if t > 5 { var u int = t - 5; t = u; }\n"
+        "    while t < 3 { var w int = 1; var g int = w; t = t + g; }\n"
+        "    return t + g;\n"
+        "}\n"
+        "var h int = f(2, 3) + f(1, 1);\n"
+        "print h;\n"
+    )
+
+    def test_slots(self):
+        ast = Parser(Lexer(self.SOURCE).analizar()).parse()
+        resolution = Resolver().resolve(ast)
+        g, f, h = ast.statements[:3]
+        self.assertEqual(resolution.global_count, 2)
+        self.assertEqual(resolution.slots[g.identifier], Slot(GLOBAL, 0))
+        self.assertEqual(resolution.slots[h.identifier], Slot(GLOBAL, 1))
+        a, b = (p.identifier for p in f.parameters)
+        self.assertEqual([resolution.slots[a], resolution.slots[b]], [Slot(LOCAL, 0), Slot(LOCAL, 1)])
+        # u (del if) y w (del while) comparten el slot 3; el g local usa el 4
+        if_stmt, while_stmt = f.body[1:3]
+        self.assertEqual(resolution.slots[if_stmt.then_body[0].identifier], Slot(LOCAL, 3))
+        self.assertEqual(resolution.slots[while_stmt.body[0].identifier], Slot(LOCAL, 3))
+        self.assertEqual(resolution.slots[while_stmt.body[1].identifier], Slot(LOCAL, 4))
+        self.assertEqual(resolution.frame_sizes[f], 5)
+        # el return ve el g global, no el del while
+        self.assertEqual(resolution.slots[f.body[3].expression.right.base], Slot(GLOBAL, 0))
+
+    def test_execution(self):
+        # f(2, 3): t = 6 -> 1 -> 3; f(1, 1): t = 1 -> 3
+        self.assertEqual(run_program(self.SOURCE), "2006")
+        instructions = [str(i) for i in IRGenerator().generate(
+            Parser(Lexer(self.SOURCE).analizar()).parse())]
+        self.assertEqual(instructions[0], "GLOBALS 2")
+        self.assertLess(instructions.index("HALT"), instructions.index("LABEL FUNC_f"))
+
+    CALL_STATEMENTS = (
+        "var g int = 0;\n"
+        "func h() int { return 100; }\n"
+        "func f(a int) int { h(); return a; }\n"
+        "func bump(n int) int { g = g + n; return g; }\n"
+        "print 5 + f(1); print ' ';\n"
+        "var i int = 0;\n"
+        "while i < 50 { bump(1); if i > 10 { bump(2); } else { h(); } i = i + 1; }\n"
+        "print g;\n"
+    )
+
+    def test_call_statement(self):
+        # el valor de una llamada usada como sentencia se descarta con POP
+        self.assertEqual(run_program(self.CALL_STATEMENTS), "6 128")
+        ast = Parser(Lexer(self.CALL_STATEMENTS).analizar()).parse()
+        machine = StackMachine(encode(IRGenerator().generate(ast)))
+        with contextlib.redirect_stdout(io.StringIO()):
+            machine.run()
+        self.assertEqual(machine.stack, [])
+
+
+class TypedIRTest(unittest.TestCase):
+    SOURCE = (
+        "var a int = 7;\n"
+        "var f float = float(a) / 2.0;\n"
+        "print a / 2; print ' '; print f; print ' ';\n"
+        "print (-f) < 0.0; print ' '; print int(f * 3.0); print ' ';\n"
+        "print 'A'; print bool(a - 7); print ' '; print int(true) + 1;\n"
+        "var p int = ^16;\n"
+        "`p = 2.25; `(p + 4) = -5;\n"
+    )
+
+    def test_opcodes(self):
+        ast = Parser(Lexer(self.SOURCE).analizar()).parse()
+        analyzer = SemanticAnalyzer()
+        analyzer.analyze(ast)
+        self.assertEqual(analyzer.types[ast.statements[1].initializer], 'float')
+        opcodes = {i.opcode for i in IRGenerator(types=analyzer.types).generate(ast)}
+        self.assertTrue({'DIVI', 'DIVF', 'ITOF', 'FTOI', 'BTOI', 'NEGF', 'LTF', 'NEI',
+                         'MULF', 'POKEF', 'POKEI', 'PRINTI', 'PRINTF', 'PRINTC', 'PRINTB'} <= opcodes)
+        self.assertFalse({'ADDF', 'PEEKI'} & opcodes)
+
+    def test_execution(self):
+        self.assertEqual(run_program(self.SOURCE), "3 3.5 true 10 Afalse 2")
+        machine = StackMachine(encode(IRGenerator().generate(Parser(Lexer(self.SOURCE).analizar()).parse())))
+        # ^16 retorna la dirección del bloque nuevo, al final de los 1024 bytes iniciales
+        with contextlib.redirect_stdout(io.StringIO()):
+            machine.run()
+        self.assertEqual(machine.memory.read_float(1024), 2.25)
+        self.assertEqual(machine.memory.read_int(1028), -5)
+
+    def test_memory_round_trip(self):
+        # una lectura `dir toma el tipo de la variable o del destino que la recibe
+        source = (
+            "var p int = ^8;\n"
+            "`p = 2.25; `(p + 4) = 7;\n"
+            "var f float = `p;\n"
+            "var g float = 0.0; g = `p;\n"
+            "var n int = `(p + 4);\n"
+            "print f; print ' '; print g + 1.0; print ' '; print n + `(p + 4);\n"
+        )
+        ast = Parser(Lexer(source).analizar()).parse()
+        analyzer = SemanticAnalyzer()
+        analyzer.analyze(ast)
+        peeks = [i.opcode for i in IRGenerator(types=analyzer.types).generate(ast) if i.opcode.startswith('PEEK')]
+        self.assertEqual(peeks, ['PEEKF', 'PEEKF', 'PEEKI', 'PEEKI'])
+        self.assertEqual(run_program(source), "2.25 3.25 14")
+        with self.assertRaises(SemanticError):
+            SemanticAnalyzer().analyze(Parser(Lexer("var f float = 1.5; print `f;").analizar()).parse())
+
+
+class BytecodeTest(unittest.TestCase):
+    SOURCE = (
+        "var i int = 0;\n"
+        "var x float = 0.5;\n"
+        "func twice(v float) float { return v * 2.0; }\n"
+        "while i < 10 {\n"
+        "    i = i + 1;\n"
+        "    if i == 3 { continue; }\n"
+        "    if i > 5 { break; }\n"
+        "    x = twice(x) + 0.5;\n"
+        "    print i;\n"
+        "}\n"
+        "print x;\n"
+    )
+
+    def test_round_trip(self):
+        instructions = IRGenerator().generate(Parser(Lexer(self.SOURCE).analizar()).parse())
+        bytecode = encode(instructions)
+        self.assertEqual([str(i) for i in decode(bytecode)], [str(i) for i in instructions])
+        # con los LABEL en el código no hace falta la tabla de nombres
+        self.assertIsNone(bytecode.labels)
+        self.assertEqual(bytecode.code.itemsize, 1)
+        self.assertEqual(bytecode.code[0], Op.GLOBALS)
+        # 0.5 y las etiquetas aparecen una sola vez en el pool
+        self.assertEqual(bytecode.constants.count(0.5), 1)
+        self.assertEqual(len(bytecode.constants), len(set(map(repr, bytecode.constants))))
+        self.assertNotIn('BREAK', {i.opcode for i in instructions})
+
+    def test_pool_keeps_types(self):
+        bytecode = encode([IRInstruction("CONSTR", 1.0), IRInstruction("CONSTI", 2 ** 40),
+                           IRInstruction("CONSTR", 1.0), IRInstruction("HALT")])
+        self.assertEqual(bytecode.constants, [1.0, 2 ** 40])
+        self.assertEqual([str(i) for i in decode(bytecode)],
+                         ["CONSTR 1.0", f"CONSTI {2 ** 40}", "CONSTR 1.0", "HALT"])
+
+    def test_execution(self):
+        # i == 3 salta el resto del cuerpo, i == 6 sale del while
+        self.assertEqual(run_program(self.SOURCE), "124515.5")
+
+
+class PeepholeTest(unittest.TestCase):
+    SOURCE = (
+        "var x int = 2 * 3 + 1;\n"
+        "if x > 5 { print x; }\n"
+        "if 1 < 2 { print 'y'; } else { print 'n'; }\n"
+        "while false { print 0; }\n"
+        "func f(a int) int { if a > 0 { return a; } return 0 - a; print a; }\n"
+        "print f(-3); print 7 / 0 * 0;\n"
+    )
+
+    def test_rules(self):
+        instructions = IRGenerator().generate(Parser(Lexer(self.SOURCE).analizar()).parse())
+        peephole = PeepholeOptimizer()
+        optimized = [str(i) for i in peephole.optimize(instructions)]
+        # constantes plegadas, if sin else sin JUMP ni ENDIF, ramas y
+        # bucles constantes eliminados, código después del return quitado;
+        # la división por cero queda para la ejecución
+        self.assertEqual(optimized, [
+            "GLOBALS 1", "CONSTI 7", "DUP", "STORE_GLOBAL 0", "CONSTI 5", "GTI", "JUMP_IF_FALSE ELSE1",
+            "LOAD_GLOBAL 0", "PRINTI", "LABEL ELSE1", "CONSTI 121", "PRINTC",
+            "CONSTI -3", "CALL f", "PRINTI", "CONSTI 7", "CONSTI 0", "DIVI", "CONSTI 0", "MULI", "PRINTI", "HALT",
+            "LABEL FUNC_f", "ENTER 1", "DUP", "STORE_LOCAL 0", "CONSTI 0", "GTI", "JUMP_IF_FALSE f.ELSE1",
+            "LOAD_LOCAL 0", "RETURN", "LABEL f.ELSE1", "CONSTI 0", "LOAD_LOCAL 0", "SUBI", "RETURN",
+        ])
+        self.assertEqual(peephole.after, len(optimized))
+        self.assertEqual(peephole.before - peephole.after, sum(removed for _, removed in peephole.stats.values()))
+        self.assertTrue(all(applied for applied, _ in peephole.stats.values()))
+
+    def test_same_output(self):
+        for source in (ResolverTest.SOURCE, TypedIRTest.SOURCE, BytecodeTest.SOURCE, ParallelTest.VALID):
+            self.assertEqual(run_program(source, PeepholeOptimizer()), run_program(source))
+        with self.assertRaises(ZeroDivisionError):
+            run_program(self.SOURCE, PeepholeOptimizer())
+        peephole = PeepholeOptimizer(rules=['folding'])
+        self.assertEqual(run_program("print 2 + 3 * 4;", peephole), "14")
+        self.assertEqual(list(peephole.stats), ['folding'])
+
+
+class ASTOptimizerTest(unittest.TestCase):
+    SOURCE = (
+        "const k int = 3;\n"
+        "const j = k * 2 + 1;\n"
+        "var x int = k * 4 + j;\n"
+        "if k < 2 { print 0; } else { var z int = 5; print z + x; }\n"
+        "if true { print 'a'; print j; }\n"
+        "while k > 5 { print 1; }\n"
+        "func f(k int) int { if k > j { return k; } return j; print 99; }\n"
+        "func g() bool { return float(k) / 2.0 > 1.0 && true; }\n"
+        "print g(); print f(1); print f(10); print int(7.9); print char(65); print 7 / 0 == 1;\n"
+    )
+
+    def optimized(self, source):
+        ast = Parser(Lexer(source).analizar()).parse()
+        analyzer = SemanticAnalyzer()
+        analyzer.analyze(ast)
+        optimizer = ASTOptimizer(analyzer.types)
+        return ast, optimizer.optimize(ast), optimizer
+
+    def test_transformations(self):
+        ast, optimized, optimizer = self.optimized(self.SOURCE)
+        statements = optimized.statements
+        # las constantes desaparecen y sus usos se pliegan
+        self.assertEqual(statements[0].initializer.value, 19)
+        # la rama else tiene una variable: queda como if true
+        self.assertEqual(statements[1].condition.value, True)
+        self.assertEqual([s.expression.value for s in statements[2:4]], ['a', 7])
+        func_f = statements[4]
+        self.assertEqual(len(func_f.body), 2)
+        self.assertEqual(repr(func_f.body[0].condition), "(Identifier(k) > Literal(7))")
+        self.assertEqual(statements[5].body[0].expression.value, True)
+        # la división por cero no se pliega
+        self.assertIsInstance(statements[-1].expression, AST.BinaryOp)
+        self.assertEqual(optimizer.stats, {'folded': 12, 'propagated': 9, 'branches': 3, 'unreachable': 1})
+        # el árbol original no cambia
+        self.assertEqual(len(ast.statements), 14)
+        self.assertIs(optimized.statements[6], ast.statements[8])
+
+    def test_same_output(self):
+        for source in (self.SOURCE.replace("7 / 0", "7 / 2"), ResolverTest.SOURCE, TypedIRTest.SOURCE,
+                       BytecodeTest.SOURCE, ParallelTest.VALID):
+            _, optimized, optimizer = self.optimized(source)
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output):
+                StackMachine(encode(IRGenerator(types=optimizer.types).generate(optimized))).run()
+            self.assertEqual(output.getvalue(), run_program(source))
+
+
+class LinkerTest(unittest.TestCase):
+    SOURCE = (
+        "func helper(a int) int { var r int = 0; while r < a { r = r + 2; } return r; }\n"
+        "func unused(a int) int { return helper(a) + 1; }\n"
+        "func used(a int) int { if a > 1 { return helper(a); } return 0; }\n"
+        "print used(5);\n"
+    )
+
+    def test_link(self):
+        instructions = IRGenerator().generate(Parser(Lexer(self.SOURCE).analizar()).parse())
+        linker = Linker()
+        image = linker.link(instructions)
+        self.assertEqual(linker.removed_functions, ['unused'])
+        self.assertNotIn(Op.LABEL, image.code)
+        self.assertEqual(len(image), len(instructions) - linker.stripped_labels
+                         - len(split_functions(instructions)[1]['unused']))
+        # los destinos son índices absolutos; decode conserva los nombres
+        listing = [str(i) for i in decode(image)]
+        self.assertIn("CALL used", listing)
+        self.assertIn("JUMP helper.LOOP1", listing)
+        call = listing.index("CALL used")
+        self.assertEqual(Op(image.code[image.args[call]]), Op.ENTER)
+
+    def test_same_output(self):
+        for source in (self.SOURCE, ResolverTest.SOURCE, TypedIRTest.SOURCE, BytecodeTest.SOURCE,
+                       ParallelTest.VALID):
+            instructions = IRGenerator().generate(Parser(Lexer(source).analizar()).parse())
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output):
+                StackMachine(link(PeepholeOptimizer().optimize(instructions))).run()
+            self.assertEqual(output.getvalue(), run_program(source))
+
+
+class RegisterVMTest(unittest.TestCase):
+    SOURCE = (
+        "var g int = 0;\n"
+        "func bump() { g = g + 1; }\n"
+        "func sum(n int) int {\n"
+        "    var s int = 0; var i int = 0;\n"
+        "    while i < n { var old int = i; i = i + 1; s = s + old * i + g; bump(); }\n"
+        "    return s;\n"
+        "}\n"
+        "print sum(4); print ' '; print g;\n"
+    )
+
+    def compile(self, source, peephole=None):
+        ast = Parser(Lexer(source).analizar()).parse()
+        instructions = IRGenerator().generate(ast)
+        if peephole is not None:
+            instructions = peephole.optimize(instructions)
+        return RegisterCompiler(function_signatures(ast)).compile(instructions)
+
+    def run_registers(self, source, peephole=None):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            RegisterMachine(self.compile(source, peephole)).run()
+        return output.getvalue()
+
+    def test_three_address_code(self):
+        program = self.compile(self.SOURCE, PeepholeOptimizer())
+        self.assertEqual([f.name for f in program.functions], ['<nivel superior>', 'bump', 'sum'])
+        # en sum: n, s, i y old son r0..r3 y las constantes 0 y 1, r4 y r5
+        self.assertEqual(program.functions[2].template[4:6], [0, 1])
+        listing = [line.split(None, 1)[1] for line in program.listing() if line.startswith(" ")]
+        # i = i + 1 es una sola instrucción sobre el registro de i y el
+        # while compara y salta en otra
+        self.assertIn("ADDI r2, r2, r5", listing)
+        self.assertIn("JUMP_IF_NOT_LT r2, r0, @22", listing)
+        self.assertIn("CALL bump()", listing)
+        self.assertEqual(self.run_registers(self.SOURCE), "26 4")
+
+    def test_same_output(self):
+        for source in (self.SOURCE, ResolverTest.SOURCE, TypedIRTest.SOURCE, BytecodeTest.SOURCE,
+                       PeepholeTest.SOURCE.replace("7 / 0", "7 / 2"), LinkerTest.SOURCE, ParallelTest.VALID,
+                       ResolverTest.CALL_STATEMENTS):
+            expected = run_program(source)
+            self.assertEqual(self.run_registers(source), expected)
+            self.assertEqual(self.run_registers(source, PeepholeOptimizer()), expected)
+
+
+class SuperinstructionTest(unittest.TestCase):
+    SOURCE = (
+        "var p int = ^8;\n"
+        "`p = 40;\n"
+        "func count(n int) int {\n"
+        "    var i int = 0; var s int = 0;\n"
+        "    while i < n { s = s + i; i = i + 1; }\n"
+        "    while i < 20 { i = i + 2; }\n"
+        "    return s + `1024;\n"
+        "}\n"
+        "var k int = 0;\n"
+        "while k < 3 { print count(k + 4); k = k + 1; }\n"
+    )
+
+    def image(self, source):
+        instructions = IRGenerator().generate(Parser(Lexer(source).analizar()).parse())
+        return link(PeepholeOptimizer().optimize(instructions))
+
+    def run_image(self, image):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            StackMachine(image).run()
+        return output.getvalue()
+
+    def test_fusions(self):
+        image = self.image(self.SOURCE)
+        fuser = SuperinstructionFuser()
+        fused = fuser.fuse(image)
+        self.assertEqual({name: count for name, count in fuser.stats.items() if count}, {
+            'INC_LOCAL': 2, 'INC_GLOBAL': 1, 'LT_LOCALS_JUMP': 1, 'LT_LOCAL_CONST_JUMP': 1,
+            'LT_GLOBAL_CONST_JUMP': 1, 'CONST_PEEKI': 1})
+        # las instrucciones de la secuencia quedan: los destinos no cambian
+        self.assertEqual(len(fused), len(image))
+        self.assertEqual(fused.args, image.args)
+        self.assertEqual(self.run_image(fused), self.run_image(image))
+        self.assertEqual(self.run_image(image), "465055")
+        only = SuperinstructionFuser(fusions=['CONST_PEEKI'])
+        only.fuse(image)
+        self.assertEqual(list(only.stats), ['CONST_PEEKI'])
+        with self.assertRaises(ValueError):
+            SuperinstructionFuser(fusions=['ADDI'])
+
+    def test_same_output(self):
+        for source in (self.SOURCE, ResolverTest.SOURCE, TypedIRTest.SOURCE, BytecodeTest.SOURCE,
+                       LinkerTest.SOURCE, ParallelTest.VALID, RegisterVMTest.SOURCE):
+            image = self.image(source)
+            self.assertEqual(self.run_image(SuperinstructionFuser().fuse(image)), run_program(source))
+
+    def test_ngrams(self):
+        dump = ["📥 Código Intermedio (IR):"] + [str(i) for i in IRGenerator().generate(
+            Parser(Lexer(self.SOURCE).analizar()).parse())] + ["Linker: 0 etiquetas resueltas"]
+        instructions = read_dump(dump)
+        self.assertEqual(len(instructions), len(dump) - 2)
+        increment = tuple(op.name for op in FUSIONS[Op.INC_LOCAL])
+        self.assertEqual(count_ngrams(instructions, (4,))[increment], 2)
+        # ejecutadas: i = i + 1 corre 4 + 5 + 6 veces y i = i + 2 las que faltan hasta 20
+        executed = count_executed_ngrams(link(instructions), (4,))
+        self.assertEqual(executed[increment], 15 + 8 + 8 + 7)
+
+
+class InlinerTest(unittest.TestCase):
+    SOURCE = (
+        "var g int = 10;\n"
+        "func suma(a int, b int) int { return a + b; }\n"
+        "func twice(a int) int { var t int = suma(a, a); return t; }\n"
+        "func log(v int) { print v; print ' '; g = g + 1; }\n"
+        "func fact(n int) int { if n < 2 { return 1; } return n * fact(n - 1); }\n"
+        "func outer(x int) int { var y int = twice(x) + suma(x, 1); log(y); return y * g; }\n"
+        "var i int = 0;\n"
+        "while i < 3 { var t int = outer(i) + twice(suma(i, g)); print t; print ' '; i = i + 1; }\n"
+        "print fact(5); log(twice(2));\n"
+    )
+
+    def generate(self, source, budget):
+        ast = Parser(Lexer(source).analizar()).parse()
+        generator = IRGenerator(inline_budget=budget)
+        return generator.generate(ast), generator
+
+    def test_selection(self):
+        ast = Parser(Lexer(self.SOURCE).analizar()).parse()
+        graph = call_graph(function_declarations(ast))
+        self.assertEqual(graph['outer'], {'twice', 'suma', 'log'})
+        self.assertEqual(recursive_functions(graph), {'fact'})
+        # sin declaraciones adelantadas no hay recursión indirecta en Mani,
+        # pero el chequeo la detecta igual
+        self.assertEqual(recursive_functions({'a': {'b'}, 'b': {'c', 'print'}, 'c': {'a'}, 'd': {'a'}}),
+                         {'a', 'b', 'c'})
+        # outer tiene más de 20 nodos; fact tiene un if
+        self.assertEqual(set(inlinable_functions(ast, 20)), {'suma', 'twice', 'log'})
+        self.assertEqual(set(inlinable_functions(ast, 100)), {'suma', 'twice', 'log', 'outer'})
+        self.assertEqual(inlinable_functions(ast, 0), {})
+
+    def test_fresh_slots(self):
+        instructions, generator = self.generate(self.SOURCE, 20)
+        self.assertEqual(generator.inlined, {'suma': 6, 'twice': 3, 'log': 2})
+        top_level, functions = split_functions(instructions)
+        self.assertNotIn('CALL suma', [str(i) for i in top_level])
+        self.assertIn('CALL outer', [str(i) for i in top_level])
+        # en el nivel superior los locales de las copias son globales nuevos
+        # (g, i y t son los tres primeros); la copia de suma dentro de la de
+        # twice no usa los slots de twice
+        self.assertEqual(top_level[0].arg, 3 + 2 + 2)
+        # en outer van después de x e y: 2 + 2 (twice) + 2 (suma dentro de twice)
+        self.assertEqual(str(functions['outer'][1]), "ENTER 6")
+
+    def test_same_output(self):
+        for source in (self.SOURCE, ResolverTest.SOURCE, BytecodeTest.SOURCE, LinkerTest.SOURCE,
+                       ParallelTest.VALID, RegisterVMTest.SOURCE):
+            expected = run_program(source)
+            for budget in (5, 20, 100):
+                self.assertEqual(run_program(source, inline_budget=budget), expected)
+                self.assertEqual(run_program(source, PeepholeOptimizer(), inline_budget=budget), expected)
+
+    def test_call_statement(self):
+        # f y bump llaman a funciones con valor como sentencia: la copia
+        # descarta ese valor igual que la función llamada
+        source = ResolverTest.CALL_STATEMENTS
+        instructions, generator = self.generate(source, 20)
+        self.assertEqual(set(generator.inlined), {'h', 'f', 'bump'})
+        self.assertEqual(run_program(source, inline_budget=20), run_program(source))
+        ast = Parser(Lexer(source).analizar()).parse()
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            RegisterMachine(RegisterCompiler(function_signatures(ast)).compile(instructions)).run()
+        self.assertEqual(output.getvalue(), "6 128")
+
+
+class ParallelTest(unittest.TestCase):
+    VALID = (
+        "var g int = 1;\n"
+        "func m(x int) int { if x < 1 { return 1; } return m(x - 1) * g; }\n"
+        "if g < 2 { var blk int = 5; func inner(y int) int { return y + blk + g; } print inner(1); }\n"
+        "func w() { while g < 3 { var t int = g; g = g + t; } }\n"
+        "var z float = 2.0;\n"
+        "func u(a float) float { var q float = a * z; if q > 1.0 { q = q / 2.0; } return q; }\n"
+        "print u(z); w(); print g;\n"
+    )
+    INVALID = (
+        "func f(a int) int { return a + h; }\n"
+        "var h int = 2;\n"
+        "func f(b int) int { return b; }\n"
+        "func k() int { var z float = 1; }\n"
+        "print f(1) + q;\n"
+        "var f int = 3;\n"
+    )
+
+    def sequential(self, source):
+        ast = Parser(Lexer(source).analizar()).parse()
+        analyzer = SemanticAnalyzer()
+        try:
+            analyzer.analyze(ast)
+        except SemanticError as e:
+            return str(e)
+        return [str(i) for i in IRGenerator(types=analyzer.types).generate(ast)]
+
+    def parallel(self, source, jobs):
+        ast = Parser(Lexer(source).analizar()).parse()
+        try:
+            return [str(i) for i in compile_program(ast, jobs=jobs, min_functions=0)]
+        except SemanticError as e:
+            return str(e)
+
+    def test_same_as_sequential(self):
+        for source in (self.VALID, self.INVALID):
+            expected = self.sequential(source)
+            for jobs in (1, 2):
+                self.assertEqual(self.parallel(source, jobs), expected)
+        # las etiquetas de cada función llevan su nombre
+        self.assertIn("LABEL u.ENDIF2", self.sequential(self.VALID))
+        self.assertIn("Función 'f' ya declarada.", self.sequential(self.INVALID).splitlines())
+
+
+class IncrementalParserTest(unittest.TestCase):
+    SOURCE = (
+        "var a int = 1;\n"
+        "func f(x int) int { var y int = x * 2; return y + a; }\n"
+        "if a < 2 { print f(a); } else { print 0; }\n"
+        "var b float = 2.5;\n"
+        "while a < 3 { a = a + 1; }\n"
+        "print b;\n"
+    )
+    FRAGMENTS = ("var z int = 3;", "print 1;", "if a < 2 { print 2; }", " else { print 3; }",
+                 "func g() int { return 1; }", "{", "}", ";", "(", "+ 1", "a", "=", "\n", " ", "/*", "*/")
+
+    def test_same_as_full_parse(self):
+        rng = random.Random(8)
+        checked = 0
+        with contextlib.redirect_stdout(io.StringIO()):
+            parser = IncrementalParser(self.SOURCE)
+            for _ in range(400):
+                source = parser.source
+                offset = rng.randrange(len(source) + 1)
+                deleted = min(rng.choice((0, 0, 1, 3, 10)), len(source) - offset)
+                inserted = rng.choice(self.FRAGMENTS) if rng.randrange(4) else ""
+                new_source = source[:offset] + inserted + source[offset + deleted:]
+                tokens = parser.tokens
+                old = {(tokens.starts[e.first], tokens.ends[e.end - 1]): e.node
+                       for e in parser.entries if not e.errors and e.end > e.first}
+                try:
+                    full = Parser(Lexer(new_source).analizar(), recover=True)
+                    expected = full.parse()
+                except SyntaxError:
+                    with self.assertRaises(SyntaxError):
+                        parser.edit(offset, deleted, inserted)
+                    parser = IncrementalParser(self.SOURCE)
+                    continue
+                program = parser.edit(offset, deleted, inserted)
+                self.assertEqual(ast_to_dict(program), ast_to_dict(expected), f"{source!r} -> {new_source!r}")
+                self.assertEqual(parser.errors, full.errors)
+
+                # las sentencias sin errores cuyo texto no tocó la edición
+                # son los mismos nodos que antes
+                delta = len(inserted) - deleted
+                tokens = parser.tokens
+                for entry in parser.entries:
+                    if entry.errors or entry.end == entry.first:
+                        continue
+                    start, end = tokens.starts[entry.first], tokens.ends[entry.end - 1]
+                    if end < offset:
+                        key = (start, end)
+                    elif start > offset + len(inserted):
+                        key = (start - delta, end - delta)
+                    else:
+                        continue
+                    if key in old:
+                        self.assertIs(entry.node, old[key])
+                        checked += 1
+                # un error de sintaxis suele arrastrar al resto del archivo:
+                # se vuelve seguido al fuente válido
+                if parser.errors and rng.randrange(3) == 0 or not 80 < len(parser.source) < 500:
+                    parser = IncrementalParser(self.SOURCE)
+        self.assertGreater(checked, 1000)
+
+
+class IncrementalAnalyzerTest(unittest.TestCase):
+    NAMES = ('a', 'b', 'c', 'd')
+    TYPES = ('int', 'float')
+    LITERALS = {'int': '1', 'float': '1.0'}
+
+    def random_statement(self, rng):
+        name = rng.choice(self.NAMES)
+        typ = rng.choice(self.TYPES)
+        other = rng.choice(self.NAMES)
+        kind = rng.randrange(4)
+        if kind == 0:
+            return f"var g{name} {typ} = {self.LITERALS[typ]};"
+        if kind == 1:
+            return (f"func f{name}(x {typ}) {rng.choice(self.TYPES)} "
+                    f"{{ var y {typ} = x; return f{other}(y) + g{other}; }}")
+        if kind == 2:
+            return f"print f{name}(g{other});"
+        return f"g{name} = g{other} + {self.LITERALS[typ]};"
+
+    def test_same_as_full_analysis(self):
+        rng = random.Random(18)
+        incremental = IncrementalAnalyzer()
+        statements = [self.random_statement(rng) for _ in range(12)]
+        reused = 0
+        for _ in range(150):
+            edit = rng.randrange(3)
+            if edit == 0 or len(statements) < 4:
+                statements.insert(rng.randrange(len(statements) + 1), self.random_statement(rng))
+            elif edit == 1:
+                del statements[rng.randrange(len(statements))]
+            else:
+                statements[rng.randrange(len(statements))] = self.random_statement(rng)
+            source = "\n".join(statements)
+
+            full = SemanticAnalyzer()
+            full_ast = Parser(Lexer(source).analizar()).parse()
+            try:
+                full.analyze(full_ast)
+            except SemanticError:
+                pass
+            ast = Parser(Lexer(source).analizar()).parse()
+            try:
+                incremental.analyze(ast)
+            except SemanticError as e:
+                self.assertEqual(str(e), "\n".join(full.errors))
+            self.assertEqual(incremental.errors, full.errors)
+            # mismos tipos, comparando los nodos en el mismo orden de recorrido
+            self.assertEqual([incremental.types.get(n) for n in iter_nodes(ast)],
+                             [full.types.get(n) for n in iter_nodes(full_ast)])
+            reused += incremental.reused
+        self.assertGreater(reused, 0)
+
+    def test_hash_collision(self):
+        # 'plumless' y 'buckeroo' tienen el mismo crc32: con el hash de 32
+        # bits de los valores, las dos sentencias print tenían el mismo
+        # structural_hash y la segunda reutilizaba el análisis de la primera
+        source = "var plumless int = 1;\nprint plumless;"
+        parser = IncrementalParser(source)
+        incremental = IncrementalAnalyzer()
+        incremental.analyze(parser.program)
+        old_print = parser.program.statements[1]
+        program = parser.edit(source.rindex("plumless"), len("plumless"), "buckeroo")
+        self.assertFalse(AST.structurally_equal(old_print, program.statements[1]))
+        with self.assertRaises(SemanticError) as full:
+            SemanticAnalyzer().analyze(Parser(Lexer(parser.source).analizar()).parse())
+        with self.assertRaises(SemanticError) as raised:
+            incremental.analyze(program)
+        self.assertEqual(str(raised.exception), str(full.exception))
+        self.assertEqual((incremental.reused, incremental.rechecked), (1, 1))
 
-# Aseguramos que el directorio raíz del proyecto esté en sys.path.
-# Esto es útil para que las importaciones relativas (desde Parser y Lexer) se resuelvan correctamente.
-current_dir = os.path.dirname(os.path.abspath(__file__))
-project_root = os.path.join(current_dir, '..')
-if project_root not in sys.path:
-    sys.path.insert(0, project_root)
-
-# Importamos los módulos necesarios:
-from Parser import Parser
-from Lexer.Token import Token, TokenType
-from Lexer.AST import Program  # Usado para verificar la raíz del AST si se requiere
-
-# Función auxiliar para convertir el AST a un diccionario, de manera recursiva,
-# y poder luego imprimirlo en formato JSON.
-def ast_to_dict(node):
-    if isinstance(node, list):
-        return [ast_to_dict(n) for n in node]
-    elif hasattr(node, '__dict__'):
-        result = {"type": node.__class__.__name__}
-        for key, value in node.__dict__.items():
-            result[key] = ast_to_dict(value)
-        return result
-    else:
-        return node
-
-def main():
-    # Lista simulada de tokens para probar el parser (corresponde a:
-    # var x = 10;
-    # const y = 2.5;
-    # print(x + y);
-    # if (x > y) { return x; }
-    # EOF
-    tokens = [
-        Token(TokenType.VAR, 'var'),
-        Token(TokenType.IDENTIFIER, 'x'),
-        Token(TokenType.ASSIGN, '='),
-        Token(TokenType.INTEGER, 10),
-        Token(TokenType.SEMI, ';'),
-
-        Token(TokenType.CONST, 'const'),
-        Token(TokenType.IDENTIFIER, 'y'),
-        Token(TokenType.ASSIGN, '='),
-        Token(TokenType.FLOAT, 2.5),
-        Token(TokenType.SEMI, ';'),
-
-        Token(TokenType.PRINT, 'print'),
-        Token(TokenType.LPAREN, '('),
-        Token(TokenType.IDENTIFIER, 'x'),
-        Token(TokenType.PLUS, '+'),
-        Token(TokenType.IDENTIFIER, 'y'),
-        Token(TokenType.RPAREN, ')'),
-        Token(TokenType.SEMI, ';'),
-
-        Token(TokenType.IF, 'if'),
-        Token(TokenType.LPAREN, '('),
-        Token(TokenType.IDENTIFIER, 'x'),
-        Token(TokenType.GT, '>'),
-        Token(TokenType.IDENTIFIER, 'y'),
-        Token(TokenType.RPAREN, ')'),
-        Token(TokenType.LBRACE, '{'),
-
-        Token(TokenType.RETURN, 'return'),
-        Token(TokenType.IDENTIFIER, 'x'),
-        Token(TokenType.SEMI, ';'),
-
-        Token(TokenType.RBRACE, '}'),
-        Token('EOF', 'EOF')
-    ]
-
-    parser = Parser(tokens)
-    try:
-        ast = parser.parse()  # Se asume que el método de entrada es parse()
-        ast_json = json.dumps(ast_to_dict(ast), indent=2)
-        print("AST en JSON:")
-        print(ast_json)
-    except SyntaxError as e:
-        print("Error de sintaxis:")
-        print(e)
 
 if __name__ == "__main__":
-    main()
+    unittest.main()
@@ -0,0 +1,201 @@
+# token_buffer.py
+
+from array import array
+from bisect import bisect_left, bisect_right
+from Token import TokenType, TOKEN_TYPES, TOKEN_CODES
+from lexer import Lexer, LineIndex
+
+_IDENTIFIER = TOKEN_CODES[TokenType.IDENTIFIER]
+_INTEGER = TOKEN_CODES[TokenType.INTEGER]
+_FLOAT = TOKEN_CODES[TokenType.FLOAT]
+_CHAR = TOKEN_CODES[TokenType.CHAR]
+
+# Máximo de caracteres que una regla del lexer (salvo MLCOMMENT) examina a
+# partir del inicio de un lexema sin consumirlos: "'x'" mira 3 caracteres.
+_LOOKAHEAD = 3
+
+
+class TokenBuffer:
+    """
+    Almacén compacto de tokens en forma de "struct of arrays":
+
+      kinds    array('B')  código del tipo (ver Token.TOKEN_CODES)
+      starts   array('I')  offset de inicio del lexema en el fuente
+      ends     array('I')  offset de fin del lexema
+      symbols  array('I')  índice en 'names' (solo identificadores)
+
+    Los identificadores se internan en una tabla de símbolos, así que cada
+    nombre distinto existe una sola vez. El resto de valores (números,
+    caracteres) no se guardan: se leen del fuente al pedirlos.
+    """
+
+    def __init__(self, source, lines=None):
+        self.source = source
+        self.lines = lines if lines is not None else LineIndex(source)
+        self.kinds = array('B')
+        self.starts = array('I')
+        self.ends = array('I')
+        self.symbols = array('I')
+        self.names = []
+        self._name_ids = {}
+        self.open_comments = []
+        # (primer índice re-lexado, fin en el buffer anterior, fin en este)
+        self.changed = None
+
+    @classmethod
+    def from_source(cls, source):
+        return cls.from_lexer(Lexer(source))
+
+    @classmethod
+    def from_lexer(cls, lexer):
+        buffer = cls(lexer.texto, lexer.lines)
+        buffer.extend(lexer.scan())
+        buffer.open_comments = lexer.open_comments
+        return buffer
+
+    def extend(self, scanned):
+        """Agrega las tuplas (tipo, lexema, inicio, fin) que genera Lexer.scan()."""
+        kinds, starts, ends, symbols = self.kinds, self.starts, self.ends, self.symbols
+        intern = self.intern
+        for tipo, lexema, inicio, fin in scanned:
+            kinds.append(TOKEN_CODES[tipo])
+            starts.append(inicio)
+            ends.append(fin)
+            symbols.append(intern(lexema) if tipo == TokenType.IDENTIFIER else 0)
+
+    def edit(self, offset, deleted, inserted):
+        """
+        Aplica una edición al fuente (borra 'deleted' caracteres desde
+        'offset' e inserta 'inserted') y retorna un TokenBuffer nuevo.
+
+        Solo se re-lexa desde el último punto de reinicio seguro antes de la
+        edición hasta que un token nuevo vuelve a caer en el inicio de un
+        token viejo (desplazado); a partir de ahí el resto es idéntico y se
+        copia de los arrays con el offset corregido.
+        """
+        old_starts = self.starts
+        delta = len(inserted) - deleted
+        edit_end = offset + len(inserted)
+        source = self.source[:offset] + inserted + self.source[offset + deleted:]
+
+        # Punto de reinicio: un token cuyo lexema y lookahead terminan antes
+        # de la edición. Un '/*' sin cerrar previo a la edición obliga a
+        # volver hasta él, porque la edición puede agregarle el '*/'.
+        first = max(bisect_right(old_starts, offset - _LOOKAHEAD) - 1, 0)
+        if self.open_comments and self.open_comments[0] < offset:
+            first = min(first, bisect_left(old_starts, self.open_comments[0]))
+        if first == 0 or first >= len(old_starts):
+            first, restart = 0, 0  # nada seguro antes de la edición: desde el principio
+        else:
+            restart = old_starts[first]
+
+        result = TokenBuffer(source)
+        result.names = self.names  # los ids existentes siguen siendo válidos
+        result._name_ids = self._name_ids
+
+        lexer = Lexer(source)
+        lexer.lines = result.lines
+        lexer.pos = restart
+        resync = len(old_starts)
+        relexed = []
+        for token in lexer.scan():
+            inicio = token[2]
+            if inicio >= edit_end:
+                old = inicio - delta
+                j = bisect_left(old_starts, old, first)
+                if j < len(old_starts) and old_starts[j] == old:
+                    resync = j
+                    break
+            relexed.append(token)
+        result.extend(relexed)
+
+        tail_starts = self.starts[resync:]
+        tail_ends = self.ends[resync:]
+        if delta:
+            tail_starts = array('I', map(delta.__add__, tail_starts))
+            tail_ends = array('I', map(delta.__add__, tail_ends))
+        result.kinds = self.kinds[:first] + result.kinds + self.kinds[resync:]
+        result.starts = self.starts[:first] + result.starts + tail_starts
+        result.ends = self.ends[:first] + result.ends + tail_ends
+        result.symbols = self.symbols[:first] + result.symbols + self.symbols[resync:]
+
+        old_end = self.starts[resync] if resync < len(old_starts) else len(self.source) + 1
+        # el token de re-sincronización ya fue escaneado, pero pertenece a la cola
+        result.open_comments = ([o for o in self.open_comments if o < restart]
+                                + [o for o in lexer.open_comments if o < old_end + delta]
+                                + [o + delta for o in self.open_comments if o >= old_end])
+        result.changed = (first, resync, first + len(relexed))
+        return result
+
+    def intern(self, name):
+        name_id = self._name_ids.get(name)
+        if name_id is None:
+            name_id = self._name_ids[name] = len(self.names)
+            self.names.append(name)
+        return name_id
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def __getitem__(self, index):
+        if not 0 <= index < len(self.kinds):
+            raise IndexError(index)
+        return TokenView(self, index)
+
+    def kind(self, index):
+        return TOKEN_TYPES[self.kinds[index]]
+
+    def value(self, index):
+        """Materializa el valor del token 'index' igual que Lexer.iter_tokens."""
+        code = self.kinds[index]
+        if code == _IDENTIFIER:
+            return self.names[self.symbols[index]]
+        if code == _INTEGER:
+            return int(self.source[self.starts[index]:self.ends[index]])
+        if code == _FLOAT:
+            return float(self.source[self.starts[index]:self.ends[index]])
+        if code == _CHAR:
+            char = self.source[self.starts[index] + 1:self.starts[index] + 2]
+            return char if isinstance(char, str) else char.decode('utf-8', 'replace')
+        # palabras reservadas y símbolos: el lexema coincide con el tipo
+        return TOKEN_TYPES[code]
+
+
+class TokenView:
+    """
+    Referencia liviana (buffer, índice) con la misma interfaz de lectura
+    que Token. El Parser la recibe de TokenBuffer.__getitem__ y la descarta
+    enseguida; nada se guarda por token.
+    """
+    __slots__ = ('buffer', 'index')
+
+    def __init__(self, buffer, index):
+        self.buffer = buffer
+        self.index = index
+
+    @property
+    def tipo(self):
+        return TOKEN_TYPES[self.buffer.kinds[self.index]]
+
+    @property
+    def valor(self):
+        return self.buffer.value(self.index)
+
+    @property
+    def pos(self):
+        return self.buffer.starts[self.index]
+
+    @property
+    def fin(self):
+        return self.buffer.ends[self.index]
+
+    @property
+    def linea(self):
+        return self.buffer.lines.position(self.pos)[0]
+
+    @property
+    def columna(self):
+        return self.buffer.lines.position(self.pos)[1]
+
+    def __repr__(self):
+        return f"Token({self.tipo}, {repr(self.valor)}, línea={self.linea}, columna={self.columna})"
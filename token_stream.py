@@ -0,0 +1,40 @@
+# token_stream.py
+
+from collections import deque
+
+
+class TokenStream:
+    """
+    Vista indexable sobre un iterador de tokens que solo conserva una
+    ventana pequeña (buffer circular) de tokens ya producidos.
+
+    El Parser solo necesita el token actual, el siguiente
+    (peek(tokens, index+1)) y, al reportar errores, el anterior; por eso
+    con una ventana de 3 tokens la memoria se mantiene constante sin
+    importar el tamaño de la entrada. Pedir un índice que ya salió de la
+    ventana es un error de programación y lanza RuntimeError (IndexError
+    queda reservado para el fin de la entrada).
+    """
+
+    def __init__(self, iterable, window=3):
+        self._source = iter(iterable)
+        self._buffer = deque(maxlen=window)
+        self._produced = 0  # cantidad de tokens extraídos del iterador
+        self._exhausted = False
+
+    def _fill(self, index):
+        while self._produced <= index and not self._exhausted:
+            try:
+                self._buffer.append(next(self._source))
+                self._produced += 1
+            except StopIteration:
+                self._exhausted = True
+
+    def __getitem__(self, index):
+        self._fill(index)
+        if index >= self._produced:
+            raise IndexError(index)
+        base = self._produced - len(self._buffer)
+        if index < base:
+            raise RuntimeError(f"El token {index} ya salió de la ventana de lookahead")
+        return self._buffer[index - base]
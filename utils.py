@@ -1,11 +1,18 @@
 # utils.py
 
+from types import GeneratorType
+
 def peek(tokens, index):
     """
     Devuelve el token en la posición 'index' de la lista de tokens.
     Si no hay token en esa posición, retorna None.
+    'tokens' puede ser una lista o cualquier secuencia indexable que lance
+    IndexError al final (p. ej. un TokenStream, que no conoce su longitud).
     """
-    return tokens[index] if index < len(tokens) else None
+    try:
+        return tokens[index]
+    except IndexError:
+        return None
 
 def match(token, expected_type):
     """
@@ -45,3 +52,46 @@ def advance(index):
     Retorna el siguiente índice (index + 1).
     """
     return index + 1
+
+def trampoline(root):
+    """
+    Ejecuta 'root', un generador que delega en otros haciendo 'yield' del
+    generador hijo y recibe su resultado como valor del yield:
+
+        left = yield self.parse_factor()
+
+    Los generadores pendientes viven en una lista, no en la pila de Python,
+    así que la profundidad solo está limitada por la memoria. Las
+    excepciones de un hijo se relanzan dentro del padre (gen.throw), de modo
+    que los try/except alrededor de un yield funcionan como en una llamada
+    normal. Si se hace yield de algo que no es un generador, se devuelve
+    tal cual.
+    """
+    if type(root) is not GeneratorType:
+        return root
+    stack = [root]
+    value = None
+    pending = None
+    while stack:
+        try:
+            if pending is not None:
+                exc, pending = pending, None
+                child = stack[-1].throw(exc)
+            else:
+                child = stack[-1].send(value)
+        except StopIteration as stop:
+            stack.pop()
+            value = stop.value
+            continue
+        except Exception as exc:
+            stack.pop()
+            if not stack:
+                raise
+            pending = exc
+            continue
+        if type(child) is GeneratorType:
+            stack.append(child)
+            value = None
+        else:
+            value = child
+    return value
@@ -0,0 +1,93 @@
+# visitor.py
+
+from types import GeneratorType
+
+from AST import NODE_CLASSES
+from utils import trampoline
+
+
+class Visitor:
+    """
+    Base de los pases sobre el AST (SemanticAnalyzer, IRGenerator,
+    ast_to_dict). Cada subclase define un prefijo de método y un método por
+    clase de nodo:
+
+        class IRGenerator(Visitor):
+            method_prefix = 'gen_'
+
+            def gen_BinaryOp(self, node):
+                yield self.visit(node.left)
+                ...
+
+    La tabla clase -> función se arma una sola vez al crear la subclase, así
+    que visit() es una búsqueda en un dict por nodo, sin concatenar nombres
+    ni getattr. Las clases que no están en NODE_CLASSES (las vistas de
+    ast_arena, subclases propias) se resuelven la primera vez que aparecen
+    por el nombre de su clase o de sus bases, y quedan en la tabla. Las que
+    no tienen método van a generic_visit.
+
+    Los métodos con hijos son generadores que piden el resultado de cada
+    hijo con 'yield self.visit(hijo)'; run() los ejecuta con trampoline
+    (pila explícita, sin límite de profundidad) o con recurse (recursión de
+    Python, algo más rápida en árboles poco profundos).
+    """
+    method_prefix = 'visit_'
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._dispatch = {}
+        for node_class in NODE_CLASSES:
+            cls._resolve(node_class)
+
+    @classmethod
+    def _resolve(cls, node_class):
+        for base in node_class.__mro__:
+            method = getattr(cls, cls.method_prefix + base.__name__, None)
+            if method is not None:
+                break
+        else:
+            method = cls.generic_visit
+        cls._dispatch[node_class] = method
+        return method
+
+    def visit(self, node):
+        try:
+            method = self._dispatch[node.__class__]
+        except KeyError:
+            method = self._resolve(node.__class__)
+        return method(self, node)
+
+    def generic_visit(self, node):
+        raise NotImplementedError(
+            f"{self.__class__.__name__} no implementa {self.method_prefix}{node.__class__.__name__}")
+
+    def run(self, node, recursive=False):
+        """Recorre el árbol desde 'node' y retorna el resultado de su visita."""
+        result = self.visit(node)
+        return recurse(result) if recursive else trampoline(result)
+
+
+def recurse(result):
+    """
+    Ejecuta el generador 'result' como trampoline, pero cada hijo con una
+    llamada recursiva: evita manejar la pila a mano a cambio de quedar
+    limitado por sys.getrecursionlimit().
+    """
+    if type(result) is not GeneratorType:
+        return result
+    send = result.send
+    value = error = None
+    while True:
+        try:
+            child = send(value) if error is None else result.throw(error)
+        except StopIteration as stop:
+            return stop.value
+        error = None
+        if type(child) is GeneratorType:
+            # los errores del hijo se relanzan dentro del padre, como en trampoline
+            try:
+                value = recurse(child)
+            except Exception as exc:
+                error = exc
+        else:
+            value = child